@@ -1,11 +1,22 @@
+import time
+import uuid
+
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from fastapi import Depends, HTTPException
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
+from detection.verdict_cache import LocalSharedStore, verdict_cache
+from utils.logger import logger
+
 SECRET_KEY = "SUPER_SECRET_BANK_KEY"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
+# Stream tickets end up in a query string (and so in access logs): short-lived,
+# good for the live feed only, and for one connection. Used tickets are
+# recorded in the verdict cache's Redis when VERDICT_CACHE_BACKEND=redis, so
+# single use holds across workers; otherwise only within each worker.
+STREAM_TICKET_EXPIRE_SECONDS = 30
 
 security = HTTPBearer()
 
@@ -21,12 +32,52 @@ def create_access_token(data: dict):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    token = credentials.credentials
+def check_token(token: str):
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
-        if username is None or username != ADMIN_USERNAME:
+        # scoped tokens (stream tickets) are not admin credentials
+        if username is None or username != ADMIN_USERNAME or "scope" in payload:
             raise HTTPException(status_code=401, detail="Invalid authentication credentials")
     except JWTError:
-        raise HTTPException(status_code=401, detail="Invalid authentication credentials")
\ No newline at end of file
+        raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+
+def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    check_token(credentials.credentials)
+
+_local_tickets = LocalSharedStore()
+
+def _claim_ticket(jti: str, expires: float) -> bool:
+    """True the first time ``jti`` is seen, atomically (SET NX)."""
+    store = getattr(verdict_cache.backend, "client", None) or _local_tickets
+    try:
+        return bool(store.set(f"stream-ticket:{jti}", "1", ex=max(1, int(expires - time.time()) + 1), nx=True))
+    except Exception as e:
+        # fail closed: a ticket that can't be recorded could be replayed
+        logger.warning(f"Stream ticket store failed: {e}")
+        return False
+
+def create_stream_ticket():
+    expire = datetime.utcnow() + timedelta(seconds=STREAM_TICKET_EXPIRE_SECONDS)
+    return jwt.encode(
+        {"sub": ADMIN_USERNAME, "scope": "live", "jti": uuid.uuid4().hex, "exp": expire},
+        SECRET_KEY,
+        algorithm=ALGORITHM,
+    )
+
+def check_stream_ticket(ticket: str):
+    """Accept a ticket from create_stream_ticket once; admin tokens are refused."""
+    try:
+        payload = jwt.decode(ticket, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        raise HTTPException(status_code=401, detail="Invalid stream ticket")
+    jti = payload.get("jti")
+    if payload.get("sub") != ADMIN_USERNAME or payload.get("scope") != "live" or not jti:
+        raise HTTPException(status_code=401, detail="Invalid stream ticket")
+
+    if not _claim_ticket(jti, payload["exp"]):
+        raise HTTPException(status_code=401, detail="Stream ticket already used")
+
+def verify_stream_ticket(ticket: str = ""):
+    """For EventSource and WebSocket clients, which can't send an Authorization header."""
+    check_stream_ticket(ticket)
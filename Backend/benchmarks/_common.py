@@ -0,0 +1,85 @@
+"""Shared helpers for the scripts in this folder.
+
+Run benchmarks from the Backend directory as modules, e.g.
+
+    python -m benchmarks.bench_async_scoring
+
+so that ``detection``, ``ml`` etc. resolve the same way they do for main.py.
+"""
+import os
+import socket
+import socketserver
+import threading
+import time
+from datetime import datetime
+
+import joblib
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def load_pipeline(name: str):
+    path = os.path.join(BACKEND_DIR, name)
+    if not os.path.exists(path):
+        raise SystemExit(f"{path} not found - run training/train_url_model.py and train_message_model.py first.")
+    return joblib.load(path)
+
+
+def percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[k]
+
+
+def latency_summary(values_seconds) -> str:
+    ms = [v * 1000 for v in values_seconds]
+    return (
+        f"p50={percentile(ms, 50):8.2f}ms  p95={percentile(ms, 95):8.2f}ms  "
+        f"p99={percentile(ms, 99):8.2f}ms  max={max(ms) if ms else 0:8.2f}ms"
+    )
+
+
+class _WhoisHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        domain = self.rfile.readline().decode("utf-8", "ignore").strip()
+        delay = self.server.slow_delay if domain.startswith("slow") else self.server.fast_delay
+        time.sleep(delay)
+        self.wfile.write(f"Domain Name: {domain}\r\nCreation Date: 2019-05-04T10:00:00Z\r\n".encode())
+
+
+class FakeWhoisServer(socketserver.ThreadingTCPServer):
+    """Local WHOIS (port-43 style) server. Domains starting with "slow" answer
+    after ``slow_delay`` seconds, everything else after ``fast_delay``."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+    # the default backlog of 5 drops bursts of concurrent lookups (1s SYN retry)
+    request_queue_size = 256
+
+    def __init__(self, fast_delay: float = 0.01, slow_delay: float = 3.0):
+        super().__init__(("127.0.0.1", 0), _WhoisHandler)
+        self.fast_delay = fast_delay
+        self.slow_delay = slow_delay
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
+
+    def lookup(self, domain: str):
+        """A DomainAgeCache lookup backend that queries this server."""
+        host, port = self.server_address
+        with socket.create_connection((host, port), timeout=10) as conn:
+            conn.sendall(f"{domain}\r\n".encode())
+            data = b""
+            while chunk := conn.recv(4096):
+                data += chunk
+        for line in data.decode().splitlines():
+            if line.startswith("Creation Date:"):
+                return datetime.strptime(line.split(":", 1)[1].strip(), "%Y-%m-%dT%H:%M:%SZ")
+        return None
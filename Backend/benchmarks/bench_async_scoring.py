@@ -0,0 +1,69 @@
+"""Latency under concurrency: blocking calculate_risk_score vs the async engine.
+
+A local fake WHOIS server answers most domains in 10ms and "slow*" domains in
+3s. Every request uses a fresh domain so the domain-age cache never helps.
+
+    python -m benchmarks.bench_async_scoring [--requests 400] [--concurrency 50]
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks._common import FakeWhoisServer, latency_summary, load_pipeline
+from detection.async_engine import calculate_risk_score_async
+from detection.risk_engine import calculate_risk_score
+from detection.whois_cache import domain_age_cache
+
+
+def _urls(n: int, slow_every: int, tag: str):
+    return [
+        f"https://{'slow' if i % slow_every == 0 else 'fast'}-{tag}-{i}.example.com/login"
+        for i in range(n)
+    ]
+
+
+async def _run(score, urls, concurrency: int):
+    sem = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(url):
+        async with sem:
+            start = time.perf_counter()
+            await score(url)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(u) for u in urls))
+    return latencies, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--slow-every", type=int, default=20, help="every Nth domain is slow")
+    parser.add_argument("--deadline", type=float, default=0.5, help="async WHOIS deadline (s)")
+    args = parser.parse_args()
+
+    url_pipe = load_pipeline("url_pipeline.pkl")
+    domain_age_cache.set_store(None)
+
+    async def blocking(url):
+        # What check_url used to do: sync scoring straight on the event loop.
+        return calculate_risk_score(url, url_pipe)
+
+    async def non_blocking(url):
+        return await calculate_risk_score_async(url, url_pipe, whois_deadline=args.deadline)
+
+    with FakeWhoisServer() as server:
+        domain_age_cache.set_lookup(server.lookup)
+
+        for name, score in (("blocking", blocking), ("async", non_blocking)):
+            domain_age_cache.clear()
+            urls = _urls(args.requests, args.slow_every, name)
+            latencies, elapsed = asyncio.run(_run(score, urls, args.concurrency))
+            print(f"{name:9s} {latency_summary(latencies)}  throughput={len(urls) / elapsed:8.1f} req/s")
+
+
+if __name__ == "__main__":
+    main()
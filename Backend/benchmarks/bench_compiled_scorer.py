@@ -0,0 +1,65 @@
+"""sklearn .pkl pipelines vs the compiled scorers (ml/compiled_scorer.py).
+
+Reports max probability difference, per-item latency (one predict_proba call
+per text) and batch throughput for both models.
+
+    python -m benchmarks.bench_compiled_scorer [--batch 1000] [--rounds 5]
+"""
+import argparse
+import csv
+import os
+import time
+
+from benchmarks._common import BACKEND_DIR, latency_summary, load_pipeline
+from ml.compiled_scorer import CompiledLinearScorer, max_abs_difference
+
+
+def _texts():
+    with open(os.path.join(BACKEND_DIR, "training", "dataset_clean.csv"), encoding="utf-8", newline="") as f:
+        return [row["text"] for row in csv.DictReader(f)]
+
+
+def _per_item(model, texts):
+    latencies = []
+    for text in texts:
+        start = time.perf_counter()
+        model.predict_proba([text])
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def _throughput(model, batch, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        model.predict_proba(batch)
+    return rounds * len(batch) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    texts = _texts()
+    batch = (texts * (args.batch // len(texts) + 1))[: args.batch]
+
+    for name in ("url", "message"):
+        pipe = load_pipeline(f"{name}_pipeline.pkl")
+        compiled_path = os.path.join(BACKEND_DIR, f"{name}_scorer")
+        if not os.path.exists(os.path.join(compiled_path, "meta.json")):
+            raise SystemExit(f"{compiled_path} not found - re-run training/train_{name}_model.py.")
+        scorer = CompiledLinearScorer.load(compiled_path)
+
+        print(f"=== {name} model ===")
+        print(f"max |p - p_sklearn| = {max_abs_difference(pipe, scorer, texts):.3e}")
+        for label, model in (("sklearn", pipe), ("compiled", scorer)):
+            latencies = _per_item(model, texts)
+            print(
+                f"{label:9s} per-item {latency_summary(latencies)}  "
+                f"batch={_throughput(model, batch, args.rounds):10.1f} items/s"
+            )
+
+
+if __name__ == "__main__":
+    main()
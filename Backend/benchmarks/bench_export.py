@@ -0,0 +1,103 @@
+"""Export memory and throughput: ORM ``.all()`` vs dashboard/export.py streams.
+
+For each table size the same url_checks rows are exported as CSV, once by
+loading every row with ``query(URLCheck).all()`` and once through
+export_stream() in each format. Peak memory is traced Python allocations
+(tracemalloc) while the export runs; it should stay flat for the streams as
+the table grows. Output bytes go nowhere.
+
+    python -m benchmarks.bench_export [--rows 100000 1000000]
+"""
+import argparse
+import csv
+import io
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, URLCheck, create_db_engine
+from dashboard.export import EXPORT_COLUMNS, export_stream
+
+CHUNK = 100_000
+
+
+def _populate(engine, start_row: int, rows: int) -> None:
+    now = datetime.utcnow()
+    verdicts = ["safe"] * 8 + ["suspicious", "phishing"]
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        for offset in range(start_row, start_row + rows, CHUNK):
+            batch = []
+            for i in range(offset, min(start_row + rows, offset + CHUNK)):
+                verdict = verdicts[i % len(verdicts)]
+                batch.append((f"https://site-{i}.example.com/login?session={i:08d}", f"site-{i}.example.com",
+                              str(verdict != "safe"), "ML model sees low risk (p=0.12)", verdict,
+                              (now - timedelta(seconds=i)).strftime("%Y-%m-%d %H:%M:%S.%f")))
+            cursor.executemany(
+                "INSERT INTO url_checks (url, domain, flagged, reason, verdict, checked_at) VALUES (?, ?, ?, ?, ?, ?)",
+                batch,
+            )
+            raw.commit()
+    finally:
+        raw.close()
+
+
+def _orm_all(session_factory):
+    names = EXPORT_COLUMNS["urls"]
+    with session_factory() as db:
+        rows = db.query(URLCheck).all()
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(names)
+        for row in rows:
+            writer.writerow([getattr(row, name) for name in names])
+        yield buffer.getvalue().encode()
+
+
+def _measure(stream):
+    tracemalloc.start()
+    start = time.perf_counter()
+    written = sum(len(data) for data in stream)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, written
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    args = parser.parse_args()
+
+    try:
+        import pyarrow  # noqa: F401
+        formats = ["csv", "ndjson", "training", "parquet"]
+    except ImportError:
+        formats = ["csv", "ndjson", "training"]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_db_engine(f"sqlite:///{os.path.join(tmp, 'export.db')}")
+        Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(bind=engine)
+
+        populated = 0
+        for rows in sorted(args.rows):
+            _populate(engine, populated, rows - populated)
+            populated = rows
+            print(f"{rows} rows")
+            runs = [("ORM .all() csv", _orm_all(session_factory))]
+            runs += [(f"stream {fmt}", export_stream("urls", fmt, session_factory)) for fmt in formats]
+            for name, stream in runs:
+                elapsed, peak, written = _measure(stream)
+                print(f"  {name:15s} {elapsed:6.2f}s  {rows / elapsed:9.0f} rows/s  peak={peak / 2**20:8.1f}MiB  "
+                      f"out={written / 2**20:7.1f}MiB")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
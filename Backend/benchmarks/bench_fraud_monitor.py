@@ -0,0 +1,153 @@
+"""Replay a message stream through the FraudMonitor at a target rate.
+
+The stream is --messages long. It mixes three phishing campaigns (templated
+texts with varying names, amounts and tracking numbers, links on a handful of
+rotating domains), a benign bulk OTP template that must not alert, and
+one-off chatter, some of it with links to popular sites. Message i is
+stamped at i / --rate minutes, so the sliding windows see the target rate no
+matter how fast the replay runs. WHOIS answers from a local fake server and
+the verdict cache is off.
+
+Reported: replay throughput against --rate, per-batch latency, how many
+messages into each campaign its first alert came (and the simulated
+seconds), false alerts, and the detector's key counts. A campaign the scorer
+rates safe stays below FRAUD_CAMPAIGN_MIN_FLAGGED and is not alerted on, so
+each campaign's flagged share is printed too. A second pass feeds --distinct
+unique messages straight to a CampaignDetector to show its memory levelling
+off at max_keys.
+
+    python -m benchmarks.bench_fraud_monitor [--messages 100000] [--rate 100000]
+"""
+import argparse
+import asyncio
+import random
+import time
+import tracemalloc
+
+from benchmarks._common import FakeWhoisServer, latency_summary, load_pipeline
+from detection.fraud_monitor import MONITOR_BATCH_SIZE, CampaignDetector, FraudMonitor
+from detection.verdict_cache import verdict_cache
+from detection.whois_cache import domain_age_cache
+
+NAMES = ["Ann", "Bob", "Chen", "Dana", "Eli", "Fatima", "Goran", "Hana", "Ivan", "Jo"]
+CAMPAIGNS = {
+    "parcel": ("Hi {name}, your parcel {n} is held at customs. Pay the {amount} fee to release it: "
+               "https://parcel-release-{d}.xyz/pay?id={n}", 4),
+    "bank": ("URGENT {name}: unusual sign-in on account ending {n}. Verify your account now or it will be "
+             "suspended: http://secure-bank-verify{d}.top/login?ref={n}", 3),
+    "refund": ("Dear customer, you are eligible for a tax refund of {amount}. Click here to claim before "
+               "midnight: https://refund-claim-{d}.online/claim/{n}", 5),
+}
+OTP = "Your verification code is {n}. It expires in 10 minutes. Do not share it with anyone."
+WORDS = ("lunch tomorrow meeting moved call later thanks photos weekend game dinner train late "
+         "shopping list coffee birthday party movie tonight project report deadline gym").split()
+POPULAR = ["https://www.google.com/maps?q={n}", "https://github.com/org/repo/pull/{n}",
+           "https://www.youtube.com/watch?v={n}"]
+
+
+def _stream(count: int, campaign_share: float, rng: random.Random):
+    """(message, campaign or None) pairs. Campaigns start a third of the way in."""
+    start = count // 3
+    for i in range(count):
+        n, name = rng.randrange(10 ** 6, 10 ** 7), rng.choice(NAMES)
+        roll = rng.random()
+        if i >= start and roll < campaign_share:
+            label = rng.choice(list(CAMPAIGNS))
+            template, domains = CAMPAIGNS[label]
+            yield template.format(name=name, n=n, amount=f"${rng.randrange(2, 90)}.{rng.randrange(100):02d}",
+                                  d=rng.randrange(domains)), label
+        elif roll < campaign_share + 0.05:
+            yield OTP.format(n=n), None
+        else:
+            text = " ".join(rng.choice(WORDS) for _ in range(rng.randrange(4, 12)))
+            if rng.random() < 0.1:
+                text += " " + rng.choice(POPULAR).format(n=n)
+            yield f"{name} {text}", None
+
+
+async def _replay(monitor: FraudMonitor, stream, rate: float, batch_size: int):
+    latencies, first_alert, alerts = [], {}, []
+    seen = {label: 0 for label in CAMPAIGNS}
+    flagged = {label: 0 for label in CAMPAIGNS}
+    started_at = {}
+    per_message = 60.0 / rate
+    t0 = time.time()
+    start = time.perf_counter()
+    for offset in range(0, len(stream), batch_size):
+        batch = stream[offset:offset + batch_size]
+        batch_start = time.perf_counter()
+        results = await monitor.process_messages([m for m, _ in batch], now=t0 + offset * per_message)
+        latencies.append(time.perf_counter() - batch_start)
+        for j, ((message, label), result) in enumerate(zip(batch, results)):
+            if label:
+                seen[label] += 1
+                flagged[label] += result["verdict"] != "safe"
+                started_at.setdefault(label, offset + j)
+            for alert in result["campaign_alerts"]:
+                alerts.append((label, alert))
+                if label and label not in first_alert:
+                    first_alert[label] = (seen[label], (offset + j - started_at[label]) * per_message)
+    return time.perf_counter() - start, latencies, first_alert, alerts, seen, flagged
+
+
+def _memory(distinct: int, max_keys: int) -> None:
+    detector = CampaignDetector(max_keys=max_keys)
+    rng = random.Random(7)
+    tracemalloc.start()
+    now = time.time()
+    for i in range(1, distinct + 1):
+        words = " ".join(rng.choice(WORDS) for _ in range(8))
+        detector.observe(f"{words} https://d{i}.example.com/{i}", flagged=False, now=now)
+        if i % (distinct // 5) == 0:
+            current = tracemalloc.get_traced_memory()[0]
+            print(f"  {i:8d} distinct messages  detector memory={current / 2**20:6.1f}MiB  "
+                  f"keys={detector.stats()['keys']}")
+    tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=100_000)
+    parser.add_argument("--rate", type=float, default=100_000, help="target messages per minute")
+    parser.add_argument("--batch", type=int, default=MONITOR_BATCH_SIZE)
+    parser.add_argument("--campaign-share", type=float, default=0.03)
+    parser.add_argument("--distinct", type=int, default=500_000)
+    parser.add_argument("--max-keys", type=int, default=20_000)
+    args = parser.parse_args()
+
+    stream = list(_stream(args.messages, args.campaign_share, random.Random(5)))
+    monitor = FraudMonitor(load_pipeline("message_pipeline.pkl"), load_pipeline("url_pipeline.pkl"))
+    verdict_cache.set_backend(None)
+    domain_age_cache.set_store(None)
+
+    with FakeWhoisServer() as server:
+        domain_age_cache.set_lookup(server.lookup)
+        elapsed, latencies, first_alert, alerts, seen, flagged = asyncio.run(
+            _replay(monitor, stream, args.rate, args.batch)
+        )
+
+    achieved = len(stream) / elapsed * 60
+    print(f"{len(stream)} messages in {elapsed:.1f}s: {achieved:,.0f} msg/min "
+          f"({achieved / args.rate:.2f}x the {args.rate:,.0f}/min target)")
+    print(f"batch of {args.batch}: {latency_summary(latencies)}")
+    for label in CAMPAIGNS:
+        share = f"{seen[label]} messages, {flagged[label] / max(1, seen[label]):4.0%} flagged"
+        if label in first_alert:
+            count, seconds = first_alert[label]
+            print(f"  campaign {label:7s} ({share}): first alert after {count} of its messages "
+                  f"({seconds:.1f}s simulated)")
+        else:
+            # below FRAUD_CAMPAIGN_MIN_FLAGGED: the scorer rates the texts safe
+            print(f"  campaign {label:7s} ({share}): not detected")
+    false_alerts = [alert for label, alert in alerts if label is None]
+    print(f"alerts: {len(alerts)} total, {len(false_alerts)} on non-campaign messages")
+    for alert in false_alerts[:5]:
+        print(f"  false: {alert['dimension']} {alert['key']} {alert['sample'][:60]!r}")
+    print(f"detector: {monitor.stats()}")
+
+    print(f"memory, max_keys={args.max_keys} per dimension:")
+    _memory(args.distinct, args.max_keys)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Top targeted domains: exact GROUP BY over url_checks.domain vs the
+Space-Saving day sketches (dashboard/heavy_hitters.py), on the same rows.
+
+Domains follow a Zipf distribution over --domains distinct names and rows are
+spread over the last 30 days. Every row is written to url_checks and fed
+through the flush hook, the sketches are persisted as a second worker would,
+and then top-N is compared with the exact answer:
+
+- recall: share of the exact top-N the sketch also ranks in its top-N
+- max error: largest |sketch count - exact count| in the exact top-N
+- bound ok: every exact count lies in [count - max_error, count]
+
+Building 10M rows takes several minutes on SQLite; pass --rows for a quicker run.
+
+    python -m benchmarks.bench_heavy_hitters [--rows 10000000] [--top 10] [--capacity 1000]
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, URLCheck, create_db_engine
+from dashboard.heavy_hitters import DomainHeavyHitters, exact_top_domains
+
+CHUNK = 100_000
+DAYS = 30
+
+
+def _populate(engine, sketches: DomainHeavyHitters, rows: int, domains: int) -> None:
+    rng = np.random.default_rng(7)
+    now = datetime.utcnow()
+    span = (DAYS - 1) * 24 * 3600
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        for offset in range(0, rows, CHUNK):
+            n = min(CHUNK, rows - offset)
+            ranks = np.minimum(rng.zipf(1.3, n), domains)
+            ages = rng.integers(0, span, n)
+            batch = []
+            for rank, age in zip(ranks.tolist(), ages.tolist()):
+                domain = f"brand-{rank}.example.com"
+                checked_at = now - timedelta(seconds=age)
+                batch.append({"url": f"https://{domain}/login", "domain": domain, "flagged": "False",
+                              "reason": "bench", "verdict": "safe", "checked_at": checked_at})
+            cursor.executemany(
+                "INSERT INTO url_checks (url, domain, flagged, reason, verdict, checked_at) VALUES (?, ?, ?, ?, ?, ?)",
+                [(r["url"], r["domain"], r["flagged"], r["reason"], r["verdict"],
+                  r["checked_at"].strftime("%Y-%m-%d %H:%M:%S.%f")) for r in batch],
+            )
+            raw.commit()
+            sketches.record_inserts({URLCheck: batch})
+    finally:
+        raw.close()
+
+
+def _time(fn, repeat: int = 3):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--domains", type=int, default=200_000)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--capacity", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_db_engine(f"sqlite:///{os.path.join(tmp, 'heavy_hitters.db')}")
+        Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(bind=engine)
+
+        writer = DomainHeavyHitters(session_factory, capacity=args.capacity, window_days=DAYS)
+        start = time.perf_counter()
+        _populate(engine, writer, args.rows, args.domains)
+        print(f"populated {args.rows} rows (and sketches) in {time.perf_counter() - start:.1f}s")
+        writer.persist()
+
+        # a fresh process: everything it reads comes from the persisted rows
+        reader = DomainHeavyHitters(session_factory, capacity=args.capacity, window_days=DAYS)
+        # the sketches cover whole UTC days: today and the DAYS - 1 before it
+        since = datetime.combine(datetime.utcnow().date() - timedelta(days=DAYS - 1), datetime.min.time())
+        with session_factory() as db:
+            exact_s, exact = _time(lambda: exact_top_domains(db, since, args.top), repeat=1)
+        sketch_s, approx = _time(lambda: reader.top(args.top, days=DAYS))
+
+        exact_counts = {d["domain"]: d["count"] for d in exact}
+        recall = len(exact_counts.keys() & {d["domain"] for d in approx}) / max(1, len(exact_counts))
+        # every tracked domain, so exact top-N entries ranked lower by the sketch are still compared
+        estimates = {d["domain"]: d for d in reader.top(args.capacity * DAYS, days=DAYS)}
+        errors, bound_ok = [], True
+        for domain, count in exact_counts.items():
+            estimate = estimates.get(domain)
+            if estimate is None:
+                bound_ok = False
+                continue
+            errors.append(abs(estimate["count"] - count))
+            bound_ok &= estimate["count"] - estimate["max_error"] <= count <= estimate["count"]
+
+        print(f"exact GROUP BY: {exact_s * 1000:10.1f}ms   sketches: {sketch_s * 1000:7.2f}ms "
+              f"({args.capacity} entries/day x {DAYS} days)")
+        print(f"top-{args.top} recall={recall:.2f}  max error={max(errors, default=0)}  bound ok={bound_ok}")
+        for rank, (e, a) in enumerate(zip(exact, approx), 1):
+            print(f"  {rank:2d}. {e['domain']:28s} {e['count']:9d}   {a['domain']:28s} {a['count']:9d} (±{a['max_error']})")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""History page latency deep into url_checks: OFFSET/LIMIT vs the keyset
+cursors of dashboard/history.py.
+
+Pages of --page rows are fetched at increasing depths down to the last
+page, newest first, both unfiltered and filtered by verdict. The keyset page
+at each depth starts from the cursor the previous page would have returned.
+
+    python -m benchmarks.bench_history [--rows 2000000] [--page 50]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, URLCheck, create_db_engine
+from dashboard.history import encode_cursor, list_history
+
+CHUNK = 100_000
+
+
+def _populate(engine, rows: int) -> None:
+    rng = random.Random(5)
+    start = datetime.utcnow() - timedelta(days=365)
+    step = 365 * 24 * 3600 / rows
+    verdicts = ["safe"] * 8 + ["suspicious", "phishing"]
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        for offset in range(0, rows, CHUNK):
+            batch = []
+            for i in range(offset, min(rows, offset + CHUNK)):
+                verdict = rng.choice(verdicts)
+                domain = f"site-{rng.randrange(50000)}.example.com"
+                checked_at = start + timedelta(seconds=i * step)
+                batch.append((f"https://{domain}/p", domain, str(verdict != "safe"), "bench", verdict,
+                              checked_at.strftime("%Y-%m-%d %H:%M:%S.%f")))
+            cursor.executemany(
+                "INSERT INTO url_checks (url, domain, flagged, reason, verdict, checked_at) VALUES (?, ?, ?, ?, ?, ?)",
+                batch,
+            )
+            raw.commit()
+    finally:
+        raw.close()
+
+
+def _time(fn, repeat: int = 3):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--page", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_db_engine(f"sqlite:///{os.path.join(tmp, 'history.db')}")
+        Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(bind=engine)
+        start = time.perf_counter()
+        _populate(engine, args.rows)
+        print(f"populated {args.rows} rows in {time.perf_counter() - start:.1f}s")
+
+        with session_factory() as db:
+            for verdict in (None, "phishing"):
+                print(f"verdict={verdict or 'any'}")
+                matching = args.rows if verdict is None else args.rows // 10
+                last_page = matching // args.page
+                for depth in sorted({d for d in (1, 10, 100, 1000, 10000, 100000) if d < last_page} | {last_page}):
+                    base = select(URLCheck)
+                    if verdict is not None:
+                        base = base.where(URLCheck.verdict == verdict)
+                    ordered = base.order_by(URLCheck.checked_at.desc(), URLCheck.id.desc())
+
+                    offset_s, _ = _time(lambda: db.execute(
+                        ordered.offset((depth - 1) * args.page).limit(args.page)).scalars().all())
+
+                    # the cursor the previous page hands out: its last row
+                    cursor = None
+                    if depth > 1:
+                        last = db.execute(ordered.offset((depth - 1) * args.page - 1).limit(1)).scalar_one()
+                        cursor = encode_cursor(last.checked_at, last.id)
+                    keyset_s, page = _time(lambda: list_history(db, "urls", args.page, cursor, verdict=verdict))
+
+                    print(f"  page {depth:6d}  OFFSET={offset_s * 1000:9.2f}ms  keyset={keyset_s * 1000:6.2f}ms  "
+                          f"rows={len(page['items'])}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
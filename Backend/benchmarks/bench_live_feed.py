@@ -0,0 +1,155 @@
+"""Live feed fan-out (dashboard/live_feed.py): broadcast latency and memory
+per connection with hundreds of SSE subscribers.
+
+A uvicorn server in this process serves the same SSE stream as /admin/live
+(without the ticket check). A separate client process opens --subscribers
+connections and reads the raw event stream. This thread then plays the
+write-behind thread: --events times, a flush of --rows url checks goes
+through publish_committed(), --rate flushes per second. Latency is the time
+from publish to a client reading the ``checks`` event, across processes on
+one clock.
+
+Memory per connection is traced Python allocations in the server process
+(tracemalloc) with everyone connected, minus the baseline, divided by the
+number of subscribers.
+
+    python -m benchmarks.bench_live_feed [--subscribers 100 500 1000] [--events 100] [--rate 5]
+"""
+import argparse
+import asyncio
+import multiprocessing
+import re
+import socket
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+
+from benchmarks._common import percentile
+from dashboard.live_feed import broadcaster, publish_committed, sse_stream
+from database import URLCheck
+
+CHECKS_RE = re.compile(rb'data: \{"type": "checks", "checks": \[\{"type": "url", "content": "https://bench\.example\.com/(\d+)"')
+
+app = FastAPI()
+
+
+@app.get("/live")
+async def live():
+    return StreamingResponse(sse_stream(broadcaster.subscribe()), media_type="text/event-stream")
+
+
+def _clients(port: int, count: int, events: int, timeout: float, results) -> None:
+    async def one():
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"GET /live HTTP/1.1\r\nHost: bench\r\n\r\n")
+        await writer.drain()
+        await reader.readuntil(b"\r\n\r\n")
+        received, buffer = [], b""
+        while len(received) < events:
+            chunk = await reader.read(1 << 16)
+            if not chunk:
+                break
+            now = time.time()
+            buffer += chunk
+            # complete checks events only; a partial one waits for the next read
+            end = buffer.rfind(b"\n\n")
+            if end < 0:
+                continue
+            received += [(int(seq), now) for seq in CHECKS_RE.findall(buffer, 0, end)]
+            buffer = buffer[end:]
+        writer.close()
+        return received
+
+    async def run():
+        tasks = [asyncio.create_task(one()) for _ in range(count)]
+        done, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        return [task.result() for task in done if not task.exception()]
+
+    results.put(asyncio.run(run()))
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _flush(seq: int, rows: int):
+    now = datetime.utcnow()
+    return {URLCheck: [
+        {"url": f"https://bench.example.com/{seq}", "flagged": "True" if i % 5 == 0 else "False",
+         "reason": "ML model sees low risk (p=0.12)", "verdict": "phishing" if i % 5 == 0 else "safe",
+         "checked_at": now}
+        for i in range(rows)
+    ]}
+
+
+def _run(port: int, subscribers: int, events: int, rate: float, rows: int) -> None:
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    results = multiprocessing.Queue()
+    timeout = 30 + events / rate * 2
+    client = multiprocessing.Process(target=_clients, args=(port, subscribers, events, timeout, results))
+    client.start()
+
+    deadline = time.time() + 30
+    while broadcaster.subscribers < subscribers and time.time() < deadline:
+        time.sleep(0.05)
+    time.sleep(0.5)
+    per_connection = (tracemalloc.get_traced_memory()[0] - baseline) / max(1, broadcaster.subscribers)
+    tracemalloc.stop()
+
+    published = {}
+    for seq in range(events):
+        rows_by_model = _flush(seq, rows)
+        published[seq] = time.time()
+        publish_committed(rows_by_model)
+        time.sleep(1 / rate)
+
+    received = results.get(timeout=timeout + 10)
+    client.join()
+    latencies = [(t - published[seq]) * 1000 for per_client in received for seq, t in per_client]
+    delivered = len(latencies) / (subscribers * events)
+    print(f"{subscribers:4d} subscribers  {per_connection / 1024:6.1f}KiB/connection  "
+          f"delivered={delivered:6.1%}  latency p50={percentile(latencies, 50):6.2f}ms "
+          f"p99={percentile(latencies, 99):7.2f}ms max={max(latencies, default=0):7.2f}ms  "
+          f"resyncs={broadcaster.resyncs}")
+
+    deadline = time.time() + 10
+    while broadcaster.subscribers and time.time() < deadline:
+        time.sleep(0.05)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--subscribers", type=int, nargs="+", default=[100, 500, 1000])
+    parser.add_argument("--events", type=int, default=100)
+    # WRITE_BEHIND_FLUSH_MS=200 flushes at most 5 times a second unless batches fill up
+    parser.add_argument("--rate", type=float, default=5, help="flushes per second")
+    parser.add_argument("--rows", type=int, default=50, help="url checks per flush")
+    args = parser.parse_args()
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning",
+                                           lifespan="off", backlog=2048))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    print(f"{args.events} flushes of {args.rows} rows at {args.rate:g}/s")
+    for subscribers in args.subscribers:
+        _run(port, subscribers, args.events, args.rate, args.rows)
+    server.should_exit = True
+    thread.join(timeout=5)
+
+
+if __name__ == "__main__":
+    main()
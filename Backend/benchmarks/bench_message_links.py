@@ -0,0 +1,87 @@
+"""Message scoring latency vs number of embedded links.
+
+"sequential" is the old loop (one calculate_risk_score, i.e. one WHOIS
+lookup and one single-row predict_proba, per link, one after another);
+"sync" and "async" are the current engines, which score each distinct link
+once, look domains up concurrently and run the URL model once per message.
+Every link uses a fresh domain on a local fake WHOIS server (50ms per
+lookup) and the verdict cache is off, so nothing is reused across messages.
+
+    python -m benchmarks.bench_message_links [--messages 20]
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks._common import FakeWhoisServer, latency_summary, load_pipeline
+from detection.async_engine import calculate_message_risk_score_async
+from detection.message_risk_engine import (
+    _final_message_verdict,
+    _message_ml_signal,
+    _phrase_signals,
+    _embedded_url_signal,
+    calculate_message_risk_score,
+    extract_urls,
+)
+from detection.risk_engine import _ml_phishing_probability, _score_url
+from detection.verdict_cache import verdict_cache
+from detection.whois_cache import domain_age_cache
+
+
+def _sequential(message, msg_pipe, url_pipe):
+    score, reasons = _phrase_signals(message)
+    for url in extract_urls(message):
+        url_score, url_reasons = _embedded_url_signal(url, _score_url(url, url_pipe))
+        score += url_score
+        reasons += url_reasons
+    ml_score, ml_reasons = _message_ml_signal(_ml_phishing_probability(msg_pipe, message))
+    return _final_message_verdict(score + ml_score, reasons + ml_reasons)
+
+
+def _messages(n: int, links: int, tag: str):
+    return [
+        "Your parcel is waiting, confirm delivery: "
+        + " ".join(f"https://track-{tag}-{i}-{j}.example.com/p/{j}" for j in range(links))
+        for i in range(n)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=20)
+    parser.add_argument("--whois-delay", type=float, default=0.05)
+    args = parser.parse_args()
+
+    url_pipe = load_pipeline("url_pipeline.pkl")
+    msg_pipe = load_pipeline("message_pipeline.pkl")
+    verdict_cache.set_backend(None)
+    domain_age_cache.set_store(None)
+
+    async def run_async(messages):
+        latencies = []
+        for message in messages:
+            start = time.perf_counter()
+            await calculate_message_risk_score_async(message, msg_pipe, url_pipe)
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    with FakeWhoisServer(fast_delay=args.whois_delay) as server:
+        domain_age_cache.set_lookup(server.lookup)
+
+        for links in (1, 2, 5, 10, 20):
+            for name in ("sequential", "sync", "async"):
+                messages = _messages(args.messages, links, f"{name}{links}")
+                if name == "async":
+                    latencies = asyncio.run(run_async(messages))
+                else:
+                    score = _sequential if name == "sequential" else calculate_message_risk_score
+                    latencies = []
+                    for message in messages:
+                        start = time.perf_counter()
+                        score(message, msg_pipe, url_pipe)
+                        latencies.append(time.perf_counter() - start)
+                print(f"{links:3d} links  {name:10s} {latency_summary(latencies)}")
+
+
+if __name__ == "__main__":
+    main()
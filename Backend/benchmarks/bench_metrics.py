@@ -0,0 +1,104 @@
+"""Cost of the utils/metrics.py instrumentation, and the stage breakdown it
+reports.
+
+First the bare cost of one stage timer, enabled and disabled. Then --urls
+URLs and --messages messages (each with one link) are scored through the
+sync engines, verdict cache and near-duplicate index off, once with metrics
+disabled and once enabled. The domains are fresh, and WHOIS answers from a
+local fake server in --whois-ms, so every stage does its real work. The
+enabled run's scoring_stage_seconds then shows where the time went.
+
+    python -m benchmarks.bench_metrics [--urls 2000] [--messages 1000] [--whois-ms 5]
+"""
+import argparse
+import time
+
+from benchmarks._common import FakeWhoisServer, load_pipeline
+from detection.message_risk_engine import calculate_message_risk_score
+from detection.near_duplicates import near_duplicate_index
+from detection.risk_engine import calculate_risk_score
+from detection.verdict_cache import verdict_cache
+from detection.whois_cache import domain_age_cache
+from utils import metrics
+
+BRANDS = ["paypal", "amazon", "netflix", "apple", "microsoft"]
+
+
+def _timer_cost(calls: int) -> float:
+    timer = metrics.stage_timer("bench", "timer")
+    start = time.perf_counter()
+    for _ in range(calls):
+        with timer.time():
+            pass
+    return (time.perf_counter() - start) / calls * 1e9
+
+
+def _score(urls, messages, msg_pipe, url_pipe) -> float:
+    start = time.perf_counter()
+    for url in urls:
+        calculate_risk_score(url, url_pipe)
+    for message in messages:
+        calculate_message_risk_score(message, msg_pipe, url_pipe)
+    return time.perf_counter() - start
+
+
+def _inputs(urls: int, messages: int, tag: str):
+    url_list = [f"https://{BRANDS[i % len(BRANDS)]}-{tag}-{i}.example.com/login?id={i}" for i in range(urls)]
+    message_list = [f"Your account {i} is on hold. Verify your account now: https://{tag}-m{i}.xyz/v"
+                    for i in range(messages)]
+    return url_list, message_list
+
+
+STAGES = {
+    "url": ["domain_extraction", "reputation", "typosquat", "whois", "ml"],
+    "message": ["near_duplicates", "phrases", "embedded_urls", "ml"],
+}
+
+
+def _stage_breakdown() -> None:
+    print("scoring_stage_seconds, metrics-on run (message embedded_urls includes its links' url stages):")
+    for kind, stages in STAGES.items():
+        for stage in stages:
+            child = metrics.stage_timer(kind, stage)
+            mean = child.sum / child.count * 1e6 if child.count else 0.0
+            print(f"  {kind:7s} {stage:18s} count={child.count:6d}  total={child.sum:7.3f}s  mean={mean:9.1f}us")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--urls", type=int, default=2000)
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--whois-ms", type=float, default=5)
+    parser.add_argument("--timer-calls", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    metrics.set_enabled(True)
+    enabled_ns = _timer_cost(args.timer_calls)
+    metrics.set_enabled(False)
+    disabled_ns = _timer_cost(args.timer_calls)
+    print(f"stage timer: {enabled_ns:6.0f}ns enabled, {disabled_ns:5.0f}ns disabled")
+
+    msg_pipe = load_pipeline("message_pipeline.pkl")
+    url_pipe = load_pipeline("url_pipeline.pkl")
+    verdict_cache.set_backend(None)
+    near_duplicate_index.set_enabled(False)
+    domain_age_cache.set_store(None)
+
+    with FakeWhoisServer(fast_delay=args.whois_ms / 1000) as server:
+        domain_age_cache.set_lookup(server.lookup)
+        _score(*_inputs(100, 100, "warmup"), msg_pipe, url_pipe)
+
+        metrics.set_enabled(False)
+        off = _score(*_inputs(args.urls, args.messages, "off"), msg_pipe, url_pipe)
+        metrics.set_enabled(True)
+        on = _score(*_inputs(args.urls, args.messages, "on"), msg_pipe, url_pipe)
+
+    checks = args.urls + args.messages
+    print(f"{args.urls} urls + {args.messages} messages, WHOIS {args.whois_ms:g}ms:")
+    print(f"  metrics off: {off:6.2f}s  {off / checks * 1000:6.3f}ms/check")
+    print(f"  metrics on : {on:6.2f}s  {on / checks * 1000:6.3f}ms/check  ({(on - off) / off:+.1%})")
+    _stage_breakdown()
+
+
+if __name__ == "__main__":
+    main()
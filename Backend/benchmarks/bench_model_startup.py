@@ -0,0 +1,97 @@
+"""Model start-up cost and memory per worker: .pkl pipelines vs mmapped scorers.
+
+Spawns 1, 4 and 8 fresh worker processes (like uvicorn/gunicorn workers), each
+of which imports the model stack, loads both models and scores the training
+texts once so the pages it needs are resident. While all workers are alive
+each one reports its RSS and PSS (proportional set size: shared pages are
+split between the processes mapping them, so sum(PSS) is the real host
+footprint). Linux only for the memory columns.
+
+    python -m benchmarks.bench_model_startup [--workers 1 4 8]
+"""
+import argparse
+import multiprocessing as mp
+import os
+import time
+
+from benchmarks._common import BACKEND_DIR
+
+
+def _memory_kb():
+    def read(path, key):
+        try:
+            with open(path) as f:
+                for line in f:
+                    if line.startswith(key):
+                        return int(line.split()[1])
+        except OSError:
+            pass
+        return None
+
+    return read("/proc/self/status", "VmRSS:"), read("/proc/self/smaps_rollup", "Pss:")
+
+
+def _worker(kind, barrier, results):
+    start = time.perf_counter()
+    import csv
+
+    if kind == "pkl":
+        import joblib
+
+        models = [joblib.load(os.path.join(BACKEND_DIR, f"{n}_pipeline.pkl")) for n in ("url", "message")]
+    else:
+        from ml.compiled_scorer import CompiledLinearScorer
+
+        models = [CompiledLinearScorer.load(os.path.join(BACKEND_DIR, f"{n}_scorer"), mmap=True) for n in ("url", "message")]
+    load_s = time.perf_counter() - start
+
+    with open(os.path.join(BACKEND_DIR, "training", "dataset_clean.csv"), encoding="utf-8", newline="") as f:
+        texts = [row["text"] for row in csv.DictReader(f)]
+    for model in models:
+        model.predict_proba(texts)
+
+    barrier.wait()
+    rss, pss = _memory_kb()
+    results.put((load_s, rss, pss))
+    # keep everyone alive until all workers have measured
+    barrier.wait()
+
+
+def _run(kind: str, workers: int):
+    ctx = mp.get_context("spawn")
+    barrier = ctx.Barrier(workers)
+    results = ctx.Queue()
+    procs = [ctx.Process(target=_worker, args=(kind, barrier, results)) for _ in range(workers)]
+    for p in procs:
+        p.start()
+    rows = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    return rows
+
+
+def _fmt_mb(kb):
+    return f"{kb / 1024:8.1f}MB" if kb is not None else "     n/a"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    args = parser.parse_args()
+
+    for kind in ("pkl", "mmap"):
+        for workers in args.workers:
+            rows = _run(kind, workers)
+            load = sum(r[0] for r in rows) / len(rows)
+            rss = [r[1] for r in rows if r[1] is not None]
+            pss = [r[2] for r in rows if r[2] is not None]
+            print(
+                f"{kind:4s} workers={workers}  load+import={load * 1000:8.1f}ms  "
+                f"RSS/worker={_fmt_mb(sum(rss) / len(rss) if rss else None)}  "
+                f"PSS/worker={_fmt_mb(sum(pss) / len(pss) if pss else None)}  "
+                f"PSS total={_fmt_mb(sum(pss) if pss else None)}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Near-duplicate index (detection/near_duplicates.py): lookup latency, the
+scoring it saves on scam-wave variants, and how often a reused verdict
+differs from the one full scoring gives.
+
+The stream mixes --templates scam templates, each sent in --variants
+variants (different names, amounts, ids; one of two links per template),
+with one-off chatter. It is scored twice with calculate_message_risk_score,
+the verdict cache off: once without the index and once with it. Every verdict the index answered is compared with the
+full score of the same message. WHOIS answers from a local fake server,
+already warm for every domain, so the saving measured is the phrase, model
+and URL work, not WHOIS waits.
+
+Lookup latency and memory are measured on an index filled with
+--clusters distinct texts.
+
+    python -m benchmarks.bench_near_duplicates [--templates 20] [--variants 200] [--clusters 10000]
+"""
+import argparse
+import random
+import time
+import tracemalloc
+
+from benchmarks._common import FakeWhoisServer, latency_summary, load_pipeline
+from detection.message_risk_engine import calculate_message_risk_score
+from detection.near_duplicates import NearDuplicateIndex, near_duplicate_index
+from detection.verdict_cache import verdict_cache
+from detection.whois_cache import domain_age_cache
+
+NAMES = ["Ann", "Bob", "Chen", "Dana", "Eli", "Fatima", "Goran", "Hana", "Ivan", "Jo"]
+OPENERS = ["Hi {name},", "Dear {name},", "{name}:", "Hello {name},"]
+BODIES = [
+    "your parcel {n} is held at customs. Pay the {amount} fee to release it today",
+    "unusual sign-in on account ending {n}. Verify your account now or it will be suspended",
+    "you are eligible for a tax refund of {amount}. Click here to claim before midnight",
+    "your subscription {n} failed to renew. Update your card details to keep your account active",
+    "you have won a {amount} gift card in our weekly draw. Claim your prize with code {n}",
+    "we noticed a charge of {amount} on card {n}. If this was not you cancel the payment now",
+]
+WORDS = ("lunch tomorrow meeting moved call later thanks photos weekend game dinner train late "
+         "shopping list coffee birthday party movie tonight project report deadline gym").split()
+
+
+def _templates(count: int, rng: random.Random):
+    templates = []
+    for t in range(count):
+        body = BODIES[t % len(BODIES)]
+        extra = " ".join(rng.choice(WORDS) for _ in range(3))
+        domains = [f"campaign{t}-{k}.{rng.choice(['xyz', 'top', 'online'])}" for k in range(2)]
+        templates.append((f"{rng.choice(OPENERS)} {body} {extra}: https://{{domain}}/claim", domains))
+    return templates
+
+
+def _stream(templates, variants: int, chatter: int, rng: random.Random):
+    messages = []
+    for template, domains in templates:
+        for _ in range(variants):
+            messages.append(template.format(name=rng.choice(NAMES), n=rng.randrange(10 ** 6),
+                                            amount=f"${rng.randrange(2, 900)}.{rng.randrange(100):02d}",
+                                            domain=rng.choice(domains)))
+    for i in range(chatter):
+        messages.append(f"{rng.choice(NAMES)} " + " ".join(rng.choice(WORDS) for _ in range(rng.randrange(8, 16))))
+    rng.shuffle(messages)
+    return messages
+
+
+def _score_all(messages, msg_pipe, url_pipe):
+    results, timings = [], []
+    for message in messages:
+        start = time.perf_counter()
+        results.append(calculate_message_risk_score(message, msg_pipe, url_pipe))
+        timings.append(time.perf_counter() - start)
+    return results, timings
+
+
+def _lookups(clusters: int, rng: random.Random) -> None:
+    index = NearDuplicateIndex(max_clusters=clusters)
+    result = {"verdict": "safe", "risk_score": 0, "confidence": 0.95, "reasons": ["bench"]}
+    texts = [" ".join(rng.choice(WORDS) for _ in range(14)) + f" https://d{i}.example.com/" for i in range(clusters)]
+    tracemalloc.start()
+    for text in texts:
+        _, probe = index.lookup(text)
+        index.add(probe, text, result)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    hits, misses = [], []
+    for text in rng.sample(texts, 2000):
+        start = time.perf_counter()
+        index.lookup(text)
+        hits.append(time.perf_counter() - start)
+    for i in range(2000):
+        text = " ".join(rng.choice(WORDS) for _ in range(14)) + f" https://new{i}.example.com/"
+        start = time.perf_counter()
+        index.lookup(text)
+        misses.append(time.perf_counter() - start)
+    print(f"index of {len(texts)} clusters: {memory / 2**20:.1f}MiB")
+    print(f"  lookup, hit : {latency_summary(hits)}")
+    print(f"  lookup, miss: {latency_summary(misses)}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--templates", type=int, default=20)
+    parser.add_argument("--variants", type=int, default=200)
+    parser.add_argument("--chatter", type=int, default=2000)
+    parser.add_argument("--clusters", type=int, default=10_000)
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    messages = _stream(_templates(args.templates, rng), args.variants, args.chatter, rng)
+    msg_pipe = load_pipeline("message_pipeline.pkl")
+    url_pipe = load_pipeline("url_pipeline.pkl")
+    verdict_cache.set_backend(None)
+    domain_age_cache.set_store(None)
+
+    with FakeWhoisServer() as server:
+        domain_age_cache.set_lookup(server.lookup)
+        near_duplicate_index.set_enabled(False)
+        _score_all(messages, msg_pipe, url_pipe)  # warms the domain-age cache
+        full, full_timings = _score_all(messages, msg_pipe, url_pipe)
+        near_duplicate_index.set_enabled(True)
+        indexed, indexed_timings = _score_all(messages, msg_pipe, url_pipe)
+
+    reused = [i for i, result in enumerate(indexed) if "Near-duplicate" in result["reasons"][-1]]
+    differ = [i for i in reused if indexed[i]["verdict"] != full[i]["verdict"]]
+    print(f"{len(messages)} messages ({args.templates} templates x {args.variants} variants + {args.chatter} chatter)")
+    print(f"  full scoring: {sum(full_timings):6.2f}s  {latency_summary(full_timings)}")
+    print(f"  with index  : {sum(indexed_timings):6.2f}s  {latency_summary(indexed_timings)}")
+    print(f"  reused {len(reused)} verdicts ({len(reused) / len(messages):.0%} of messages), "
+          f"{len(differ)} differ from full scoring")
+    for i in differ[:5]:
+        print(f"    full={full[i]['verdict']} reused={indexed[i]['verdict']}: {messages[i][:70]!r}")
+    print(f"  {near_duplicate_index.stats()}")
+
+    _lookups(args.clusters, rng)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Insert and query latency on a url_checks table with months of history:
+everything in the live table vs finished months rotated out
+(dashboard/partitions.py).
+
+Both databases get the same --months x --rows-per-month history; the
+rotated one then runs partitions.rotate(). Measured on each: the size of the
+live table's indexes, 500-row batch inserts of new checks (what a
+write-behind flush does) with a small page cache, and the first history
+page for a verdict.
+
+    python -m benchmarks.bench_partitions [--months 12] [--rows-per-month 300000]
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, insert, text
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, URLCheck, create_db_engine
+from dashboard import partitions
+from dashboard.history import list_history
+
+CHUNK = 100_000
+BATCH = 500
+
+
+def _populate(engine, months: int, rows_per_month: int) -> None:
+    rng = random.Random(11)
+    now = datetime.utcnow()
+    total = months * rows_per_month
+    step = months * 30 * 24 * 3600 / total
+    verdicts = ["safe"] * 8 + ["suspicious", "phishing"]
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        for offset in range(0, total, CHUNK):
+            batch = []
+            for i in range(offset, min(total, offset + CHUNK)):
+                verdict = rng.choice(verdicts)
+                domain = f"site-{rng.randrange(10 ** 6)}.example.com"
+                checked_at = now - timedelta(seconds=(total - i) * step)
+                batch.append((f"https://{domain}/{rng.randrange(10 ** 9)}", domain, str(verdict != "safe"), "bench",
+                              verdict, checked_at.strftime("%Y-%m-%d %H:%M:%S.%f")))
+            cursor.executemany(
+                "INSERT INTO url_checks (url, domain, flagged, reason, verdict, checked_at) VALUES (?, ?, ?, ?, ?, ?)",
+                batch,
+            )
+            raw.commit()
+    finally:
+        raw.close()
+
+
+def _live_index_mib(engine) -> float:
+    with engine.connect() as conn:
+        size = conn.execute(text(
+            "SELECT SUM(pgsize) FROM dbstat WHERE name IN "
+            "(SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'url_checks')"
+        )).scalar()
+    return (size or 0) / 2 ** 20
+
+
+def _insert_batches(session_factory, batches: int):
+    rng = random.Random(13)
+    timings = []
+    for _ in range(batches):
+        rows = []
+        for _ in range(BATCH):
+            domain = f"site-{rng.randrange(10 ** 6)}.example.com"
+            rows.append({"url": f"https://{domain}/{rng.randrange(10 ** 9)}", "domain": domain, "flagged": "False",
+                         "reason": "bench", "verdict": "safe", "checked_at": datetime.utcnow()})
+        start = time.perf_counter()
+        with session_factory() as db:
+            db.execute(insert(URLCheck), rows)
+            db.commit()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--months", type=int, default=12)
+    parser.add_argument("--rows-per-month", type=int, default=300_000)
+    parser.add_argument("--batches", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in ("single table", "rotated"):
+            engine = create_db_engine(f"sqlite:///{os.path.join(tmp, name.replace(' ', '_'))}.db")
+            # a small page cache, as when the table no longer fits in memory
+            event.listen(engine, "connect", lambda conn, _: conn.execute("PRAGMA cache_size = -8000"))
+            Base.metadata.create_all(bind=engine)
+            session_factory = sessionmaker(bind=engine)
+            _populate(engine, args.months, args.rows_per_month)
+            if name == "rotated":
+                start = time.perf_counter()
+                partitions.rotate(URLCheck, session_factory)
+                print(f"rotation took {time.perf_counter() - start:.1f}s")
+
+            timings = sorted(_insert_batches(session_factory, args.batches))
+            with session_factory() as db:
+                start = time.perf_counter()
+                list_history(db, "urls", 50, verdict="phishing")
+                page_ms = (time.perf_counter() - start) * 1000
+            print(f"{name:12s} live indexes={_live_index_mib(engine):7.1f}MiB  "
+                  f"insert {BATCH} rows p50={statistics.median(timings):6.2f}ms "
+                  f"p99={timings[int(len(timings) * 0.99) - 1]:6.2f}ms  history page={page_ms:5.2f}ms")
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
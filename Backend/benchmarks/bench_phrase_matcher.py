@@ -0,0 +1,65 @@
+"""Phrase matching cost vs number of phrases: per-phrase ``in`` scans
+(the old message rules) against the shared Aho-Corasick engine.
+
+    python -m benchmarks.bench_phrase_matcher [--messages 2000]
+"""
+import argparse
+import csv
+import os
+import random
+import time
+
+from benchmarks._common import BACKEND_DIR
+from detection.message_risk_engine import HIGH_RISK_PATTERNS, MEDIUM_RISK_PATTERNS
+from detection.phrase_matcher import PhraseEngine
+
+
+def _messages(n: int):
+    with open(os.path.join(BACKEND_DIR, "training", "message_dataset.csv"), encoding="utf-8", newline="") as f:
+        texts = [row["text"] for row in csv.DictReader(f)]
+    return (texts * (n // len(texts) + 1))[:n]
+
+
+def _phrases(n: int, rng: random.Random):
+    words = "account verify urgent bank login password secure update click confirm prize winner refund parcel otp".split()
+    phrases = list(HIGH_RISK_PATTERNS + MEDIUM_RISK_PATTERNS)
+    while len(phrases) < n:
+        phrases.append(" ".join(rng.choice(words) + rng.choice(["", "s", "ed", "ing"]) for _ in range(rng.randint(2, 4))))
+    return phrases[:n]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    messages = _messages(args.messages)
+
+    for n in (10, 1_000, 10_000):
+        phrases = _phrases(n, rng)
+
+        start = time.perf_counter()
+        for message in messages:
+            lowered = message.lower()
+            [p for p in phrases if p in lowered]
+        naive = (time.perf_counter() - start) / len(messages)
+
+        engine = PhraseEngine()
+        start = time.perf_counter()
+        engine.update({"bench": (1, phrases)})
+        build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for message in messages:
+            engine.find_all(message)
+        automaton = (time.perf_counter() - start) / len(messages)
+
+        print(
+            f"{n:6d} phrases  naive={naive * 1e6:9.1f}us/msg  automaton={automaton * 1e6:7.1f}us/msg  "
+            f"build={build * 1000:7.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
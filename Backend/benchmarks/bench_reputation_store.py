@@ -0,0 +1,80 @@
+"""Memory and lookup throughput of the reputation store at 1M blacklist entries.
+
+Builds a synthetic feed of --domains random registrable domains, loads it
+through FileSource exactly like a real feed, then measures
+
+- Python heap held by the snapshot (tracemalloc),
+- is_blocked() throughput for listed domains, subdomains of listed domains
+  and unlisted domains,
+- the old linear ``endswith`` scan on a 10k-entry list for comparison.
+
+    python -m benchmarks.bench_reputation_store [--domains 1000000]
+"""
+import argparse
+import os
+import random
+import string
+import tempfile
+import time
+import tracemalloc
+
+from detection.reputation import LIST_FILES, DomainReputationStore, FileSource
+
+TLDS = ["com", "net", "org", "co.za", "xyz", "info", "site", "online"]
+
+
+def _domain(rng: random.Random) -> str:
+    name = "".join(rng.choice(string.ascii_lowercase + string.digits + "-") for _ in range(rng.randint(6, 18)))
+    return f"{name.strip('-') or 'x'}.{rng.choice(TLDS)}"
+
+
+def _rate(fn, items) -> float:
+    start = time.perf_counter()
+    for item in items:
+        fn(item)
+    return len(items) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--domains", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=200_000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    feed = [_domain(rng) for _ in range(args.domains)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, LIST_FILES["blocked"]), "w", encoding="utf-8") as f:
+            f.write("\n".join(feed))
+
+        store = DomainReputationStore(FileSource(directory))
+        tracemalloc.start()
+        start = time.perf_counter()
+        store.reload(force=True)
+        load_s = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        current = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+    print(f"{len(store.snapshot.blocked):,} blocked domains  load={load_s:.2f}s  "
+          f"heap={current / 2**20:.1f}MB (peak during load {peak / 2**20:.1f}MB)")
+
+    listed = [rng.choice(feed) for _ in range(args.lookups)]
+    subdomains = [f"login.secure.{d}" for d in listed]
+    unlisted = [f"www.{_domain(rng)}" for _ in range(args.lookups)]
+
+    for label, items in (("listed", listed), ("subdomain", subdomains), ("unlisted", unlisted)):
+        print(f"is_blocked {label:9s} {_rate(store.is_blocked, items) / 1e6:6.2f}M lookups/s")
+
+    linear = feed[:10_000]
+    sample = unlisted[:2_000]
+
+    def linear_scan(domain):
+        return domain in linear or any(domain.endswith("." + d) for d in linear)
+
+    print(f"old linear scan (10k entries) {_rate(linear_scan, sample):10.0f} lookups/s")
+
+
+if __name__ == "__main__":
+    main()
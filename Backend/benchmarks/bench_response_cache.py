@@ -0,0 +1,134 @@
+"""Admin read endpoints with and without dashboard/response_cache.py.
+
+A throwaway SQLite database gets --rows url and message checks through the
+write-behind queue, so the counters, rollups and domain sketches are filled
+the way the app fills them. Then /admin/stats, /admin/analytics and
+/admin/recent-checks are called in-process (TestClient) three ways: cache
+off (every call computes), cache hit (200 from the cache) and revalidation
+(If-None-Match, 304).
+
+A second pass mixes in writes: --dashboards clients poll all three
+endpoints every --poll seconds with their last ETag while a flush of checks
+commits every --flush seconds, for --seconds. It reports the hit rate and
+how many polls were answered 304.
+
+    python -m benchmarks.bench_response_cache [--rows 200000] [--dashboards 20]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from benchmarks._common import latency_summary
+
+ENDPOINTS = ["/admin/stats", "/admin/analytics", "/admin/recent-checks"]
+
+
+def _rows(count: int, rng: random.Random, days: int = 30):
+    from database import MessageCheck, URLCheck
+
+    now = datetime.utcnow()
+    urls, messages = [], []
+    for i in range(count):
+        flagged = rng.random() < 0.2
+        checked_at = now - timedelta(seconds=rng.randrange(days * 86400))
+        if i % 4:
+            domain = f"site-{rng.randrange(5000)}.example.com"
+            urls.append({"url": f"https://{domain}/p/{i}", "domain": domain, "flagged": str(flagged),
+                         "reason": "bench", "verdict": "phishing" if flagged else "safe", "checked_at": checked_at})
+        else:
+            messages.append({"message": f"bench message {i}", "flagged": str(flagged), "reason": "bench",
+                             "verdict": "phishing" if flagged else "safe", "checked_at": checked_at})
+    return {URLCheck: urls, MessageCheck: messages}
+
+
+def _write(write_behind, rows_by_model) -> None:
+    for model, rows in rows_by_model.items():
+        write_behind.enqueue_many(model, rows)
+    write_behind.flush()
+
+
+def _time_calls(client, path, headers, calls: int):
+    timings, status = [], None
+    for _ in range(calls):
+        start = time.perf_counter()
+        status = client.get(path, headers=headers).status_code
+        timings.append(time.perf_counter() - start)
+    return timings, status
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--dashboards", type=int, default=20)
+    parser.add_argument("--poll", type=float, default=1.0, help="seconds between polls per dashboard")
+    parser.add_argument("--flush", type=float, default=0.2, help="seconds between committed writes")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'cache.db')}"
+        from fastapi.testclient import TestClient
+
+        import main as app_main
+        from dashboard.response_cache import response_cache
+        from utils.write_behind import write_behind
+
+        rng = random.Random(11)
+        with TestClient(app_main.app) as client:
+            start = time.perf_counter()
+            for offset in range(0, args.rows, 10_000):
+                _write(write_behind, _rows(min(10_000, args.rows - offset), rng))
+            print(f"populated {args.rows} checks in {time.perf_counter() - start:.1f}s")
+            token = client.post("/admin/login", json={"username": app_main.ADMIN_USERNAME,
+                                                      "password": app_main.ADMIN_PASSWORD}).json()["access_token"]
+            auth = {"Authorization": f"Bearer {token}"}
+
+            for path in ENDPOINTS:
+                response_cache.set_enabled(False)
+                off, _ = _time_calls(client, path, auth, args.calls)
+                response_cache.set_enabled(True)
+                etag = client.get(path, headers=auth).headers["etag"]
+                hit, _ = _time_calls(client, path, auth, args.calls)
+                revalidated, status = _time_calls(client, path, {**auth, "If-None-Match": etag}, args.calls)
+                print(path)
+                print(f"  cache off   : {latency_summary(off)}")
+                print(f"  cache hit   : {latency_summary(hit)}")
+                print(f"  revalidate  : {latency_summary(revalidated)}  -> {status}")
+
+            response_cache.clear()
+            before = response_cache.stats()
+            etags = [dict() for _ in range(args.dashboards)]
+            statuses = {200: 0, 304: 0}
+            next_poll = [time.perf_counter() + args.poll * i / args.dashboards for i in range(args.dashboards)]
+            next_flush = time.perf_counter()
+            end = time.perf_counter() + args.seconds
+            while time.perf_counter() < end:
+                now = time.perf_counter()
+                if now >= next_flush:
+                    _write(write_behind, _rows(50, rng, days=1))
+                    next_flush += args.flush
+                for d in range(args.dashboards):
+                    if now < next_poll[d]:
+                        continue
+                    for path in ENDPOINTS:
+                        headers = {**auth, "If-None-Match": etags[d][path]} if path in etags[d] else auth
+                        response = client.get(path, headers=headers)
+                        statuses[response.status_code] += 1
+                        etags[d][path] = response.headers["etag"]
+                    next_poll[d] += args.poll
+                time.sleep(0.001)
+            after = response_cache.stats()
+
+    hits, misses = after["hits"] - before["hits"], after["misses"] - before["misses"]
+    print(f"{args.dashboards} dashboards polling every {args.poll:g}s, a write every {args.flush:g}s, "
+          f"{args.seconds:g}s:")
+    print(f"  {hits + misses} requests, hit rate {hits / max(1, hits + misses):.0%}, "
+          f"{statuses[304]} answered 304, {statuses[200]} answered 200")
+
+
+if __name__ == "__main__":
+    main()
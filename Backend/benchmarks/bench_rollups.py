@@ -0,0 +1,101 @@
+"""Trend queries over a synthetic url_checks table: GROUP BY date(checked_at)
+on the raw rows (what /admin/analytics did) vs the check_rollups table.
+
+Rows are spread evenly over the last year. Building 10M rows takes several
+minutes on SQLite; pass --rows for a quicker run.
+
+    python -m benchmarks.bench_rollups [--rows 10000000] [--db /tmp/rollups.db]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, URLCheck, create_db_engine
+from dashboard.rollups import backfill_rollups, get_trend
+
+CHUNK = 100_000
+
+
+def _populate(engine, rows: int) -> None:
+    rng = random.Random(3)
+    now = datetime.utcnow()
+    span = 365 * 24 * 3600
+    verdicts = ["safe"] * 8 + ["suspicious", "phishing"]
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        for offset in range(0, rows, CHUNK):
+            batch = []
+            for i in range(offset, min(rows, offset + CHUNK)):
+                verdict = rng.choice(verdicts)
+                checked_at = now - timedelta(seconds=rng.randrange(span))
+                batch.append((f"https://site-{i % 50000}.example.com/p", str(verdict != "safe"), "bench",
+                              verdict, checked_at.strftime("%Y-%m-%d %H:%M:%S.%f")))
+            cursor.executemany(
+                "INSERT INTO url_checks (url, flagged, reason, verdict, checked_at) VALUES (?, ?, ?, ?, ?)", batch
+            )
+            raw.commit()
+    finally:
+        raw.close()
+
+
+def _time(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--db", default=None, help="reuse/create this SQLite file instead of a temporary one")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.db or os.path.join(tmp, "rollups.db")
+        engine = create_db_engine(f"sqlite:///{path}")
+        Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(bind=engine)
+
+        with session_factory() as db:
+            existing = db.query(func.count(URLCheck.id)).scalar()
+        if existing < args.rows:
+            start = time.perf_counter()
+            _populate(engine, args.rows - existing)
+            print(f"populated {args.rows - existing} rows in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        buckets = backfill_rollups(session_factory)
+        print(f"backfill: {buckets} buckets in {time.perf_counter() - start:.1f}s")
+
+        now = datetime.utcnow()
+        with session_factory() as db:
+            for days in (7, 30, 365):
+                since = now - timedelta(days=days)
+
+                def raw():
+                    return (
+                        db.query(func.date(URLCheck.checked_at), func.count(URLCheck.id))
+                        .filter(URLCheck.checked_at >= since)
+                        .group_by(func.date(URLCheck.checked_at))
+                        .all()
+                    )
+
+                def rollup():
+                    return get_trend(db, since, check_type="url", granularity="day")
+
+                print(f"{days:4d} days  raw GROUP BY={_time(raw) * 1000:10.1f}ms  rollups={_time(rollup) * 1000:7.2f}ms")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Typosquat check cost vs number of brands: a per-brand edit-distance loop
+against the deletion index in detection/typosquat.py. First, the default
+brand list against known lookalikes, which must be flagged, and ordinary
+words near a short brand, which must not.
+
+    python -m benchmarks.bench_typosquat [--domains 2000]
+"""
+import argparse
+import random
+import string
+import time
+
+from detection.reputation import DEFAULT_BRANDS
+from detection.typosquat import BrandIndex, edit_distance, max_distance, skeleton
+
+LOOKALIKES = [
+    "paypa1.com", "arnazon.com", "g00gle.com", "rnicrosoft.com", "micosoft.com", "paypal-login.net",
+    "paypall.com", "gogle.com", "amazn.com", "aple.com",
+]
+# one edit from a short brand, but words in their own right (TYPOSQUAT_ALLOWED_WORDS)
+ORDINARY = ["apply.co.za", "ample.com", "appel.com", "amazin.com", "goggle.com", "absent.co.za"]
+
+
+def _brands(n: int, rng: random.Random):
+    brands = list(DEFAULT_BRANDS)
+    while len(brands) < n:
+        brands.append("".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 12))))
+    return brands[:n]
+
+
+def _typo(word: str, rng: random.Random) -> str:
+    i = rng.randrange(len(word))
+    op = rng.choice("sdit")
+    if op == "s":
+        return word[:i] + rng.choice(string.ascii_lowercase) + word[i + 1:]
+    if op == "d" and len(word) > 3:
+        return word[:i] + word[i + 1:]
+    if op == "t" and i < len(word) - 1:
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    return word[:i] + rng.choice(string.ascii_lowercase) + word[i:]
+
+
+def _domains(n: int, brands, rng: random.Random):
+    domains = []
+    for _ in range(n):
+        kind = rng.random()
+        if kind < 0.6:
+            # ordinary traffic: unrelated names
+            name = "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(5, 14)))
+        elif kind < 0.8:
+            name = _typo(rng.choice(brands), rng)
+        else:
+            name = rng.choice(brands) + "-" + rng.choice(["login", "secure", "verify"])
+        domains.append(name + rng.choice([".com", ".net", ".co.za"]))
+    return domains
+
+
+def _linear_match(domain: str, brands):
+    # What an unindexed check has to do: every brand, every token.
+    folded = skeleton(domain)
+    tokens = folded.replace("-", ".").split(".")
+    for brand in brands:
+        if brand in folded:
+            return brand
+        limit = max_distance(brand)
+        for token in tokens:
+            if edit_distance(token, brand, limit) <= limit:
+                return brand
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--domains", type=int, default=2000)
+    args = parser.parse_args()
+
+    index = BrandIndex(DEFAULT_BRANDS)
+    missed = [domain for domain in LOOKALIKES if index.match(domain) is None]
+    false_positives = [(domain, index.match(domain).brand) for domain in ORDINARY if index.match(domain) is not None]
+    print(f"default brands: {len(LOOKALIKES) - len(missed)}/{len(LOOKALIKES)} lookalikes flagged (missed {missed}), "
+          f"false positives {false_positives}")
+
+    rng = random.Random(11)
+    for n in (10, 1_000, 10_000):
+        brands = _brands(n, rng)
+        domains = _domains(args.domains, brands, rng)
+
+        linear_domains = domains[: max(50, args.domains // (n // 10 + 1))]
+        start = time.perf_counter()
+        for domain in linear_domains:
+            _linear_match(domain, brands)
+        linear = (time.perf_counter() - start) / len(linear_domains)
+
+        start = time.perf_counter()
+        index = BrandIndex(brands)
+        build = time.perf_counter() - start
+
+        hits = 0
+        start = time.perf_counter()
+        for domain in domains:
+            hits += index.match(domain) is not None
+        indexed = (time.perf_counter() - start) / len(domains)
+
+        print(
+            f"{n:6d} brands  linear={linear * 1e6:10.1f}us/domain  indexed={indexed * 1e6:7.1f}us/domain  "
+            f"build={build * 1000:8.1f}ms  flagged={hits}/{len(domains)}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Check-log persistence on SQLite: per-request commit vs write-behind.
+
+Worker threads play the request handlers and each writes one URLCheck row
+per "request", either with its own session + commit (the old endpoints) or
+by enqueueing it on a WriteBehindQueue. Throughput counts the request path
+only; "durable" adds the time until the last row is committed.
+
+    python -m benchmarks.bench_write_behind [--requests 5000] [--threads 16]
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks._common import latency_summary
+from database import Base, URLCheck
+from utils.write_behind import WriteBehindQueue
+
+
+def _row(i: int):
+    return {"url": f"https://example-{i}.com/login", "flagged": "False",
+            "reason": "ML model sees low risk (p=0.12)", "checked_at": datetime.utcnow()}
+
+
+def _drive(handle, requests: int, threads: int):
+    latencies = []
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def worker():
+        mine = []
+        for i in counter:
+            start = time.perf_counter()
+            handle(i)
+            mine.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(mine)
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return latencies, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--threads", type=int, default=16)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in ("per-request commit", "write-behind"):
+            engine = create_engine(f"sqlite:///{os.path.join(tmp, name.replace(' ', '_'))}.db",
+                                   connect_args={"check_same_thread": False, "timeout": 30})
+            Base.metadata.create_all(bind=engine)
+            session_factory = sessionmaker(bind=engine)
+
+            if name == "write-behind":
+                queue = WriteBehindQueue(session_factory, enabled=True)
+                queue.start()
+
+                def handle(i):
+                    queue.enqueue(URLCheck, _row(i))
+            else:
+                queue = None
+
+                def handle(i):
+                    db = session_factory()
+                    try:
+                        db.add(URLCheck(**_row(i)))
+                        db.commit()
+                    finally:
+                        db.close()
+
+            started = time.perf_counter()
+            latencies, elapsed = _drive(handle, args.requests, args.threads)
+            if queue is not None:
+                queue.stop()
+            durable = time.perf_counter() - started
+
+            with session_factory() as db:
+                rows = db.execute(select(func.count(URLCheck.id))).scalar()
+            print(f"{name:19s} {latency_summary(latencies)}  throughput={args.requests / elapsed:9.1f} req/s  "
+                  f"durable={durable:6.2f}s  rows={rows}")
+            if queue is not None:
+                stats = queue.stats()
+                print(f"{'':19s} flushes={stats['flushes']}  mean rows/flush={stats['flush_rows']['mean']}  "
+                      f"mean flush={stats['flush_ms']['mean']}ms  sync fallbacks={stats['sync_writes']}")
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Concurrency stress test for the SQLite configuration.
+
+Writer threads insert check rows one commit at a time (the worst case:
+write-behind disabled) while reader threads run the admin dashboard's
+counting queries, against a local SQLite file. Run once with the old engine
+(rollback journal, driver defaults) and once with database.create_db_engine
+(WAL, synchronous=NORMAL, busy timeout, mmap, instrumented pool).
+
+    python -m benchmarks.stress_sqlite [--seconds 10] [--writers 8] [--readers 8] [--db /tmp/stress.db]
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks._common import latency_summary
+from database import Base, PoolMetrics, URLCheck, create_db_engine
+
+
+def _run(engine, seconds: float, writers: int, readers: int):
+    session_factory = sessionmaker(bind=engine)
+    stop = time.monotonic() + seconds
+    lock = threading.Lock()
+    results = {"write": [], "read": [], "locked": 0, "errors": 0}
+
+    def record(kind, latency=None, error=None):
+        with lock:
+            if error is None:
+                results[kind].append(latency)
+            elif "locked" in str(error):
+                results["locked"] += 1
+            else:
+                results["errors"] += 1
+
+    def writer(n):
+        i = 0
+        while time.monotonic() < stop:
+            start = time.perf_counter()
+            try:
+                with session_factory() as db:
+                    db.add(URLCheck(url=f"https://stress-{n}-{i}.example.com", flagged="False",
+                                    reason="stress", checked_at=datetime.utcnow()))
+                    db.commit()
+                record("write", time.perf_counter() - start)
+            except OperationalError as e:
+                record("write", error=e)
+            i += 1
+
+    def reader():
+        while time.monotonic() < stop:
+            start = time.perf_counter()
+            try:
+                with session_factory() as db:
+                    db.execute(select(func.count(URLCheck.id))).scalar()
+                    db.execute(select(func.count(URLCheck.id)).where(URLCheck.flagged == "True")).scalar()
+                record("read", time.perf_counter() - start)
+            except OperationalError as e:
+                record("read", error=e)
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(writers)]
+    threads += [threading.Thread(target=reader) for _ in range(readers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--db", default=None, help="SQLite file to use (default: a temporary file)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in ("default", "tuned"):
+            path = args.db or os.path.join(tmp, f"stress_{name}.db")
+            for suffix in ("", "-wal", "-shm", "-journal"):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+            url = f"sqlite:///{path}"
+
+            metrics = PoolMetrics()
+            if name == "default":
+                engine = create_engine(url, connect_args={"check_same_thread": False})
+            else:
+                engine = create_db_engine(url, metrics)
+            Base.metadata.create_all(bind=engine)
+
+            results = _run(engine, args.seconds, args.writers, args.readers)
+            print(f"{name:8s} writes={len(results['write']):6d} ({len(results['write']) / args.seconds:7.1f}/s)  "
+                  f"reads={len(results['read']):6d} ({len(results['read']) / args.seconds:7.1f}/s)  "
+                  f"'database is locked'={results['locked']}  other errors={results['errors']}")
+            print(f"{'':8s} write {latency_summary(results['write'])}")
+            print(f"{'':8s} read  {latency_summary(results['read'])}")
+            if name == "tuned":
+                wait = metrics.as_dict()["checkout_wait_ms"]
+                print(f"{'':8s} pool checkout wait mean={wait['mean']}ms max={wait['max']}ms")
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""O(1) dashboard totals.
+
+/admin/stats and /dashboard/overview used to run COUNT(*) over the raw check
+tables on every poll. The totals now live in ``check_counters`` (one row per
+counter) and are bumped by a write-behind flush hook in the same transaction
+that inserts the rows, so they can't disagree with a committed batch.
+
+Anything that writes the raw tables outside the write-behind queue (manual
+SQL, imports) makes the counters drift; reconcile_counters() recomputes them
+from the raw tables, rotated months included. It runs at startup when the
+table is empty, every COUNTERS_RECONCILE_SECONDS in the background (0
+disables), from POST /admin/counters/reconcile and from the command line:
+
+    python -m dashboard.counters reconcile
+
+The retention job (dashboard/partitions.py) subtracts the rows it drops with
+adjust_counter(), so the totals count retained rows.
+"""
+import os
+import sys
+import threading
+from datetime import datetime
+from typing import Dict
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from database import CheckCounter, MessageCheck, ReportContent, SessionLocal, URLCheck, tables_for, upsert
+from dashboard.response_cache import response_cache
+from utils.logger import logger
+from utils.write_behind import write_behind
+
+COUNTERS_RECONCILE_SECONDS = float(os.getenv("COUNTERS_RECONCILE_SECONDS", "21600"))
+
+# counter name -> (model, flagged only)
+COUNTERS = {
+    "url_checks.total": (URLCheck, False),
+    "url_checks.flagged": (URLCheck, True),
+    "message_checks.total": (MessageCheck, False),
+    "message_checks.flagged": (MessageCheck, True),
+    "report_contents.total": (ReportContent, False),
+}
+
+
+def counter_deltas(rows_by_model) -> Dict[str, int]:
+    """How much each counter grows by for a batch of inserted rows."""
+    deltas = {}
+    for name, (model, flagged_only) in COUNTERS.items():
+        rows = rows_by_model.get(model)
+        if not rows:
+            continue
+        count = sum(1 for row in rows if row.get("flagged") == "True") if flagged_only else len(rows)
+        if count:
+            deltas[name] = count
+    return deltas
+
+
+def _upsert(db, name: str, delta: int, absolute: bool = False) -> None:
+    # one statement, so workers creating the same counter can't collide
+    row = {"name": name, "value": delta, "updated_at": datetime.utcnow()}
+    if absolute:
+        upsert(db, CheckCounter, [row], replace=("value", "updated_at"))
+    else:
+        upsert(db, CheckCounter, [row], increments=("value",), replace=("updated_at",))
+
+
+def adjust_counter(db, name: str, delta: int) -> None:
+    """For jobs that delete raw rows in bulk (retention), in their transaction."""
+    if delta:
+        _upsert(db, name, delta)
+
+
+def record_inserts(db, rows_by_model) -> None:
+    """Write-behind flush hook: bump the counters for the rows just inserted."""
+    for name, delta in counter_deltas(rows_by_model).items():
+        _upsert(db, name, delta)
+
+
+def read_counters(db) -> Dict[str, int]:
+    values = dict(db.execute(select(CheckCounter.name, CheckCounter.value)).all())
+    return {name: int(values.get(name, 0)) for name in COUNTERS}
+
+
+def _count(db, model, flagged_only: bool) -> int:
+    total = 0
+    # the live table plus any rotated months (dashboard/partitions.py)
+    for table in tables_for(db.get_bind(), model):
+        query = select(func.count()).select_from(table)
+        if flagged_only:
+            query = query.where(table.c.flagged == "True")
+        total += db.execute(query).scalar()
+    return total
+
+
+def reconcile_counters(session_factory=SessionLocal) -> Dict[str, dict]:
+    """Recomputes every counter from the raw tables. Returns the drift found."""
+    # No flush from this process may land between the counts and the rewrite.
+    with write_behind.exclusive():
+        db = session_factory()
+        try:
+            before = read_counters(db)
+            actual = {name: _count(db, model, flagged) for name, (model, flagged) in COUNTERS.items()}
+            for name, value in actual.items():
+                _upsert(db, name, value, absolute=True)
+            db.commit()
+        except SQLAlchemyError:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+    response_cache.invalidate()
+
+    drift = {name: {"counter": before[name], "actual": actual[name]}
+             for name in COUNTERS if before[name] != actual[name]}
+    if drift:
+        logger.warning(f"Counter drift corrected: {drift}")
+    return drift
+
+
+def ensure_counters(session_factory=SessionLocal) -> None:
+    """Seeds the counters from the raw tables the first time the app starts."""
+    db = session_factory()
+    try:
+        seeded = db.execute(select(func.count()).select_from(CheckCounter)).scalar()
+    finally:
+        db.close()
+    if not seeded:
+        reconcile_counters(session_factory)
+
+
+_stop = threading.Event()
+_job = None
+
+
+def start_reconcile_job(interval: float = COUNTERS_RECONCILE_SECONDS) -> None:
+    global _job
+    if _job is not None or interval <= 0:
+        return
+
+    def run():
+        while not _stop.wait(interval):
+            try:
+                reconcile_counters()
+            except SQLAlchemyError as e:
+                logger.error(f"Counter reconciliation failed: {e}")
+
+    _job = threading.Thread(target=run, name="counter-reconcile", daemon=True)
+    _job.start()
+
+
+def stop_reconcile_job() -> None:
+    _stop.set()
+
+
+write_behind.add_flush_hook(record_inserts)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["reconcile"]:
+        sys.exit("usage: python -m dashboard.counters reconcile")
+    print(reconcile_counters() or "Counters match the raw tables.")
@@ -1,5 +1,6 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from database import SessionLocal
+from dashboard.response_cache import response_cache
 from dashboard.dashboard_service import (
     get_overview_stats,
     get_top_targeted_domains,
@@ -19,20 +20,20 @@ def get_db():
 
 
 @router.get("/overview")
-def overview(db=Depends(get_db)):
-    return get_overview_stats(db)
+def overview(request: Request, db=Depends(get_db)):
+    return response_cache.respond(request, lambda: get_overview_stats(db))
 
 
 @router.get("/top-domains")
-def top_domains(db=Depends(get_db)):
-    return get_top_targeted_domains(db)
+def top_domains(request: Request, db=Depends(get_db)):
+    return response_cache.respond(request, lambda: get_top_targeted_domains(db))
 
 
 @router.get("/recent-attacks")
-def recent_attacks(db=Depends(get_db)):
-    return get_recent_attacks(db)
+def recent_attacks(request: Request, db=Depends(get_db)):
+    return response_cache.respond(request, lambda: get_recent_attacks(db))
 
 
 @router.get("/attack-trend")
-def attack_trend(db=Depends(get_db)):
-    return get_attack_trend(db)
+def attack_trend(request: Request, db=Depends(get_db)):
+    return response_cache.respond(request, lambda: get_attack_trend(db))
@@ -1,28 +1,19 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from database import URLCheck
+from dashboard.counters import read_counters
+from dashboard.rollups import get_trend
+from dashboard.heavy_hitters import domain_heavy_hitters
+from dashboard.history import list_history
 from datetime import datetime, timedelta
-from urllib.parse import urlparse
-
-
-def extract_domain(url: str):
-    try:
-        domain = urlparse(url).netloc.lower()
-        if domain.startswith("www."):
-            domain = domain[4:]
-        return domain
-    except:
-        return "unknown"
 
 
 # TOTAL STATS
 def get_overview_stats(db: Session):
 
-    total = db.query(URLCheck).count()
+    counters = read_counters(db)
 
-    phishing = db.query(URLCheck)\
-        .filter(URLCheck.flagged == "True")\
-        .count()
+    total = counters["url_checks.total"]
+
+    phishing = counters["url_checks.flagged"]
 
     safe = total - phishing
 
@@ -37,40 +28,26 @@ def get_overview_stats(db: Session):
 # MOST TARGETED DOMAINS
 def get_top_targeted_domains(db: Session, limit=10):
 
-    records = db.query(URLCheck.url).all()
-
-    domain_count = {}
-
-    for record in records:
-        domain = extract_domain(record.url)
-        domain_count[domain] = domain_count.get(domain, 0) + 1
-
-    sorted_domains = sorted(
-        domain_count.items(),
-        key=lambda x: x[1],
-        reverse=True
-    )
+    # Space-Saving sketches over the retained window (dashboard/heavy_hitters.py)
+    top = domain_heavy_hitters.top(limit, db=db)
 
     return [
-        {"domain": domain, "count": count}
-        for domain, count in sorted_domains[:limit]
+        {"domain": d["domain"], "count": d["count"]}
+        for d in top
     ]
 
 
 # RECENT ATTACKS
 def get_recent_attacks(db: Session, limit=10):
 
-    attacks = db.query(URLCheck)\
-        .filter(URLCheck.flagged == "True")\
-        .order_by(URLCheck.checked_at.desc())\
-        .limit(limit)\
-        .all()
+    # Newest flagged checks, live table first, then rotated months
+    attacks = list_history(db, "urls", limit, flagged=True)["items"]
 
     return [
         {
-            "url": attack.url,
-            "reason": attack.reason,
-            "checked_at": attack.checked_at
+            "url": attack["url"],
+            "reason": attack["reason"],
+            "checked_at": attack["checked_at"]
         }
         for attack in attacks
     ]
@@ -81,22 +58,13 @@ def get_attack_trend(db: Session):
 
     seven_days_ago = datetime.utcnow() - timedelta(days=7)
 
-    results = db.query(
-        func.date(URLCheck.checked_at),
-        func.count(URLCheck.id)
-    )\
-    .filter(
-        URLCheck.checked_at >= seven_days_ago,
-        URLCheck.flagged == "True"
-    )\
-    .group_by(func.date(URLCheck.checked_at))\
-    .all()
+    # Daily flagged URL checks from the rollup table
+    results = get_trend(db, seven_days_ago, check_type="url", granularity="day", flagged_only=True)
 
     return [
         {
-            "date": str(date),
-            "attacks": count
+            "date": str(bucket["bucket"].date()),
+            "attacks": bucket["flagged"]
         }
-        for date, count in results
+        for bucket in results
     ]
-
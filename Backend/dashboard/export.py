@@ -0,0 +1,226 @@
+"""Streaming bulk export of the check/report history.
+
+Rows are read with a server-side cursor (``yield_per``: psycopg2 named
+cursors on Postgres, SQLite steps its cursor anyway) EXPORT_CHUNK_ROWS at a
+time, oldest first on the (timestamp, id) index, and each chunk is encoded
+and handed on before the next is fetched, so memory stays flat however
+large the table is. The filters are the history API's (dashboard/history.py).
+Rotated months (dashboard/partitions.py) are read before the live table.
+
+Formats:
+- ``csv`` and ``ndjson``: every column.
+- ``parquet``: every column, one row group per chunk. Needs the optional
+  ``pyarrow`` package.
+- ``training``: ``text,label`` CSV as read by training/train_url_model.py
+  and train_message_model.py. Only rows with a phishing or safe verdict
+  are written; suspicious and pre-verdict rows have no usable label.
+
+The same generator backs GET /admin/export/{kind} and
+
+    python -m dashboard.export urls --format csv --out urls.csv [--since 2024-01-01] [--verdict phishing]
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+from datetime import datetime
+from typing import Iterator, List
+
+from sqlalchemy import select
+
+from dashboard.history import HISTORY_KINDS, apply_filters
+from database import SessionLocal, tables_for
+
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "5000"))
+
+EXPORT_FORMATS = ("csv", "ndjson", "parquet", "training")
+
+EXPORT_COLUMNS = {
+    "urls": ["id", "url", "domain", "flagged", "verdict", "reason", "checked_at"],
+    "messages": ["id", "message", "flagged", "verdict", "reason", "checked_at"],
+    "reports": ["id", "content_type", "content", "reported_at"],
+}
+
+# the column the models are trained on
+TRAINING_TEXT = {"urls": "url", "messages": "message"}
+
+TRAINING_LABELS = ("phishing", "safe")
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "training": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+class ExportError(ValueError):
+    pass
+
+
+def _columns(kind: str, fmt: str):
+    """Output names and the source column names."""
+    if fmt == "training":
+        if kind not in TRAINING_TEXT:
+            raise ExportError("the training format is only available for urls and messages")
+        return ["text", "label"], [TRAINING_TEXT[kind], "verdict"]
+    return EXPORT_COLUMNS[kind], EXPORT_COLUMNS[kind]
+
+
+def iter_chunks(
+    kind: str,
+    fmt: str = "csv",
+    session_factory=SessionLocal,
+    chunk_rows: int = EXPORT_CHUNK_ROWS,
+    **filters,
+) -> Iterator[List[tuple]]:
+    """Lists of up to ``chunk_rows`` row tuples, oldest first."""
+    _, sources = _columns(kind, fmt)
+    model, moment_name, _ = HISTORY_KINDS[kind]
+    db = session_factory()
+    try:
+        tables = tables_for(db.get_bind(), model, filters.get("start"), filters.get("end"))
+        for table in reversed(tables):
+            try:
+                query = apply_filters(select(*[table.c[name] for name in sources]), kind, table, **filters)
+            except ValueError as e:
+                raise ExportError(str(e)) from e
+            if fmt == "training":
+                query = query.where(table.c.verdict.in_(TRAINING_LABELS))
+            query = query.order_by(table.c[moment_name], table.c.id).execution_options(yield_per=chunk_rows)
+            for partition in db.execute(query).partitions():
+                yield partition
+    finally:
+        db.close()
+
+
+def _text_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _encode_csv(names, chunks) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(names)
+    for chunk in chunks:
+        writer.writerows([[_text_value(v) for v in row] for row in chunk])
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def _encode_ndjson(names, chunks) -> Iterator[bytes]:
+    for chunk in chunks:
+        lines = [json.dumps(dict(zip(names, map(_text_value, row)))) for row in chunk]
+        yield ("\n".join(lines) + "\n").encode()
+
+
+class _Drain(io.RawIOBase):
+    """Write-only file that hands over whatever has been written so far."""
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def take(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def _encode_parquet(names, chunks) -> Iterator[bytes]:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ExportError("parquet export needs the pyarrow package")
+
+    types = {"id": pa.int64(), "checked_at": pa.timestamp("us"), "reported_at": pa.timestamp("us")}
+    schema = pa.schema([(name, types.get(name, pa.string())) for name in names])
+    sink = _Drain()
+    with pq.ParquetWriter(sink, schema) as writer:
+        for chunk in chunks:
+            columns = list(zip(*chunk))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema
+            ))
+            yield sink.take()
+    yield sink.take()
+
+
+def export_stream(kind: str, fmt: str = "csv", session_factory=SessionLocal, **filters) -> Iterator[bytes]:
+    """
+    The export of ``kind`` as encoded byte chunks. Bad arguments raise
+    ExportError before anything is read, so callers can still refuse the
+    request.
+    """
+    if kind not in HISTORY_KINDS:
+        raise ExportError(f"unknown export kind: {kind!r}")
+    if fmt not in EXPORT_FORMATS:
+        raise ExportError(f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    names, _ = _columns(kind, fmt)
+    # validate the filters now; iter_chunks only runs once the body is iterated
+    try:
+        apply_filters(select(HISTORY_KINDS[kind][0].id), kind, **filters)
+    except ValueError as e:
+        raise ExportError(str(e)) from e
+    if fmt == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ExportError("parquet export needs the pyarrow package")
+
+    chunks = iter_chunks(kind, fmt, session_factory, **filters)
+    if fmt == "ndjson":
+        return _encode_ndjson(names, chunks)
+    if fmt == "parquet":
+        return _encode_parquet(names, chunks)
+    return _encode_csv(names, chunks)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m dashboard.export")
+    parser.add_argument("kind", choices=sorted(HISTORY_KINDS))
+    parser.add_argument("--format", default="csv", choices=EXPORT_FORMATS)
+    parser.add_argument("--out", default="-", help="output file (default: stdout)")
+    parser.add_argument("--since", type=datetime.fromisoformat)
+    parser.add_argument("--until", type=datetime.fromisoformat)
+    parser.add_argument("--verdict")
+    parser.add_argument("--flagged", type=lambda v: v.lower() in ("1", "true", "yes"))
+    parser.add_argument("--domain")
+    parser.add_argument("--content-type")
+    args = parser.parse_args(argv)
+
+    filters = {"start": args.since, "end": args.until, "verdict": args.verdict, "flagged": args.flagged,
+               "domain": args.domain, "content_type": args.content_type}
+    try:
+        stream = export_stream(args.kind, args.format, **filters)
+    except ExportError as e:
+        sys.exit(str(e))
+
+    out = sys.stdout.buffer if args.out == "-" else open(args.out, "wb")
+    try:
+        for data in stream:
+            out.write(data)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
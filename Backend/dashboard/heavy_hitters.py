@@ -0,0 +1,358 @@
+"""Top targeted domains in constant memory.
+
+/admin/analytics used to load every URL of the last 30 days and run
+extract_domain + Counter over them; dashboard_service loaded the whole
+url_checks table. Now the domain is stored with each row (url_checks.domain)
+and a Space-Saving sketch per UTC day is updated from a write-behind commit
+listener, so only committed rows are counted. A sketch keeps at most
+HEAVY_HITTER_CAPACITY domains; any domain with more than total/capacity
+checks that day is guaranteed to be in it, and each count overestimates by
+at most the recorded ``error``. Top-N over a range merges the day
+sketches.
+
+Every app process keeps its own sketches and persists them to
+``domain_sketches`` every HEAVY_HITTER_PERSIST_SECONDS and at shutdown;
+reads merge all persisted rows for the window (other workers' counts are at
+most one persist interval old) with the live in-memory ones. Days older than
+HEAVY_HITTER_WINDOW_DAYS are dropped.
+
+History from before the first start is counted once, under the fixed worker
+id SEED_WORKER: on an empty table, startup builds one sketch per day from
+the raw rows checked before a cutoff (recorded in the payload) and inserts
+them first-writer-wins, so workers starting together don't each count it.
+The seed always includes today's row, even if empty, to mark it done.
+
+exact_top_domains() runs the exact GROUP BY on the indexed column, for
+accuracy checks. Rows written before the domain column existed can be
+filled in with
+
+    python -m dashboard.heavy_hitters backfill-domains
+
+which then rebuilds the seed sketches from the raw rows before the seed's
+cutoff, so the filled-in history reaches the dashboard. Rows after the
+cutoff are the live sketches' and are never counted twice.
+"""
+import heapq
+import json
+import os
+import socket
+import sys
+import threading
+import uuid
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from dashboard.response_cache import response_cache
+from database import DomainSketch, SessionLocal, URLCheck, tables_for, upsert
+from detection.domain_utils import extract_domain
+from utils.logger import logger
+from utils.write_behind import write_behind
+
+HEAVY_HITTER_CAPACITY = int(os.getenv("HEAVY_HITTER_CAPACITY", "1000"))
+HEAVY_HITTER_WINDOW_DAYS = int(os.getenv("HEAVY_HITTER_WINDOW_DAYS", "30"))
+HEAVY_HITTER_PERSIST_SECONDS = float(os.getenv("HEAVY_HITTER_PERSIST_SECONDS", "60"))
+
+# domain_sketches.worker of the sketches seeded from history
+SEED_WORKER = "seed"
+
+
+class SpaceSaving:
+    """Space-Saving heavy hitters (Metwally et al.) over at most ``capacity`` items."""
+
+    def __init__(self, capacity: int = HEAVY_HITTER_CAPACITY):
+        self.capacity = capacity
+        self.total = 0
+        # item -> [count, error]
+        self._counters: Dict[str, List[int]] = {}
+        # lazy min-heap of (count, item); stale entries are skipped on pop
+        self._heap: List[Tuple[int, str]] = []
+
+    def __len__(self) -> int:
+        return len(self._counters)
+
+    def _push(self, item: str, count: int) -> None:
+        heapq.heappush(self._heap, (count, item))
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(c, i) for i, (c, _) in self._counters.items()]
+            heapq.heapify(self._heap)
+
+    def _pop_min(self) -> Tuple[str, int]:
+        while True:
+            count, item = heapq.heappop(self._heap)
+            current = self._counters.get(item)
+            if current is not None and current[0] == count:
+                return item, count
+
+    def add(self, item: str, count: int = 1) -> None:
+        self.total += count
+        counter = self._counters.get(item)
+        if counter is not None:
+            counter[0] += count
+        elif len(self._counters) < self.capacity:
+            counter = self._counters[item] = [count, 0]
+        else:
+            evicted, minimum = self._pop_min()
+            del self._counters[evicted]
+            counter = self._counters[item] = [minimum + count, minimum]
+        self._push(item, counter[0])
+
+    def items(self):
+        """(item, count, error) for every tracked item."""
+        return [(item, c[0], c[1]) for item, c in self._counters.items()]
+
+    def top(self, n: int):
+        return sorted(self.items(), key=lambda x: (-x[1], x[0]))[:n]
+
+    def to_json(self, **extra) -> str:
+        return json.dumps({"capacity": self.capacity, "total": self.total, "items": self.items(), **extra})
+
+
+def merge_top(item_lists, n: int) -> List[dict]:
+    """Sums (item, count, error) lists from several sketches into the top ``n``."""
+    counts: Dict[str, int] = {}
+    errors: Dict[str, int] = {}
+    for items in item_lists:
+        for item, count, error in items:
+            counts[item] = counts.get(item, 0) + count
+            errors[item] = errors.get(item, 0) + error
+    ranked = heapq.nsmallest(n, ((-count, item) for item, count in counts.items()))
+    return [{"domain": item, "count": -count, "max_error": errors[item]} for count, item in ranked]
+
+
+class DomainHeavyHitters:
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        capacity: int = HEAVY_HITTER_CAPACITY,
+        window_days: int = HEAVY_HITTER_WINDOW_DAYS,
+    ):
+        self.session_factory = session_factory
+        self.capacity = capacity
+        self.window_days = window_days
+        self.worker = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._days: Dict[date, SpaceSaving] = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._persister = None
+
+    def _window_start(self) -> date:
+        return datetime.utcnow().date() - timedelta(days=self.window_days - 1)
+
+    def record_inserts(self, rows_by_model) -> None:
+        """Write-behind commit listener."""
+        rows = rows_by_model.get(URLCheck)
+        if not rows:
+            return
+        oldest = self._window_start()
+        with self._lock:
+            for row in rows:
+                domain = row.get("domain")
+                checked_at = row.get("checked_at") or datetime.utcnow()
+                if not domain or checked_at.date() < oldest:
+                    continue
+                day = checked_at.date()
+                sketch = self._days.get(day)
+                if sketch is None:
+                    sketch = self._days[day] = SpaceSaving(self.capacity)
+                sketch.add(domain)
+                self._dirty.add(day)
+        # the response cache was invalidated by the same commit, possibly
+        # before these counts landed
+        response_cache.invalidate()
+
+    def top(self, n: int = 10, days: Optional[int] = None, db=None) -> List[dict]:
+        """Top ``n`` domains over the last ``days`` (default: the whole window)
+        as {"domain", "count", "max_error"}; ``count - max_error`` is a lower bound."""
+        days = min(days or self.window_days, self.window_days)
+        since = datetime.utcnow().date() - timedelta(days=days - 1)
+
+        session = db or self.session_factory()
+        try:
+            persisted = session.execute(
+                select(DomainSketch.payload)
+                .where(DomainSketch.day >= since.isoformat(), DomainSketch.worker != self.worker)
+            ).all()
+        finally:
+            if db is None:
+                session.close()
+
+        # the persisted items are merged as-is; no need to rebuild their heaps
+        item_lists = [json.loads(payload)["items"] for (payload,) in persisted]
+        with self._lock:
+            item_lists += [sketch.items() for day, sketch in self._days.items() if day >= since]
+            return merge_top(item_lists, n)
+
+    def persist(self) -> None:
+        """Writes this process's changed day sketches and prunes expired days."""
+        oldest = self._window_start()
+        with self._lock:
+            for day in [d for d in self._days if d < oldest]:
+                del self._days[day]
+            payloads = {day: self._days[day].to_json() for day in self._dirty if day in self._days}
+            self._dirty.clear()
+
+        db = self.session_factory()
+        try:
+            now = datetime.utcnow()
+            upsert(db, DomainSketch, [
+                {"day": day.isoformat(), "worker": self.worker, "payload": payload, "updated_at": now}
+                for day, payload in payloads.items()
+            ], replace=("payload", "updated_at"))
+            db.execute(delete(DomainSketch).where(DomainSketch.day < oldest.isoformat()))
+            db.commit()
+        except SQLAlchemyError as e:
+            db.rollback()
+            with self._lock:
+                self._dirty.update(payloads)
+            logger.warning(f"Persisting domain sketches failed: {e}")
+        finally:
+            db.close()
+
+    def _history(self, db, until: datetime) -> Dict[date, SpaceSaving]:
+        """One sketch per day of the window from the raw rows checked before ``until``."""
+        since = datetime.combine(self._window_start(), datetime.min.time())
+        days: Dict[date, SpaceSaving] = {}
+        for table in tables_for(db.get_bind(), URLCheck, since, until):
+            day_expr = func.date(table.c.checked_at)
+            rows = db.execute(
+                select(day_expr, table.c.domain, func.count())
+                .where(table.c.checked_at >= since, table.c.checked_at < until, table.c.domain.isnot(None),
+                       table.c.domain != "")
+                .group_by(day_expr, table.c.domain)
+                .execution_options(yield_per=10000)
+            )
+            for day, domain, count in rows:
+                day = day if isinstance(day, date) else date.fromisoformat(day)
+                sketch = days.get(day)
+                if sketch is None:
+                    sketch = days[day] = SpaceSaving(self.capacity)
+                sketch.add(domain, count)
+        # today's row marks the seed as done, even with no history
+        days.setdefault(datetime.utcnow().date(), SpaceSaving(self.capacity))
+        return days
+
+    def _seed_rows(self, days: Dict[date, SpaceSaving], cutoff: datetime) -> List[dict]:
+        now = datetime.utcnow()
+        return [
+            {"day": day.isoformat(), "worker": SEED_WORKER,
+             "payload": sketch.to_json(cutoff=cutoff.isoformat()), "updated_at": now}
+            for day, sketch in days.items()
+        ]
+
+    def seed_from_db(self) -> None:
+        """First start: the history before now as SEED_WORKER sketches. A
+        no-op once the table has any rows; concurrent seeds keep the first."""
+        db = self.session_factory()
+        try:
+            if db.execute(select(DomainSketch.day).limit(1)).first() is not None:
+                return
+            cutoff = datetime.utcnow()
+            upsert(db, DomainSketch, self._seed_rows(self._history(db, cutoff), cutoff))
+            db.commit()
+        except SQLAlchemyError:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def reseed(self) -> int:
+        """Rebuilds the SEED_WORKER sketches from the raw rows before the
+        seed's cutoff (after backfill_domains). Returns the days written."""
+        db = self.session_factory()
+        try:
+            payload = db.execute(
+                select(DomainSketch.payload).where(DomainSketch.worker == SEED_WORKER).limit(1)
+            ).scalar()
+            if payload is None:
+                # never seeded, or the seed aged out of the window
+                return 0
+            cutoff = datetime.fromisoformat(json.loads(payload)["cutoff"])
+            days = self._history(db, cutoff)
+            db.execute(delete(DomainSketch).where(DomainSketch.worker == SEED_WORKER))
+            upsert(db, DomainSketch, self._seed_rows(days, cutoff))
+            db.commit()
+            return len(days)
+        except SQLAlchemyError:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def start_persister(self, interval: float = HEAVY_HITTER_PERSIST_SECONDS) -> None:
+        if self._persister is not None or interval <= 0:
+            return
+
+        def run():
+            while not self._stop.wait(interval):
+                self.persist()
+
+        self._persister = threading.Thread(target=run, name="domain-sketch-persist", daemon=True)
+        self._persister.start()
+
+    def stop_persister(self) -> None:
+        self._stop.set()
+        self.persist()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "worker": self.worker,
+                "days": len(self._days),
+                "tracked_domains": sum(len(s) for s in self._days.values()),
+                "capacity_per_day": self.capacity,
+            }
+
+
+def exact_top_domains(db, since: datetime, n: int = 10) -> List[dict]:
+    """Exact GROUP BY over url_checks.domain (index range scan on checked_at)."""
+    count = func.count().label("count")
+    rows = db.execute(
+        select(URLCheck.domain, count)
+        .where(URLCheck.checked_at >= since, URLCheck.domain.isnot(None))
+        .group_by(URLCheck.domain)
+        .order_by(count.desc(), URLCheck.domain)
+        .limit(n)
+    ).all()
+    return [{"domain": domain, "count": c} for domain, c in rows]
+
+
+def backfill_domains(session_factory=SessionLocal, chunk: int = 10000) -> int:
+    """Fills url_checks.domain for rows written before the column existed."""
+    filled = 0
+    db = session_factory()
+    try:
+        tables = tables_for(db.get_bind(), URLCheck)
+    finally:
+        db.close()
+    for table in tables:
+        while True:
+            db = session_factory()
+            try:
+                rows = db.execute(
+                    select(table.c.id, table.c.url).where(table.c.domain.is_(None)).limit(chunk)
+                ).all()
+                if not rows:
+                    break
+                for row_id, url in rows:
+                    # "" marks rows whose URL has no parsable domain, so they aren't revisited
+                    db.execute(update(table).where(table.c.id == row_id).values(domain=extract_domain(url or "")))
+                db.commit()
+                filled += len(rows)
+            finally:
+                db.close()
+    return filled
+
+
+domain_heavy_hitters = DomainHeavyHitters()
+write_behind.add_commit_listener(domain_heavy_hitters.record_inserts)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["backfill-domains"]:
+        sys.exit("usage: python -m dashboard.heavy_hitters backfill-domains")
+    print(f"{backfill_domains()} rows updated")
+    print(f"{domain_heavy_hitters.reseed()} days of seed sketches rebuilt")
@@ -0,0 +1,150 @@
+"""Paginated, filterable history of URL checks, message checks and reports.
+
+Pages are keyset-paginated, newest first, on (timestamp, id): each page
+ends with an opaque ``next_cursor`` holding the last row's key, and the next
+page starts strictly after it. A page costs one index range scan from the
+cursor regardless of how deep it is, where OFFSET would walk and discard
+every earlier row; rows written while an analyst pages through don't shift
+the pages they haven't read yet.
+
+The composite indexes these queries use are declared on the models:
+(timestamp, id) for the unfiltered listing and (filter column, timestamp,
+id) for the verdict, domain and content type filters. Rows without a
+timestamp (none are written today) are not listed.
+
+Checks of finished months may have been rotated out of the live table
+(dashboard/partitions.py); a page reads the live table first and continues
+into the rotated months, newest first, until it is full. Months the range
+or the cursor rules out are not queried.
+"""
+import base64
+import json
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from sqlalchemy import and_, or_, select
+
+from database import MessageCheck, ReportContent, URLCheck, tables_for
+
+HISTORY_MAX_LIMIT = 500
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(moment: datetime, row_id: int) -> str:
+    raw = json.dumps([moment.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        moment, row_id = json.loads(raw)
+        return datetime.fromisoformat(moment), int(row_id)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor!r}") from e
+
+
+def _url_item(row) -> dict:
+    return {"id": row.id, "url": row.url, "domain": row.domain, "flagged": row.flagged,
+            "verdict": row.verdict, "reason": row.reason, "checked_at": row.checked_at}
+
+
+def _message_item(row) -> dict:
+    return {"id": row.id, "message": row.message, "flagged": row.flagged,
+            "verdict": row.verdict, "reason": row.reason, "checked_at": row.checked_at}
+
+
+def _report_item(row) -> dict:
+    return {"id": row.id, "content_type": row.content_type, "content": row.content,
+            "reported_at": row.reported_at}
+
+
+# model, timestamp column name, row -> dict
+HISTORY_KINDS = {
+    "urls": (URLCheck, "checked_at", _url_item),
+    "messages": (MessageCheck, "checked_at", _message_item),
+    "reports": (ReportContent, "reported_at", _report_item),
+}
+
+
+def apply_filters(
+    query,
+    kind: str,
+    table=None,
+    verdict: Optional[str] = None,
+    flagged: Optional[bool] = None,
+    domain: Optional[str] = None,
+    content_type: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+):
+    """
+    Adds the history filters on ``table`` (default: the live table of
+    ``kind``) to ``query``. ``start`` is inclusive, ``end`` exclusive.
+    Filters that don't apply to ``kind`` raise ValueError.
+    """
+    model, moment_name, _ = HISTORY_KINDS[kind]
+    if (verdict is not None or flagged is not None) and model is ReportContent:
+        raise ValueError("reports have no verdict")
+    if domain is not None and model is not URLCheck:
+        raise ValueError("only URL checks can be filtered by domain")
+    if content_type is not None and model is not ReportContent:
+        raise ValueError("only reports can be filtered by content type")
+
+    columns = (model.__table__ if table is None else table).c
+    moment = columns[moment_name]
+    query = query.where(moment.isnot(None))
+    if verdict is not None:
+        query = query.where(columns.verdict == verdict)
+    if flagged is not None:
+        query = query.where(columns.flagged == str(flagged))
+    if domain is not None:
+        query = query.where(columns.domain == domain.lower())
+    if content_type is not None:
+        query = query.where(columns.content_type == content_type)
+    if start is not None:
+        query = query.where(moment >= start)
+    if end is not None:
+        query = query.where(moment < end)
+    return query
+
+
+def list_history(db, kind: str, limit: int = 50, cursor: Optional[str] = None, **filters) -> dict:
+    """
+    One page of ``kind`` ("urls", "messages" or "reports"), newest first:
+    {"items": [...], "next_cursor": str or None}. ``filters`` as for apply_filters().
+    """
+    model, moment_name, to_item = HISTORY_KINDS[kind]
+    limit = max(1, min(limit, HISTORY_MAX_LIMIT))
+    start, end = filters.get("start"), filters.get("end")
+    after = decode_cursor(cursor) if cursor is not None else None
+    if after is not None:
+        # only the tables at or before the cursor
+        cursor_end = after[0] + timedelta(microseconds=1)
+        end = cursor_end if end is None else min(end, cursor_end)
+
+    rows: List = []
+    for table in tables_for(db.get_bind(), model, start, end):
+        moment = table.c[moment_name]
+        query = apply_filters(select(table), kind, table, **filters)
+        if after is not None:
+            # the leading ``<=`` lets the planner range-scan the index; the OR
+            # breaks ties on equal timestamps by id
+            query = query.where(
+                moment <= after[0],
+                or_(moment < after[0], and_(moment == after[0], table.c.id < after[1])),
+            )
+        query = query.order_by(moment.desc(), table.c.id.desc()).limit(limit + 1 - len(rows))
+        rows += db.execute(query).all()
+        if len(rows) > limit:
+            break
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, moment_name), last.id)
+    return {"items": [to_item(row) for row in rows], "next_cursor": next_cursor}
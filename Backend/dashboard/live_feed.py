@@ -0,0 +1,205 @@
+"""Push feed for the admin dashboard.
+
+The dashboard used to re-run /admin/stats, /admin/recent-checks and
+/admin/analytics to see anything new, one set of queries per analyst per
+refresh. Now it loads them once and then follows GET /admin/live
+(server-sent events) or /admin/live/ws (WebSocket), which carry:
+
+- ``counters``: how much each dashboard counter grew (the counter names of
+  dashboard/counters.py);
+- ``checks``: the newest LIVE_FEED_MAX_CHECKS checks of the batch, shaped
+  like /admin/recent-checks items plus the verdict;
+- ``flagged``: every flagged check of the batch (up to LIVE_FEED_MAX_FLAGGED);
+- ``campaign``: FraudMonitor campaign alerts;
+- ``resync``: this subscriber fell LIVE_FEED_QUEUE events behind and lost
+  some; reload over REST.
+
+Events come from a write-behind commit listener, so the feed only shows
+committed rows and costs no queries. Each event is encoded once and fanned
+out on the event loop to per-subscriber bounded queues; a slow client only
+ever delays itself. With no subscribers, publishing is a no-op.
+
+The feed is per process: with several workers, each dashboard sees the
+checks its worker wrote.
+"""
+import asyncio
+import json
+import os
+import threading
+from collections import deque
+from typing import AsyncIterator, Dict, List, Optional
+
+from database import MessageCheck, URLCheck
+from dashboard.counters import counter_deltas
+from utils.write_behind import write_behind
+
+LIVE_FEED_QUEUE = int(os.getenv("LIVE_FEED_QUEUE", "256"))
+LIVE_FEED_MAX_SUBSCRIBERS = int(os.getenv("LIVE_FEED_MAX_SUBSCRIBERS", "1000"))
+LIVE_FEED_KEEPALIVE_SECONDS = float(os.getenv("LIVE_FEED_KEEPALIVE_SECONDS", "15"))
+LIVE_FEED_MAX_CHECKS = int(os.getenv("LIVE_FEED_MAX_CHECKS", "20"))
+LIVE_FEED_MAX_FLAGGED = int(os.getenv("LIVE_FEED_MAX_FLAGGED", "100"))
+
+
+class TooManySubscribers(Exception):
+    pass
+
+
+class Event:
+    """One published event, encoded once for every subscriber."""
+
+    __slots__ = ("name", "data", "sse")
+
+    def __init__(self, name: str, payload: Dict):
+        self.name = name
+        self.data = json.dumps({"type": name, **payload}, default=str)
+        self.sse = f"event: {name}\ndata: {self.data}\n\n".encode()
+
+
+RESYNC = Event("resync", {})
+
+
+class Subscriber:
+    __slots__ = ("pending", "ready", "dropped")
+
+    def __init__(self):
+        self.pending = deque()
+        self.ready = asyncio.Event()
+        self.dropped = 0
+
+
+class Broadcaster:
+    def __init__(self, queue_size: int = LIVE_FEED_QUEUE, max_subscribers: int = LIVE_FEED_MAX_SUBSCRIBERS,
+                 keepalive: float = LIVE_FEED_KEEPALIVE_SECONDS):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.keepalive = keepalive
+        # touched only on the event loop
+        self._subscribers = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+        self.published = 0
+        self.resyncs = 0
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self) -> Subscriber:
+        """Call on the event loop; the subscriber receives every later event."""
+        if len(self._subscribers) >= self.max_subscribers:
+            raise TooManySubscribers(f"{self.max_subscribers} live feed subscribers already connected")
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            loop.call_later(self.keepalive, self._heartbeat)
+        subscriber = Subscriber()
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def _heartbeat(self) -> None:
+        # One timer for everyone rather than a timeout per subscriber wait:
+        # idle subscribers get an empty batch to write as a keepalive.
+        for subscriber in self._subscribers:
+            subscriber.ready.set()
+        if not self._loop.is_closed():
+            self._loop.call_later(self.keepalive, self._heartbeat)
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        self._subscribers.discard(subscriber)
+
+    def publish(self, name: str, payload: Dict) -> None:
+        """Thread-safe. Returns at once; delivery happens on the event loop."""
+        loop = self._loop
+        if not self._subscribers or loop is None:
+            return
+        event = Event(name, payload)
+        with self._lock:
+            self.published += 1
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._fanout(event)
+            return
+        try:
+            loop.call_soon_threadsafe(self._fanout, event)
+        except RuntimeError:
+            # loop closed (shutdown)
+            pass
+
+    def _fanout(self, event: Event) -> None:
+        for subscriber in self._subscribers:
+            if len(subscriber.pending) >= self.queue_size:
+                subscriber.pending.clear()
+                subscriber.pending.append(RESYNC)
+                subscriber.dropped += 1
+                self.resyncs += 1
+            subscriber.pending.append(event)
+            subscriber.ready.set()
+
+    async def listen(self, subscriber: Subscriber) -> AsyncIterator[List[Event]]:
+        """The subscriber's events, everything pending at once so a client
+        that fell behind catches up in one write; [] on heartbeats
+        (every ``keepalive`` seconds) if nothing is pending."""
+        while True:
+            await subscriber.ready.wait()
+            subscriber.ready.clear()
+            events = list(subscriber.pending)
+            subscriber.pending.clear()
+            yield events
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "max_subscribers": self.max_subscribers,
+            "queue_size": self.queue_size,
+            "published": self.published,
+            "resyncs": self.resyncs,
+        }
+
+
+broadcaster = Broadcaster()
+
+
+async def sse_stream(subscriber: Subscriber) -> AsyncIterator[bytes]:
+    """text/event-stream body for one subscriber; unsubscribes when the client leaves."""
+    try:
+        yield b"retry: 3000\n\n"
+        async for events in broadcaster.listen(subscriber):
+            yield b"".join(event.sse for event in events) if events else b": keepalive\n\n"
+    finally:
+        broadcaster.unsubscribe(subscriber)
+
+
+def _check(kind: str, content: str, row: Dict) -> Dict:
+    return {
+        "type": kind,
+        "content": content,
+        "flagged": row["flagged"],
+        "verdict": row.get("verdict"),
+        "reason": row["reason"],
+        "checked_at": str(row["checked_at"]) if row.get("checked_at") else None,
+    }
+
+
+def publish_committed(rows_by_model) -> None:
+    """Write-behind commit listener."""
+    if not broadcaster.subscribers:
+        return
+    deltas = counter_deltas(rows_by_model)
+    if deltas:
+        broadcaster.publish("counters", {"deltas": deltas})
+
+    checks = [_check("url", row["url"], row) for row in rows_by_model.get(URLCheck, ())]
+    checks += [_check("message", row["message"], row) for row in rows_by_model.get(MessageCheck, ())]
+    if not checks:
+        return
+    checks.sort(key=lambda check: check["checked_at"] or "")
+    broadcaster.publish("checks", {"checks": checks[-LIVE_FEED_MAX_CHECKS:][::-1]})
+    flagged = [check for check in checks if check["flagged"] == "True"]
+    if flagged:
+        broadcaster.publish("flagged", {"checks": flagged[-LIVE_FEED_MAX_FLAGGED:][::-1]})
+
+
+write_behind.add_commit_listener(publish_committed)
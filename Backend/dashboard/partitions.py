@@ -0,0 +1,230 @@
+"""Monthly rotation, retention and archival of url_checks and message_checks.
+
+Both tables used to grow forever, and with them every index the inserts
+have to maintain. Now rows of finished months are moved out of the live
+tables into one table per month (``url_checks_2026_09``; same columns and
+indexes, see database.month_table) once they are PARTITION_LIVE_MONTHS old,
+so the live tables and their indexes only ever hold the last couple of
+months. The move runs a day at a time, each day in its own transaction.
+
+Rotated months past RETENTION_MONTHS_URL_CHECKS / RETENTION_MONTHS_MESSAGE_CHECKS
+(0 keeps them forever, the default) are written to
+PARTITION_ARCHIVE_DIR/<table>.ndjson.gz and dropped; the dashboard counters
+are decremented in the same transaction. Rollups and heavy-hitter sketches
+are kept, so trends still cover archived months.
+
+Queries that read raw rows go through database.tables_for(), which lists
+the live table plus the rotated months a time range touches: history and
+export pages, counter reconciliation, rollup backfills.
+
+This is the same scheme on SQLite and Postgres. Native Postgres
+partitioning would need (id, checked_at) primary keys on the parent tables.
+
+Maintenance runs every PARTITION_MAINTENANCE_SECONDS in the background (0
+disables) and from
+
+    python -m dashboard.partitions maintain
+"""
+import gzip
+import json
+import os
+import sys
+import threading
+from datetime import date, datetime, timedelta
+from typing import Dict, List
+
+from sqlalchemy import case, delete, func, insert, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from database import (
+    BASE_DIR,
+    MessageCheck,
+    PARTITIONED_MODELS,
+    SessionLocal,
+    URLCheck,
+    month_table,
+    rotated_tables,
+)
+from dashboard.counters import adjust_counter
+from dashboard.response_cache import response_cache
+from utils.logger import logger
+
+# at least 2, so the 30-day dashboard windows never need a rotated table
+PARTITION_LIVE_MONTHS = max(2, int(os.getenv("PARTITION_LIVE_MONTHS", "2")))
+PARTITION_ARCHIVE_DIR = os.getenv("PARTITION_ARCHIVE_DIR", os.path.join(BASE_DIR, "archive"))
+PARTITION_MAINTENANCE_SECONDS = float(os.getenv("PARTITION_MAINTENANCE_SECONDS", "3600"))
+ARCHIVE_CHUNK_ROWS = 5000
+
+RETENTION_MONTHS = {
+    URLCheck: int(os.getenv("RETENTION_MONTHS_URL_CHECKS", "0")),
+    MessageCheck: int(os.getenv("RETENTION_MONTHS_MESSAGE_CHECKS", "0")),
+}
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _midnight(day: date) -> datetime:
+    return datetime.combine(day, datetime.min.time())
+
+
+def rotate(model, session_factory=SessionLocal, now: datetime = None) -> List[str]:
+    """Moves rows older than the live months into their month tables.
+    Returns the names of the tables that received rows."""
+    live = model.__table__
+    boundary = _midnight(add_months((now or datetime.utcnow()).date().replace(day=1), 1 - PARTITION_LIVE_MONTHS))
+    touched = []
+
+    db = session_factory()
+    try:
+        oldest = db.execute(select(func.min(live.c.checked_at)).where(live.c.checked_at < boundary)).scalar()
+        if oldest is None:
+            return touched
+
+        month = oldest.date().replace(day=1)
+        while _midnight(month) < boundary:
+            day, month_end = month, add_months(month, 1)
+            has_rows = db.execute(select(live.c.id).where(
+                live.c.checked_at >= _midnight(month), live.c.checked_at < _midnight(month_end)
+            ).limit(1)).first()
+            if has_rows is None:
+                month = month_end
+                continue
+            table = month_table(model, month)
+            table.create(bind=db.get_bind(), checkfirst=True)
+            moved = 0
+            while day < month_end:
+                window = (live.c.checked_at >= _midnight(day), live.c.checked_at < _midnight(day + timedelta(days=1)))
+                moved += db.execute(insert(table).from_select(
+                    [c.name for c in live.columns], select(live).where(*window)
+                )).rowcount
+                db.execute(delete(live).where(*window))
+                db.commit()
+                day += timedelta(days=1)
+            if moved:
+                touched.append(table.name)
+                logger.info(f"Rotated {moved} rows into {table.name}")
+            month = month_end
+    except SQLAlchemyError:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    return touched
+
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def archive_table(table, session_factory=SessionLocal, archive_dir: str = PARTITION_ARCHIVE_DIR) -> str:
+    """Writes every row of ``table`` to <archive_dir>/<table>.ndjson.gz."""
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"{table.name}.ndjson.gz")
+    partial = path + ".partial"
+    names = [c.name for c in table.columns]
+    db = session_factory()
+    try:
+        with gzip.open(partial, "wt", encoding="utf-8") as out:
+            query = select(table).order_by(table.c.id).execution_options(yield_per=ARCHIVE_CHUNK_ROWS)
+            for chunk in db.execute(query).partitions():
+                out.writelines(json.dumps(dict(zip(names, map(_json_value, row)))) + "\n" for row in chunk)
+    finally:
+        db.close()
+    os.replace(partial, path)
+    return path
+
+
+def purge_expired(model, session_factory=SessionLocal, now: datetime = None,
+                  archive_dir: str = PARTITION_ARCHIVE_DIR) -> List[str]:
+    """Archives and drops the rotated months past retention. Returns the archive paths."""
+    months = RETENTION_MONTHS.get(model, 0)
+    if months <= 0:
+        return []
+    months = max(months, PARTITION_LIVE_MONTHS)
+    oldest_kept = add_months((now or datetime.utcnow()).date().replace(day=1), 1 - months)
+    prefix = model.__tablename__
+    archived = []
+
+    db = session_factory()
+    try:
+        expired = [table for month, table in rotated_tables(db.get_bind(), model) if month < oldest_kept]
+    finally:
+        db.close()
+
+    for table in expired:
+        path = archive_table(table, session_factory, archive_dir)
+        db = session_factory()
+        try:
+            total, flagged = db.execute(
+                select(func.count(), func.sum(case((table.c.flagged == "True", 1), else_=0)))
+            ).one()
+            adjust_counter(db, f"{prefix}.total", -total)
+            adjust_counter(db, f"{prefix}.flagged", -(flagged or 0))
+            table.drop(bind=db.connection())
+            db.commit()
+        except SQLAlchemyError:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        response_cache.invalidate()
+        archived.append(path)
+        logger.info(f"Archived {total} rows of {table.name} to {path} and dropped the table")
+    return archived
+
+
+def maintain(session_factory=SessionLocal, now: datetime = None) -> Dict[str, dict]:
+    report = {}
+    for model in PARTITIONED_MODELS:
+        report[model.__tablename__] = {
+            "rotated": rotate(model, session_factory, now),
+            "archived": purge_expired(model, session_factory, now),
+        }
+    return report
+
+
+def partition_stats(session_factory=SessionLocal) -> Dict[str, dict]:
+    db = session_factory()
+    try:
+        return {
+            model.__tablename__: {
+                "rotated_months": [f"{month:%Y-%m}" for month, _ in rotated_tables(db.get_bind(), model)],
+                "retention_months": RETENTION_MONTHS.get(model, 0),
+            }
+            for model in PARTITIONED_MODELS
+        }
+    finally:
+        db.close()
+
+
+_stop = threading.Event()
+_job = None
+
+
+def start_partition_job(interval: float = PARTITION_MAINTENANCE_SECONDS) -> None:
+    global _job
+    if _job is not None or interval <= 0:
+        return
+
+    def run():
+        while not _stop.wait(interval):
+            try:
+                maintain()
+            except (SQLAlchemyError, OSError) as e:
+                logger.error(f"Partition maintenance failed: {e}")
+
+    _job = threading.Thread(target=run, name="partition-maintenance", daemon=True)
+    _job.start()
+
+
+def stop_partition_job() -> None:
+    _stop.set()
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["maintain"]:
+        sys.exit("usage: python -m dashboard.partitions maintain")
+    print(maintain())
@@ -0,0 +1,175 @@
+"""Response cache and conditional GET for the admin read endpoints.
+
+/admin/stats, /admin/analytics, /admin/recent-checks and the /dashboard
+routes recomputed their answer on every call, although between two writes
+the answer cannot change. Their encoded responses are now cached per path
+and query string, tagged with the write version they were computed under:
+
+- the write version goes up after every write-behind commit, counter
+  reconciliation and retention purge, so a cached response is served only
+  while no row it could depend on has changed;
+- entries also expire RESPONSE_CACHE_TTL_SECONDS after they were computed,
+  which bounds staleness for what the version cannot see (the clock moving
+  the "last 7 days" window, writes made by other worker processes);
+- at most RESPONSE_CACHE_MAX_ENTRIES responses are kept, least recently used
+  evicted first.
+
+Every response carries an ETag (a hash of the body) and
+``Cache-Control: private, no-cache``, so browsers revalidate with
+If-None-Match. A matching ETag on a cached entry is answered 304 without
+touching the database; on a miss the body is recomputed and still answered
+304 if it came out identical. The version is computed before the handler
+reads anything, so a response that raced a commit is stored under the old
+version and never served again.
+
+RESPONSE_CACHE=off keeps ETags and 304s but stores nothing.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from utils.write_behind import write_behind
+
+RESPONSE_CACHE = os.getenv("RESPONSE_CACHE", "on")
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "10"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "512"))
+
+CACHE_CONTROL = "private, no-cache"
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match comparison; weak validators match their strong form."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class _Entry:
+    __slots__ = ("version", "expires_at", "body", "etag")
+
+    def __init__(self, version: int, expires_at: float, body: bytes, etag: str):
+        self.version = version
+        self.expires_at = expires_at
+        self.body = body
+        self.etag = etag
+
+
+class ResponseCache:
+    def __init__(self, ttl: float = RESPONSE_CACHE_TTL_SECONDS, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+                 enabled: bool = RESPONSE_CACHE != "off"):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = 0
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.invalidated = 0
+        self.expired = 0
+        self.evictions = 0
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def invalidate(self, *_) -> None:
+        """Bumps the write version; every cached response is stale from now on.
+        Takes and ignores the write-behind listener's rows."""
+        with self._lock:
+            self._version += 1
+
+    def set_enabled(self, enabled: bool) -> None:
+        self.enabled = enabled
+        if not enabled:
+            self.clear()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _get(self, key: str, version: int, now: float) -> Optional[_Entry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry.version != version or entry.expires_at <= now:
+                if entry.version != version:
+                    self.invalidated += 1
+                else:
+                    self.expired += 1
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def _put(self, key: str, entry: _Entry) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _respond(self, request: Request, entry: _Entry) -> Response:
+        headers = {"ETag": entry.etag, "Cache-Control": CACHE_CONTROL}
+        if etag_matches(request.headers.get("if-none-match"), entry.etag):
+            with self._lock:
+                self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(entry.body, media_type="application/json", headers=headers)
+
+    def respond(self, request: Request, compute: Callable[[], object]) -> Response:
+        """The cached response for ``request``, or ``compute()`` encoded as
+        JSON and cached. Exceptions from ``compute`` propagate uncached."""
+        key = request.url.path
+        if request.url.query:
+            key += "?" + "&".join(sorted(request.url.query.split("&")))
+        version = self._version
+        now = time.time()
+        entry = self._get(key, version, now) if self.enabled else None
+        if entry is None:
+            body = JSONResponse(jsonable_encoder(compute())).body
+            etag = f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+            entry = _Entry(version, now + self.ttl, body, etag)
+            if self.enabled:
+                self._put(key, entry)
+        return self._respond(request, entry)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "write_version": self._version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "not_modified": self.not_modified,
+                "invalidated": self.invalidated,
+                "expired": self.expired,
+                "evictions": self.evictions,
+            }
+
+
+response_cache = ResponseCache()
+
+write_behind.add_commit_listener(response_cache.invalidate)
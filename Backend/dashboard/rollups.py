@@ -0,0 +1,201 @@
+"""Hourly/daily rollups behind the trend charts.
+
+/admin/analytics and the dashboard's attack trend used to GROUP BY
+date(checked_at) over the raw check tables on every request. The counts now
+live in ``check_rollups``: one row per (granularity, bucket, check type,
+verdict) with the number of checks and how many were flagged. A write-behind
+flush hook adds every inserted batch to its hour and day buckets in the same
+transaction, so a trend over any range reads at most a few thousand small
+rows: hourly buckets for ranges up to ROLLUP_HOURLY_MAX_DAYS, daily beyond.
+
+backfill_rollups() rebuilds the table from the raw rows (one GROUP BY per
+table and granularity); it runs at startup when the table is empty and from
+
+    python -m dashboard.rollups backfill
+
+Rows written before the verdict column existed are counted as "unknown".
+"""
+import os
+import sys
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import case, delete, func, insert, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from database import CheckRollup, MessageCheck, SessionLocal, URLCheck, tables_for, upsert
+from utils.logger import logger
+from utils.write_behind import write_behind
+
+ROLLUP_HOURLY_MAX_DAYS = int(os.getenv("ROLLUP_HOURLY_MAX_DAYS", "2"))
+
+CHECK_TYPES = {"url": URLCheck, "message": MessageCheck}
+
+
+def bucket_start(moment: datetime, granularity: str) -> datetime:
+    moment = moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0) if granularity == "day" else moment
+
+
+def _aggregate(rows_by_model) -> Dict[Tuple[str, datetime, str, str], List[int]]:
+    totals = defaultdict(lambda: [0, 0])
+    now = datetime.utcnow()
+    for check_type, model in CHECK_TYPES.items():
+        for row in rows_by_model.get(model, ()):
+            moment = row.get("checked_at") or now
+            verdict = row.get("verdict") or "unknown"
+            flagged = row.get("flagged") == "True"
+            for granularity in ("hour", "day"):
+                counts = totals[(granularity, bucket_start(moment, granularity), check_type, verdict)]
+                counts[0] += 1
+                counts[1] += flagged
+    return totals
+
+
+def record_inserts(db, rows_by_model) -> None:
+    """Write-behind flush hook: add the rows just inserted to their buckets."""
+    # one upsert for every bucket, so workers opening the same new bucket at
+    # the top of the hour can't collide
+    rows = [
+        {"granularity": granularity, "bucket_start": start, "check_type": check_type,
+         "verdict": verdict, "checks": checks, "flagged": flagged}
+        for (granularity, start, check_type, verdict), (checks, flagged) in _aggregate(rows_by_model).items()
+    ]
+    upsert(db, CheckRollup, rows, increments=("checks", "flagged"))
+
+
+def _bucket_expression(db, column, granularity: str):
+    if db.bind.dialect.name == "postgresql":
+        return func.date_trunc(granularity, column)
+    fmt = "%Y-%m-%d 00:00:00" if granularity == "day" else "%Y-%m-%d %H:00:00"
+    return func.strftime(fmt, column)
+
+
+def _as_datetime(value) -> datetime:
+    return value if isinstance(value, datetime) else datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+
+
+def backfill_rollups(session_factory=SessionLocal) -> int:
+    """
+    Rebuilds the buckets from the raw tables, rotated months included.
+    Buckets older than the oldest retained row are kept: their raw rows
+    have been archived (dashboard/partitions.py). Returns the number of
+    buckets written.
+    """
+    buckets = 0
+    with write_behind.exclusive():
+        db = session_factory()
+        try:
+            for check_type, model in CHECK_TYPES.items():
+                tables = tables_for(db.get_bind(), model)
+                oldest = [db.execute(select(func.min(t.c.checked_at))).scalar() for t in tables]
+                oldest = min((m for m in oldest if m is not None), default=None)
+                if oldest is None:
+                    continue
+                db.execute(delete(CheckRollup).where(
+                    CheckRollup.check_type == check_type,
+                    CheckRollup.bucket_start >= bucket_start(oldest, "day"),
+                ))
+
+                totals = defaultdict(lambda: [0, 0])
+                for table in tables:
+                    for granularity in ("hour", "day"):
+                        bucket = _bucket_expression(db, table.c.checked_at, granularity)
+                        verdict = func.coalesce(table.c.verdict, "unknown")
+                        query = (
+                            select(
+                                bucket,
+                                verdict,
+                                func.count(),
+                                func.sum(case((table.c.flagged == "True", 1), else_=0)),
+                            )
+                            .where(table.c.checked_at.isnot(None))
+                            .group_by(bucket, verdict)
+                        )
+                        for start, v, checks, flagged in db.execute(query):
+                            counts = totals[(granularity, _as_datetime(start), v)]
+                            counts[0] += checks
+                            counts[1] += flagged or 0
+
+                rows = [
+                    {"granularity": granularity, "bucket_start": start, "check_type": check_type,
+                     "verdict": v, "checks": checks, "flagged": flagged}
+                    for (granularity, start, v), (checks, flagged) in totals.items()
+                ]
+                if rows:
+                    db.execute(insert(CheckRollup), rows)
+                buckets += len(rows)
+            db.commit()
+        except SQLAlchemyError:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+    logger.info(f"Rollups backfilled: {buckets} buckets")
+    return buckets
+
+
+def ensure_rollups(session_factory=SessionLocal) -> None:
+    """Backfills the first time the app starts on a database with history."""
+    db = session_factory()
+    try:
+        has_rollups = db.execute(select(CheckRollup.checks).limit(1)).first() is not None
+        has_checks = any(db.execute(select(m.id).limit(1)).first() for m in CHECK_TYPES.values())
+    finally:
+        db.close()
+    if has_checks and not has_rollups:
+        backfill_rollups(session_factory)
+
+
+def get_trend(
+    db,
+    start: datetime,
+    end: Optional[datetime] = None,
+    check_type: Optional[str] = None,
+    granularity: Optional[str] = None,
+    flagged_only: bool = False,
+) -> List[dict]:
+    """
+    Buckets from the one containing ``start`` up to ``end``, oldest first: {"bucket", "checks", "flagged",
+    "by_verdict"}. ``granularity`` defaults to hourly for short ranges.
+    Empty buckets are omitted, like the GROUP BY queries this replaces.
+    """
+    end = end or datetime.utcnow()
+    if granularity is None:
+        granularity = "hour" if end - start <= timedelta(days=ROLLUP_HOURLY_MAX_DAYS) else "day"
+
+    query = (
+        select(CheckRollup.bucket_start, CheckRollup.verdict,
+               func.sum(CheckRollup.checks), func.sum(CheckRollup.flagged))
+        .where(
+            CheckRollup.granularity == granularity,
+            CheckRollup.bucket_start >= bucket_start(start, granularity),
+            CheckRollup.bucket_start < end,
+        )
+        .group_by(CheckRollup.bucket_start, CheckRollup.verdict)
+        .order_by(CheckRollup.bucket_start)
+    )
+    if check_type is not None:
+        query = query.where(CheckRollup.check_type == check_type)
+
+    buckets: Dict[datetime, dict] = {}
+    for start_at, verdict, checks, flagged in db.execute(query):
+        bucket = buckets.setdefault(start_at, {"bucket": start_at, "checks": 0, "flagged": 0, "by_verdict": {}})
+        bucket["checks"] += int(checks)
+        bucket["flagged"] += int(flagged)
+        bucket["by_verdict"][verdict] = bucket["by_verdict"].get(verdict, 0) + int(checks)
+
+    trend = list(buckets.values())
+    if flagged_only:
+        trend = [b for b in trend if b["flagged"]]
+    return trend
+
+
+write_behind.add_flush_hook(record_inserts)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["backfill"]:
+        sys.exit("usage: python -m dashboard.rollups backfill")
+    print(f"{backfill_rollups()} buckets written")
@@ -0,0 +1,314 @@
+"""Non-blocking front end for the URL and message risk engines.
+
+The scoring rules live in risk_engine / message_risk_engine; this module only
+decides *where* the slow parts run so they never block the event loop:
+
+- WHOIS lookups go to a dedicated thread pool and are awaited with a deadline.
+  If the deadline expires the verdict is returned without the domain-age
+  signal (``whois_status == "pending"``); the lookup keeps running in the
+  background and lands in the domain-age cache for the next request.
+- Exact blacklist checks behind the bloom filter (a DB query) run on the
+  WHOIS pool before the static signals, which then answer from the
+  reputation store's cache.
+- predict_proba runs on a separate inference pool so a burst of slow WHOIS
+  lookups can't starve the model. Single-item calls against an
+  InferenceScheduler are awaited directly and join its next micro-batch.
+"""
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+
+from detection.message_risk_engine import (
+    EMBEDDED_URL_DEADLINE_SECONDS,
+    EMBEDDED_URL_STAGE,
+    _embedded_urls_signal,
+    _final_message_verdict,
+    _message_ml_signal,
+    _phrase_signals,
+    _reuse_key,
+    distinct_urls,
+)
+from detection.risk_engine import (
+    ML_STAGES,
+    WHOIS_STAGE,
+    _blacklisted_result,
+    _domain_age_signal,
+    _extract_domain,
+    _final_verdict,
+    _ml_phishing_probabilities,
+    _ml_phishing_probability,
+    _ml_signal,
+    _static_signals,
+)
+from detection.near_duplicates import near_duplicate_index
+from detection.reputation import reputation_store
+from detection.verdict_cache import verdict_cache
+from detection.whois_cache import WHOIS_DEADLINE_SECONDS, domain_age_cache, whois_executor
+from ml.inference_scheduler import InferenceScheduler
+from utils.metrics import WHOIS_DEADLINE_EXCEEDED_TOTAL
+
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "4"))
+
+inference_executor = ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix="inference")
+
+# domain -> future of an in-flight lookup, so a burst of requests for the same
+# uncached domain shares one WHOIS query.
+_inflight: Dict[str, asyncio.Future] = {}
+
+
+async def _creation_date(domain: str, deadline: float):
+    """Returns (whois_status, creation_date)."""
+    with WHOIS_STAGE.time():
+        return await _wait_creation_date(domain, deadline)
+
+
+async def _wait_creation_date(domain: str, deadline: float):
+    found, creation_date = domain_age_cache.peek(domain)
+    if not found:
+        future = _inflight.get(domain)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(whois_executor, domain_age_cache.get_creation_date, domain)
+            _inflight[domain] = future
+            future.add_done_callback(lambda _: _inflight.pop(domain, None))
+
+        try:
+            creation_date = await asyncio.wait_for(asyncio.shield(future), timeout=deadline)
+        except asyncio.TimeoutError:
+            WHOIS_DEADLINE_EXCEEDED_TOTAL.inc()
+            return "pending", None
+
+    return ("ok" if creation_date is not None else "unknown"), creation_date
+
+
+async def _confirm_blocked(domains) -> None:
+    """Runs the exact blacklist queries ``domains`` need off the event loop."""
+    pending = [domain for domain in dict.fromkeys(domains) if reputation_store.needs_exact_check(domain)]
+    if pending:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(whois_executor, reputation_store.confirm_blocked, pending)
+
+
+async def _ml_probability(pipe, text: str, kind: str):
+    """Returns (p, error) with predict_proba run off the event loop."""
+    loop = asyncio.get_running_loop()
+    try:
+        with ML_STAGES[kind].time():
+            if isinstance(pipe, InferenceScheduler):
+                # Joins the scheduler's next micro-batch without holding a thread.
+                row = await asyncio.wrap_future(pipe.submit(text))
+                return float(row[1]), None
+            return await loop.run_in_executor(inference_executor, _ml_phishing_probability, pipe, text), None
+    except Exception as e:
+        return None, e
+
+
+async def _ml_probabilities(pipe, texts, kind: str):
+    """Batch variant: returns (list of p, error) from a single predict_proba."""
+    loop = asyncio.get_running_loop()
+    try:
+        with ML_STAGES[kind].time():
+            return await loop.run_in_executor(inference_executor, _ml_phishing_probabilities, pipe, texts), None
+    except Exception as e:
+        return None, e
+
+
+async def calculate_risk_score_async(url: str, url_pipe, whois_deadline: float = WHOIS_DEADLINE_SECONDS) -> Dict:
+    cached = verdict_cache.get("url", url)
+    if cached is not None:
+        return cached
+
+    result = await _score_url_async(url, url_pipe, whois_deadline)
+    verdict_cache.put("url", url, result)
+    return result
+
+
+async def _score_url_async(url: str, url_pipe, whois_deadline: float) -> Dict:
+    domain = _extract_domain(url)
+
+    await _confirm_blocked([domain])
+    score, reasons, blacklisted = _static_signals(url, domain)
+    if blacklisted:
+        return _blacklisted_result(domain)
+
+    (whois_status, creation_date), (p, ml_error) = await asyncio.gather(
+        _creation_date(domain, whois_deadline),
+        _ml_probability(url_pipe, url, "url"),
+    )
+
+    age_score, age_reasons = _domain_age_signal(domain, creation_date, whois_status)
+    ml_score, ml_reasons = _ml_signal(p, ml_error)
+
+    return _final_verdict(score + age_score + ml_score, reasons + age_reasons + ml_reasons, whois_status)
+
+
+async def _embedded_url_results(urls, url_pipe, whois_deadline: float, deadline: float):
+    """Verdicts for a message's distinct URLs, or None past ``deadline``."""
+    if not urls:
+        return {}
+    with EMBEDDED_URL_STAGE.time():
+        try:
+            results = await asyncio.wait_for(
+                calculate_risk_scores_async(urls, url_pipe, min(whois_deadline, deadline)), timeout=deadline
+            )
+        except asyncio.TimeoutError:
+            return None
+    return dict(zip(urls, results))
+
+
+async def _pooled_url_results(urls, url_pipe, whois_deadline: float):
+    """Verdicts for the links of a whole message batch, as a list."""
+    if not urls:
+        return []
+    with EMBEDDED_URL_STAGE.time():
+        return await calculate_risk_scores_async(urls, url_pipe, whois_deadline)
+
+
+async def calculate_message_risk_score_async(
+    message: str,
+    msg_pipe,
+    url_pipe,
+    whois_deadline: float = WHOIS_DEADLINE_SECONDS,
+    url_deadline: float = EMBEDDED_URL_DEADLINE_SECONDS,
+) -> Dict:
+    cached = verdict_cache.get("message", message)
+    if cached is not None:
+        return cached
+    score, reasons = _phrase_signals(message)
+    urls = distinct_urls(message)
+    await _confirm_blocked(_extract_domain(url) for url in urls)
+    reused, probe = near_duplicate_index.lookup(message, lambda: _reuse_key(score, reasons, urls))
+    if reused is not None:
+        return reused
+
+    # Scan URLs inside message: distinct links scored as one batch (one model
+    # call, concurrent WHOIS), alongside the message model.
+    (p, ml_error), url_results = await asyncio.gather(
+        _ml_probability(msg_pipe, message, "message"),
+        _embedded_url_results(urls, url_pipe, whois_deadline, url_deadline),
+    )
+    url_score, url_reasons, complete = _embedded_urls_signal(urls, url_results)
+    score += url_score
+    reasons += url_reasons
+
+    ml_score, ml_reasons = _message_ml_signal(p, ml_error)
+
+    result = _final_message_verdict(score + ml_score, reasons + ml_reasons)
+    if complete:
+        verdict_cache.put("message", message, result)
+        near_duplicate_index.add(probe, message, result)
+    return result
+
+
+async def calculate_risk_scores_async(urls, url_pipe, whois_deadline: float = WHOIS_DEADLINE_SECONDS):
+    """
+    Batch scoring. Duplicate URLs are scored once, the model sees the whole
+    batch in one predict_proba call and each distinct domain gets one
+    (concurrent) WHOIS lookup. Cached verdicts are reused; results come back
+    in input order.
+    """
+    results = {}
+    unique_urls = []
+    for url in dict.fromkeys(urls):
+        cached = verdict_cache.get("url", url)
+        if cached is not None:
+            results[url] = cached
+        else:
+            unique_urls.append(url)
+
+    domains = {url: _extract_domain(url) for url in unique_urls}
+    await _confirm_blocked(domains.values())
+    static = {url: _static_signals(url, domains[url]) for url in unique_urls}
+
+    to_score = [url for url in unique_urls if not static[url][2]]
+    unique_domains = list(dict.fromkeys(domains[url] for url in to_score))
+
+    (probabilities, ml_error), *lookups = await asyncio.gather(
+        _ml_probabilities(url_pipe, to_score, "url"),
+        *(_creation_date(domain, whois_deadline) for domain in unique_domains),
+    )
+    ages = dict(zip(unique_domains, lookups))
+
+    if ml_error is None:
+        probabilities = dict(zip(to_score, probabilities))
+
+    for url in unique_urls:
+        domain = domains[url]
+        score, reasons, blacklisted = static[url]
+        if blacklisted:
+            results[url] = _blacklisted_result(domain)
+            continue
+
+        whois_status, creation_date = ages[domain]
+        age_score, age_reasons = _domain_age_signal(domain, creation_date, whois_status)
+        if ml_error is not None:
+            ml_score, ml_reasons = _ml_signal(error=ml_error)
+        else:
+            ml_score, ml_reasons = _ml_signal(probabilities[url])
+
+        results[url] = _final_verdict(
+            score + age_score + ml_score, reasons + age_reasons + ml_reasons, whois_status
+        )
+        verdict_cache.put("url", url, results[url])
+
+    return [results[url] for url in urls]
+
+
+async def calculate_message_risk_scores_async(
+    messages, msg_pipe, url_pipe, whois_deadline: float = WHOIS_DEADLINE_SECONDS
+):
+    """
+    Batch scoring for messages. Embedded URLs from every message in the batch
+    are pooled and scored through calculate_risk_scores_async, and the message
+    model runs once over all distinct uncached messages. Results come back in
+    input order.
+    """
+    results = {}
+    probes = {}
+    phrases = {}
+    embedded = {}
+    for message in dict.fromkeys(messages):
+        cached = verdict_cache.get("message", message)
+        if cached is not None:
+            results[message] = cached
+        else:
+            phrases[message] = _phrase_signals(message)
+            embedded[message] = distinct_urls(message)
+    await _confirm_blocked(_extract_domain(url) for urls in embedded.values() for url in urls)
+
+    unique_messages = []
+    for message, urls in embedded.items():
+        score, reasons = phrases[message]
+        reused, probes[message] = near_duplicate_index.lookup(message, lambda: _reuse_key(score, reasons, urls))
+        if reused is not None:
+            results[message] = reused
+        else:
+            unique_messages.append(message)
+
+    all_urls = list(dict.fromkeys(url for message in unique_messages for url in embedded[message]))
+
+    (probabilities, ml_error), url_results = await asyncio.gather(
+        _ml_probabilities(msg_pipe, unique_messages, "message"),
+        _pooled_url_results(all_urls, url_pipe, whois_deadline),
+    )
+    url_results = dict(zip(all_urls, url_results))
+
+    for i, message in enumerate(unique_messages):
+        score, reasons = phrases[message]
+
+        url_score, url_reasons, complete = _embedded_urls_signal(embedded[message], url_results)
+        score += url_score
+        reasons += url_reasons
+
+        if ml_error is not None:
+            ml_score, ml_reasons = _message_ml_signal(error=ml_error)
+        else:
+            ml_score, ml_reasons = _message_ml_signal(probabilities[i])
+
+        results[message] = _final_message_verdict(score + ml_score, reasons + ml_reasons)
+        if complete:
+            verdict_cache.put("message", message, results[message])
+            near_duplicate_index.add(probes[message], message, results[message])
+
+    return [results[message] for message in messages]
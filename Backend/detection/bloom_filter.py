@@ -0,0 +1,188 @@
+"""Memory-mapped Bloom filter used as a prefilter for the blacklist.
+
+Most /check_url/ traffic is for domains that are on no list at all; the filter
+answers those from a few MB of bits (1M domains at a 0.1% false-positive rate
+is ~1.8 MB) and only probable positives go on to the exact store.
+
+Build offline from a text feed (same line format as the reputation feeds):
+
+    python -m detection.bloom_filter build blacklist_domains.txt blacklist.bloom --fp-rate 0.001
+    python -m detection.bloom_filter verify blacklist.bloom blacklist_domains.txt
+
+``verify`` checks there are no false negatives and measures the false-positive
+rate on random domains that are not in the feed; it exits non-zero if the rate
+is more than twice the target the filter was built for.
+
+File layout (little endian): header ``<8sIQIQdH`` = magic, format version,
+number of bits, number of hashes, number of items, target fp rate, length of
+the feed version string; then the UTF-8 feed version; then the bit array.
+"""
+import argparse
+import hashlib
+import math
+import mmap
+import os
+import random
+import string
+import struct
+import sys
+import time
+
+MAGIC = b"CSBLOOM\0"
+FORMAT_VERSION = 1
+_HEADER = struct.Struct("<8sIQIQdH")
+
+
+def optimal_parameters(num_items: int, fp_rate: float):
+    """(num_bits, num_hashes) for ``num_items`` at ``fp_rate``."""
+    num_items = max(num_items, 1)
+    num_bits = max(8, int(math.ceil(-num_items * math.log(fp_rate) / (math.log(2) ** 2))))
+    num_hashes = max(1, int(round(num_bits / num_items * math.log(2))))
+    return num_bits, num_hashes
+
+
+def _positions(item: str, num_bits: int, num_hashes: int):
+    # Kirsch-Mitzenmacher double hashing over one 128-bit digest.
+    digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+    h1 = int.from_bytes(digest[:8], "little")
+    h2 = int.from_bytes(digest[8:], "little") | 1
+    return [(h1 + i * h2) % num_bits for i in range(num_hashes)]
+
+
+class BloomFilter:
+    def __init__(self, bits, num_bits: int, num_hashes: int, num_items: int = 0,
+                 fp_rate: float = 0.0, feed_version: str = "", offset: int = 0):
+        # ``bits`` is a bytearray while building or a read-only mmap when loaded.
+        self._bits = bits
+        self._offset = offset
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self.num_items = num_items
+        self.fp_rate = fp_rate
+        self.feed_version = feed_version
+
+    @classmethod
+    def create(cls, num_items: int, fp_rate: float, feed_version: str = ""):
+        num_bits, num_hashes = optimal_parameters(num_items, fp_rate)
+        return cls(bytearray((num_bits + 7) // 8), num_bits, num_hashes, 0, fp_rate, feed_version)
+
+    def add(self, item: str) -> None:
+        for pos in _positions(item, self.num_bits, self.num_hashes):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.num_items += 1
+
+    def __contains__(self, item: str) -> bool:
+        bits, offset = self._bits, self._offset
+        for pos in _positions(item, self.num_bits, self.num_hashes):
+            if not bits[offset + (pos >> 3)] & (1 << (pos & 7)):
+                return False
+        return True
+
+    def save(self, path: str) -> None:
+        version = self.feed_version.encode("utf-8")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, self.num_bits, self.num_hashes,
+                                 self.num_items, self.fp_rate, len(version)))
+            f.write(version)
+            f.write(self._bits)
+        # atomic: readers watching the path never see a half-written filter
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path, "rb") as f:
+            bits = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, num_bits, num_hashes, num_items, fp_rate, version_len = _HEADER.unpack_from(bits, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a bloom filter this build understands")
+        feed_version = bits[_HEADER.size:_HEADER.size + version_len].decode("utf-8")
+        offset = _HEADER.size + version_len
+        if len(bits) - offset < (num_bits + 7) // 8:
+            raise ValueError(f"{path} is truncated")
+        return cls(bits, num_bits, num_hashes, num_items, fp_rate, feed_version, offset)
+
+    def size_bytes(self) -> int:
+        return (self.num_bits + 7) // 8
+
+    def stats(self) -> dict:
+        return {
+            "feed_version": self.feed_version,
+            "items": self.num_items,
+            "bits": self.num_bits,
+            "hashes": self.num_hashes,
+            "target_fp_rate": self.fp_rate,
+            "size_bytes": self.size_bytes(),
+        }
+
+
+def _read_feed(path: str):
+    # Same parsing/normalization as the reputation feeds.
+    from detection.reputation import _read_list, normalize_domain
+
+    return list(dict.fromkeys(normalize_domain(d) for d in _read_list(path)))
+
+
+def build_from_feed(feed_path: str, out_path: str, fp_rate: float, feed_version: str = None) -> BloomFilter:
+    domains = _read_feed(feed_path)
+    if feed_version is None:
+        with open(feed_path, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()[:16]
+        feed_version = f"{os.path.basename(feed_path)}@{digest}:{time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())}"
+
+    bloom = BloomFilter.create(len(domains), fp_rate, feed_version)
+    for domain in domains:
+        bloom.add(domain)
+    bloom.save(out_path)
+    return bloom
+
+
+def measure_false_positive_rate(bloom: BloomFilter, members, samples: int, seed: int = 0) -> float:
+    rng = random.Random(seed)
+    members = set(members)
+    hits = tested = 0
+    while tested < samples:
+        candidate = "".join(rng.choice(string.ascii_lowercase) for _ in range(14)) + ".test"
+        if candidate in members:
+            continue
+        tested += 1
+        hits += candidate in bloom
+    return hits / tested
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m detection.bloom_filter")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="build a filter from a domain feed")
+    build.add_argument("feed")
+    build.add_argument("out")
+    build.add_argument("--fp-rate", type=float, default=0.001)
+    build.add_argument("--feed-version", default=None)
+
+    verify = sub.add_parser("verify", help="check a filter against its feed")
+    verify.add_argument("filter")
+    verify.add_argument("feed")
+    verify.add_argument("--samples", type=int, default=200_000)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        bloom = build_from_feed(args.feed, args.out, args.fp_rate, args.feed_version)
+        print(f"Wrote {args.out}: {bloom.num_items} domains, {bloom.size_bytes() / 2**20:.2f} MB, "
+              f"{bloom.num_hashes} hashes, version {bloom.feed_version}")
+        return 0
+
+    bloom = BloomFilter.load(args.filter)
+    domains = _read_feed(args.feed)
+    missing = sum(1 for d in domains if d not in bloom)
+    rate = measure_false_positive_rate(bloom, domains, args.samples)
+    print(f"{args.filter} ({bloom.feed_version}): {len(domains)} feed domains, {missing} false negatives, "
+          f"fp rate {rate:.5f} (target {bloom.fp_rate})")
+    if missing or rate > 2 * bloom.fp_rate:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,21 +1,6 @@
 from urllib.parse import urlparse
 from utils.logger import logger
-
-TRUSTED_DOMAINS = [
-    "paypal.com",
-    "google.com",
-    "microsoft.com",
-    "amazon.com",
-    "apple.com",
-    "fnb.co.za",
-    "standardbank.co.za",
-    "absa.co.za",
-    "capitecbank.co.za",
-    "gov.za",
-    "gcis.gov.za",
-    "www.gov.za"
-]
-
+from detection.reputation import reputation_store
 
 from urllib.parse import urlparse
 
@@ -38,14 +23,5 @@ def extract_domain(url: str) -> str:
 
 
 def is_trusted_domain(domain: str) -> bool:
-
-    
-    if domain in TRUSTED_DOMAINS:
-        return True
-
-    
-    for trusted in TRUSTED_DOMAINS:
-        if domain.endswith("." + trusted):
-            return True
-
-    return False
+    # Exact or parent-domain match against the reputation store (O(labels))
+    return reputation_store.is_trusted(domain)
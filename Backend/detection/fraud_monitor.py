@@ -1,15 +1,285 @@
+"""Streaming fraud monitor: per-message alerts plus campaign detection.
+
+Messages arrive one at a time (/monitor/), as NDJSON over a chunked POST
+(/monitor/stream) or over a WebSocket (/monitor/ws), and are scored in
+batches with calculate_message_risk_scores_async. Besides the per-message
+alert, every scored message is counted in three sliding windows of
+FRAUD_WINDOW_SECONDS:
+
+- ``template``: the message with URLs, digits, case and punctuation
+  normalised away (message_template), so "Parcel 12345 held, pay at
+  https://a.example/x" and "parcel 98765 held - pay at https://b.example/y"
+  share a key;
+- ``url``: every embedded URL;
+- ``domain``: the domain of every embedded URL.
+
+When a key reaches FRAUD_CAMPAIGN_THRESHOLD messages in the window and at
+least FRAUD_CAMPAIGN_MIN_FLAGGED of them were flagged, a campaign alert is
+raised (once per key per window) and attached to the message that crossed
+the line. The flagged share keeps benign bulk traffic (OTP codes, delivery
+notices) from alerting.
+
+Memory is bounded: each dimension keeps at most FRAUD_MAX_KEYS keys (least
+recently seen evicted first), each key at most window / FRAUD_BUCKET_SECONDS
+bucket counts, and the last FRAUD_MAX_ALERTS alerts.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
 from datetime import datetime
-from detection.message_risk_engine import calculate_message_risk_score
+from typing import AsyncIterator, Dict, List, Optional
+
+from detection.async_engine import calculate_message_risk_scores_async
+from detection.domain_utils import extract_domain
+from detection.message_risk_engine import calculate_message_risk_score, distinct_urls
+from detection.near_duplicates import message_template
+
+FRAUD_WINDOW_SECONDS = float(os.getenv("FRAUD_WINDOW_SECONDS", "600"))
+FRAUD_BUCKET_SECONDS = float(os.getenv("FRAUD_BUCKET_SECONDS", "50"))
+FRAUD_CAMPAIGN_THRESHOLD = int(os.getenv("FRAUD_CAMPAIGN_THRESHOLD", "25"))
+FRAUD_CAMPAIGN_MIN_FLAGGED = float(os.getenv("FRAUD_CAMPAIGN_MIN_FLAGGED", "0.5"))
+FRAUD_MAX_KEYS = int(os.getenv("FRAUD_MAX_KEYS", "20000"))
+FRAUD_MAX_ALERTS = int(os.getenv("FRAUD_MAX_ALERTS", "500"))
+MONITOR_BATCH_SIZE = int(os.getenv("MONITOR_BATCH_SIZE", "256"))
+# An SMS or chat message is a few hundred bytes and a long email a few KB;
+# a line past this ends /monitor/stream instead of being buffered forever.
+MONITOR_MAX_LINE_BYTES = int(os.getenv("MONITOR_MAX_LINE_BYTES", "65536"))
+
+def _template_key(message: str) -> str:
+    return hashlib.sha1(message_template(message).encode()).hexdigest()[:16]
+
+
+class _Window:
+    """Counts for one key: [bucket, total, flagged] per active bucket, oldest
+    first. A list rather than a deque: it holds a handful of entries and an
+    empty deque alone costs several hundred bytes per key."""
+
+    __slots__ = ("buckets", "total", "flagged", "first_seen", "alerted_at", "sample")
+
+    def __init__(self, now: float, sample: str):
+        self.buckets = []
+        self.total = 0
+        self.flagged = 0
+        self.first_seen = now
+        self.alerted_at = None
+        self.sample = sample
+
+
+class SlidingWindowCounter:
+    """Per-key message and flagged counts over the last ``window`` seconds,
+    for at most ``max_keys`` keys (least recently seen evicted first)."""
+
+    def __init__(self, window: float = FRAUD_WINDOW_SECONDS, bucket: float = FRAUD_BUCKET_SECONDS,
+                 max_keys: int = FRAUD_MAX_KEYS):
+        self.window = window
+        self.bucket = bucket
+        self.max_keys = max_keys
+        self._keys: "OrderedDict[str, _Window]" = OrderedDict()
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _expire(self, entry: _Window, now: float) -> None:
+        oldest = int((now - self.window) // self.bucket)
+        expired = 0
+        for bucket, total, flagged in entry.buckets:
+            if bucket > oldest:
+                break
+            entry.total -= total
+            entry.flagged -= flagged
+            expired += 1
+        if expired:
+            del entry.buckets[:expired]
+
+    def add(self, key: str, flagged: bool, now: float, sample: str = "") -> _Window:
+        entry = self._keys.get(key)
+        if entry is None:
+            entry = self._keys[key] = _Window(now, sample)
+            if len(self._keys) > self.max_keys:
+                self._keys.popitem(last=False)
+                self.evictions += 1
+        else:
+            self._keys.move_to_end(key)
+            self._expire(entry, now)
+            if not entry.total:
+                entry.first_seen = now
+
+        bucket = int(now // self.bucket)
+        if entry.buckets and entry.buckets[-1][0] == bucket:
+            entry.buckets[-1][1] += 1
+            entry.buckets[-1][2] += flagged
+        else:
+            entry.buckets.append([bucket, 1, int(flagged)])
+        entry.total += 1
+        entry.flagged += flagged
+
+        # keys nobody has seen for a whole window go first
+        while self._keys:
+            stale_key, stale = next(iter(self._keys.items()))
+            if stale.buckets and stale.buckets[-1][0] > int((now - self.window) // self.bucket):
+                break
+            del self._keys[stale_key]
+        return entry
+
+    def items(self, now: float):
+        for key, entry in self._keys.items():
+            self._expire(entry, now)
+            if entry.total:
+                yield key, entry
+
+
+class CampaignDetector:
+    def __init__(
+        self,
+        window: float = FRAUD_WINDOW_SECONDS,
+        threshold: int = FRAUD_CAMPAIGN_THRESHOLD,
+        min_flagged: float = FRAUD_CAMPAIGN_MIN_FLAGGED,
+        max_keys: int = FRAUD_MAX_KEYS,
+        max_alerts: int = FRAUD_MAX_ALERTS,
+    ):
+        self.window = window
+        self.threshold = threshold
+        self.min_flagged = min_flagged
+        self._counters = {
+            dimension: SlidingWindowCounter(window, min(FRAUD_BUCKET_SECONDS, window), max_keys)
+            for dimension in ("template", "url", "domain")
+        }
+        self._alerts = deque(maxlen=max_alerts)
+        self._lock = threading.Lock()
+        self.observed = 0
+        self.alerts_raised = 0
+
+    def _keys(self, message: str):
+        urls = distinct_urls(message)
+        yield "template", _template_key(message)
+        for url in urls:
+            yield "url", url
+        for domain in dict.fromkeys(extract_domain(url) for url in urls):
+            if domain:
+                yield "domain", domain
+
+    def observe(self, message: str, flagged: bool, now: Optional[float] = None) -> List[dict]:
+        """Counts one scored message. Returns the campaign alerts it triggered."""
+        now = time.time() if now is None else now
+        raised = []
+        with self._lock:
+            self.observed += 1
+            for dimension, key in self._keys(message):
+                entry = self._counters[dimension].add(key, flagged, now, message[:200])
+                if (
+                    entry.total >= self.threshold
+                    and entry.flagged >= self.min_flagged * entry.total
+                    and (entry.alerted_at is None or now - entry.alerted_at >= self.window)
+                ):
+                    entry.alerted_at = now
+                    alert = self._describe(dimension, key, entry, now)
+                    self._alerts.append(alert)
+                    raised.append(alert)
+            self.alerts_raised += len(raised)
+        return raised
+
+    def _describe(self, dimension: str, key: str, entry: _Window, now: float) -> dict:
+        return {
+            "type": "campaign",
+            "dimension": dimension,
+            "key": key,
+            "messages": entry.total,
+            "flagged": entry.flagged,
+            "window_seconds": self.window,
+            "first_seen": datetime.utcfromtimestamp(entry.first_seen).isoformat(),
+            "timestamp": datetime.utcfromtimestamp(now).isoformat(),
+            "sample": entry.sample,
+        }
+
+    def active_campaigns(self, limit: int = 50, now: Optional[float] = None) -> List[dict]:
+        """Keys currently at or above the alert threshold, largest first."""
+        now = time.time() if now is None else now
+        with self._lock:
+            active = [
+                self._describe(dimension, key, entry, now)
+                for dimension, counter in self._counters.items()
+                for key, entry in counter.items(now)
+                if entry.total >= self.threshold and entry.flagged >= self.min_flagged * entry.total
+            ]
+        return sorted(active, key=lambda a: -a["messages"])[:limit]
+
+    def recent_alerts(self, limit: int = 50) -> List[dict]:
+        with self._lock:
+            return list(self._alerts)[-limit:][::-1]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "observed": self.observed,
+                "alerts_raised": self.alerts_raised,
+                "window_seconds": self.window,
+                "threshold": self.threshold,
+                "keys": {dimension: len(counter) for dimension, counter in self._counters.items()},
+                "evictions": {dimension: counter.evictions for dimension, counter in self._counters.items()},
+            }
+
+
+def parse_stream_line(line) -> Optional[str]:
+    """One NDJSON line: {"message": "..."} or a JSON string. Blank lines give None."""
+    line = line.strip()
+    if not line:
+        return None
+    item = json.loads(line)
+    if isinstance(item, dict):
+        item = item.get("message")
+    if not isinstance(item, str):
+        raise ValueError("expected {\"message\": \"...\"} or a JSON string")
+    return item
+
+
+async def message_batches(
+    chunks: AsyncIterator[bytes],
+    max_batch: int = MONITOR_BATCH_SIZE,
+    max_line: int = MONITOR_MAX_LINE_BYTES,
+) -> AsyncIterator[List[str]]:
+    """Batches of messages from an NDJSON byte stream. Each batch holds the
+    complete lines received so far (up to ``max_batch``), so a slow stream
+    isn't held back waiting for a full batch. A line longer than
+    ``max_line`` bytes raises ValueError, complete or not, so a client that
+    never sends a newline can't grow the buffer without bound."""
+    pending = b""
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        if len(pending) > max_line:
+            lines.append(pending)
+        batch = []
+        for line in lines:
+            if len(line) > max_line:
+                if batch:
+                    yield batch
+                raise ValueError(f"line longer than {max_line} bytes")
+            message = parse_stream_line(line)
+            if message is None:
+                continue
+            batch.append(message)
+            if len(batch) >= max_batch:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    message = parse_stream_line(pending)
+    if message is not None:
+        yield [message]
 
 
 class FraudMonitor:
-    def __init__(self, phishing_pipe):
-        # sklearn Pipeline: tfidf + classifier
+    def __init__(self, phishing_pipe, url_pipe, detector: Optional[CampaignDetector] = None):
+        # sklearn Pipelines (tfidf + classifier) or InferenceSchedulers wrapping them
         self.phishing_pipe = phishing_pipe
+        self.url_pipe = url_pipe
+        self.detector = detector or CampaignDetector()
 
-    def process_message(self, message: str):
-        result = calculate_message_risk_score(message, self.phishing_pipe)
-
+    def _monitor_result(self, message: str, result: Dict, now: Optional[float] = None) -> Dict:
         alert = False
         alert_level = "none"
 
@@ -20,6 +290,8 @@ class FraudMonitor:
             alert = True
             alert_level = "warning"
 
+        campaigns = self.detector.observe(message, result["verdict"] != "safe", now)
+
         return {
             "timestamp": datetime.utcnow().isoformat(),
             "message": message,
@@ -28,4 +300,18 @@ class FraudMonitor:
             "alert": alert,
             "alert_level": alert_level,
             "reasons": result["reasons"],
-        }
\ No newline at end of file
+            "campaign_alerts": campaigns,
+        }
+
+    def process_message(self, message: str):
+        result = calculate_message_risk_score(message, self.phishing_pipe, self.url_pipe)
+        return self._monitor_result(message, result)
+
+    async def process_messages(self, messages: List[str], now: Optional[float] = None) -> List[Dict]:
+        """Scores a batch (one model call, embedded links pooled) and counts
+        every message in the campaign windows, in order."""
+        results = await calculate_message_risk_scores_async(messages, self.phishing_pipe, self.url_pipe)
+        return [self._monitor_result(message, result, now) for message, result in zip(messages, results)]
+
+    def stats(self) -> dict:
+        return self.detector.stats()
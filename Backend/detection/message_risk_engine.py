@@ -1,7 +1,19 @@
+import os
 import re
 from typing import Dict
 
-from detection.risk_engine import calculate_risk_score, _ml_phishing_probability
+from detection.risk_engine import ML_STAGES, calculate_risk_scores, _extract_domain, _ml_phishing_probability, _static_signals
+from detection.phrase_matcher import scam_phrases
+from detection.near_duplicates import near_duplicate_index
+from detection.verdict_cache import is_cacheable, verdict_cache
+from utils.metrics import stage_timer
+
+# Budget for the links inside one message, all of them together. Defaults
+# just above the per-domain WHOIS deadline so that normally fires first.
+EMBEDDED_URL_DEADLINE_SECONDS = float(os.getenv("EMBEDDED_URL_DEADLINE_SECONDS", "2.0"))
+
+PHRASE_STAGE = stage_timer("message", "phrases")
+EMBEDDED_URL_STAGE = stage_timer("message", "embedded_urls")
 
 HIGH_RISK_PATTERNS = [
     "verify your account",
@@ -30,62 +42,107 @@ OTP_SAFE_PATTERNS = [
 ]
 
 
+# Compiled into the shared phrase automaton (category -> (weight, phrases)).
+scam_phrases.update({
+    "otp_safe": (-20, OTP_SAFE_PATTERNS),
+    "high_risk": (40, HIGH_RISK_PATTERNS),
+    "medium_risk": (20, MEDIUM_RISK_PATTERNS),
+})
+
+
 def extract_urls(message: str):
     url_regex = r"(https?://[^\s]+)"
     return re.findall(url_regex, message)
 
 
-def calculate_message_risk_score(message: str, msg_pipe, url_pipe) -> Dict:
+def distinct_urls(message: str):
+    """Embedded URLs, each once, in order of appearance."""
+    return list(dict.fromkeys(extract_urls(message)))
+
+
+def _phrase_signals(message: str):
+    """OTP / high-risk / medium-risk phrase rules. Returns (score, reasons)."""
     score = 0
     reasons = []
 
-    msg_lower = message.lower()
+    # One pass over the message for every phrase list
+    with PHRASE_STAGE.time():
+        matches = scam_phrases.find_all(message)
 
-    # OTP-safe detection
-    if any(p in msg_lower for p in OTP_SAFE_PATTERNS):
-        score -= 20
+    # OTP-safe detection (counts once, however many OTP phrases match)
+    otp = [m for m in matches if m.category == "otp_safe"]
+    if otp:
+        score += otp[0].weight
         reasons.append("OTP-style message detected (usually safe)")
 
     # High-risk patterns
-    for pattern in HIGH_RISK_PATTERNS:
-        if pattern in msg_lower:
-            score += 40
-            reasons.append(f"High-risk phrase detected: '{pattern}'")
+    for m in matches:
+        if m.category == "high_risk":
+            score += m.weight
+            reasons.append(f"High-risk phrase detected: '{m.phrase}'")
 
     # Medium-risk patterns
-    for pattern in MEDIUM_RISK_PATTERNS:
-        if pattern in msg_lower:
-            score += 20
-            reasons.append(f"Suspicious phrase detected: '{pattern}'")
-
-    # Scan URLs inside message
-    for url in extract_urls(message):
-        url_result = calculate_risk_score(url, url_pipe)
-        if url_result["risk_score"] >= 40:
-            score += min(url_result["risk_score"], 60)
-            reasons.append(f"Suspicious URL detected: {url}")
-
-    # ML for message text
-    try:
-        p = msg_pipe.predict_proba([message])[0][1]
-        ml_score = int(round(p * 100))
-
-        if ml_score >= 85:
-            score += 55
-            reasons.append(f"ML strongly indicates scam message (p={p:.2f})")
-        elif ml_score >= 60:
-            score += 30
-            reasons.append(f"ML indicates suspicious message (p={p:.2f})")
-        elif ml_score >= 40:
-            score += 10
-            reasons.append(f"ML sees mild risk in message (p={p:.2f})")
-        else:
-            reasons.append(f"ML sees low risk in message (p={p:.2f})")
-
-    except Exception as e:
-        score += 10
-        reasons.append(f"ML check unavailable (model/vectorizer issue): {e}")
-
+    for m in matches:
+        if m.category == "medium_risk":
+            score += m.weight
+            reasons.append(f"Suspicious phrase detected: '{m.phrase}'")
+
+    return score, reasons
+
+
+def _reuse_key(phrase_score: int, phrase_reasons: list, urls):
+    """What a near-duplicate must share with its cluster besides the text:
+    the phrase rule outcome and each link's static URL signals. Both are
+    cheap and rerun on every check, so an inserted scam phrase or a link
+    blocked since the cluster was scored always gets the message scored in
+    full."""
+    static = []
+    for url in urls:
+        score, reasons, blacklisted = _static_signals(url, _extract_domain(url))
+        static.append((url, score, tuple(reasons), blacklisted))
+    return phrase_score, tuple(sorted(phrase_reasons)), tuple(sorted(static))
+
+
+def _embedded_url_signal(url: str, url_result: Dict):
+    if url_result["risk_score"] >= 40:
+        return min(url_result["risk_score"], 60), [f"Suspicious URL detected: {url}"]
+    return 0, []
+
+
+def _embedded_urls_signal(urls, url_results):
+    """
+    Signals for a message's distinct URLs. ``url_results`` maps url -> verdict,
+    or is None when the scan ran out of EMBEDDED_URL_DEADLINE_SECONDS.
+    Returns (score, reasons, complete); incomplete verdicts aren't cached.
+    """
+    if url_results is None:
+        return 0, [f"Link check did not finish in time ({len(urls)} links not scored)"], False
+
+    score, reasons, complete = 0, [], True
+    for url in urls:
+        url_score, url_reasons = _embedded_url_signal(url, url_results[url])
+        score += url_score
+        reasons += url_reasons
+        complete = complete and is_cacheable(url_results[url])
+    return score, reasons, complete
+
+
+def _message_ml_signal(p: float = None, error: Exception = None):
+    if error is not None:
+        return 10, [f"ML check unavailable (model/vectorizer issue): {error}"]
+
+    ml_score = int(round(p * 100))
+
+    if ml_score >= 85:
+        return 55, [f"ML strongly indicates scam message (p={p:.2f})"]
+    if ml_score >= 60:
+        return 30, [f"ML indicates suspicious message (p={p:.2f})"]
+    if ml_score >= 40:
+        return 10, [f"ML sees mild risk in message (p={p:.2f})"]
+    return 0, [f"ML sees low risk in message (p={p:.2f})"]
+
+
+def _final_message_verdict(score: int, reasons: list) -> Dict:
     score = max(0, min(score, 100))
 
     if score >= 80:
@@ -103,4 +160,44 @@ def calculate_message_risk_score(message: str, msg_pipe, url_pipe) -> Dict:
         "verdict": verdict,
         "confidence": confidence,
         "reasons": reasons if reasons else ["No phishing indicators detected"]
-    }
\ No newline at end of file
+    }
+
+
+def calculate_message_risk_score(message: str, msg_pipe, url_pipe) -> Dict:
+    cached = verdict_cache.get("message", message)
+    if cached is not None:
+        return cached
+    score, reasons = _phrase_signals(message)
+    urls = distinct_urls(message)
+
+    # a variant of a recently scored text with the same cheap signals
+    # (detection/near_duplicates.py)
+    reused, probe = near_duplicate_index.lookup(message, lambda: _reuse_key(score, reasons, urls))
+    if reused is not None:
+        return reused
+
+    # Scan URLs inside message: each distinct link once, WHOIS in parallel,
+    # one model call for all of them
+    url_results = {}
+    if urls:
+        with EMBEDDED_URL_STAGE.time():
+            url_results = dict(zip(urls, calculate_risk_scores(urls, url_pipe, EMBEDDED_URL_DEADLINE_SECONDS)))
+    url_score, url_reasons, complete = _embedded_urls_signal(urls, url_results)
+    score += url_score
+    reasons += url_reasons
+
+    # ML for message text
+    try:
+        with ML_STAGES["message"].time():
+            p = _ml_phishing_probability(msg_pipe, message)
+        ml_score, ml_reasons = _message_ml_signal(p)
+    except Exception as e:
+        ml_score, ml_reasons = _message_ml_signal(error=e)
+    score += ml_score
+    reasons += ml_reasons
+
+    result = _final_message_verdict(score, reasons)
+    if complete:
+        verdict_cache.put("message", message, result)
+        near_duplicate_index.add(probe, message, result)
+    return result
@@ -0,0 +1,298 @@
+"""Near-duplicate index in front of the message risk engine.
+
+Scam waves reuse one text with small changes (names, amounts, links), so
+the exact-match verdict cache misses every variant and each one pays for
+phrase rules, the message model and the embedded-URL scan. This index keeps
+a cluster per recently scored text and answers variants with the cluster's
+verdict.
+
+Texts are compared by the Jaccard similarity of their word bigrams after
+message_template() (case, digits, punctuation and URLs normalised), estimated
+with a NEAR_DUP_PERMUTATIONS-slot MinHash signature and found through LSH
+banding: NEAR_DUP_BANDS tables keyed on slices of the signature, so a lookup
+is a few dict probes plus a signature comparison per candidate, never a scan.
+A message reuses a cluster's verdict when
+
+- the estimated similarity is at least NEAR_DUP_MIN_SIMILARITY;
+- its links are exactly the cluster's URLs, compared in full (a familiar
+  text must not vouch for a link nobody has scored, nor for another path on
+  a domain somebody has);
+- its cheap signals, the phrase rules and each link's static URL signals,
+  come out exactly as they did for the cluster. The engines rerun them on
+  every check and pass the outcome in, so a known-benign text with a scam
+  phrase inserted is always scored in full;
+- the verdict was computed under the current verdict_cache generation
+  (same models and reputation lists).
+
+Texts under NEAR_DUP_MIN_WORDS words are not indexed; too little text to
+call anything a near-duplicate. Only complete verdicts (no WHOIS deadline
+missed) start or refresh a cluster.
+
+Memory is bounded: clusters expire NEAR_DUP_TTL_SECONDS after their last
+match and at most NEAR_DUP_MAX_CLUSTERS are kept (least recently matched
+evicted first). The index is per process and starts empty; stored
+message_checks rows lack the risk score and reasons a reused verdict needs.
+NEAR_DUP_INDEX=off disables it.
+"""
+import itertools
+import os
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+from detection.verdict_cache import is_cacheable, verdict_cache
+from utils.metrics import stage_timer
+
+NEAR_DUP_INDEX = os.getenv("NEAR_DUP_INDEX", "on")
+NEAR_DUP_MIN_SIMILARITY = float(os.getenv("NEAR_DUP_MIN_SIMILARITY", "0.7"))
+NEAR_DUP_MIN_WORDS = int(os.getenv("NEAR_DUP_MIN_WORDS", "8"))
+NEAR_DUP_TTL_SECONDS = float(os.getenv("NEAR_DUP_TTL_SECONDS", "3600"))
+NEAR_DUP_MAX_CLUSTERS = int(os.getenv("NEAR_DUP_MAX_CLUSTERS", "10000"))
+NEAR_DUP_PERMUTATIONS = int(os.getenv("NEAR_DUP_PERMUTATIONS", "64"))
+NEAR_DUP_BANDS = int(os.getenv("NEAR_DUP_BANDS", "16"))
+
+_URL_RE = re.compile(r"https?://[^\s]+")
+_DIGITS_RE = re.compile(r"\d+")
+_NON_WORD_RE = re.compile(r"[^\w<>]+")
+
+LOOKUP_STAGE = stage_timer("message", "near_duplicates")
+
+
+def message_template(message: str) -> str:
+    """The message with URLs, numbers, case, punctuation and spacing normalised."""
+    text = _URL_RE.sub(" <url> ", message.lower())
+    text = _DIGITS_RE.sub("0", text)
+    return " ".join(_NON_WORD_RE.sub(" ", text).split())
+
+
+class _Cluster:
+    __slots__ = ("id", "signature", "urls", "signals", "result", "generation", "size", "reused",
+                 "first_seen", "last_seen", "sample")
+
+    def __init__(self, cluster_id: str, signature, urls, signals, result: Dict, generation: str, now: float,
+                 sample: str):
+        self.id = cluster_id
+        self.signature = signature
+        self.urls = urls
+        self.signals = signals
+        self.result = result
+        self.generation = generation
+        self.size = 1
+        self.reused = 0
+        self.first_seen = now
+        self.last_seen = now
+        self.sample = sample
+
+
+class Probe:
+    """A message's signature, links and cheap signals, computed once per check."""
+
+    __slots__ = ("signature", "urls", "signals", "bands", "cluster", "similarity")
+
+    def __init__(self, signature, urls, bands, signals: Hashable = ()):
+        self.signature = signature
+        self.urls = urls
+        self.signals = signals
+        self.bands = bands
+        self.cluster = None
+        self.similarity = 0.0
+
+
+class NearDuplicateIndex:
+    def __init__(
+        self,
+        min_similarity: float = NEAR_DUP_MIN_SIMILARITY,
+        ttl: float = NEAR_DUP_TTL_SECONDS,
+        max_clusters: int = NEAR_DUP_MAX_CLUSTERS,
+        permutations: int = NEAR_DUP_PERMUTATIONS,
+        bands: int = NEAR_DUP_BANDS,
+        min_words: int = NEAR_DUP_MIN_WORDS,
+        enabled: bool = NEAR_DUP_INDEX != "off",
+    ):
+        if permutations % bands:
+            raise ValueError("NEAR_DUP_PERMUTATIONS must be a multiple of NEAR_DUP_BANDS")
+        self.min_similarity = min_similarity
+        self.ttl = ttl
+        self.max_clusters = max_clusters
+        self.permutations = permutations
+        self.rows = permutations // bands
+        self.min_words = min_words
+        self.enabled = enabled
+        # multiply-shift hashing: h(x) = (a * x + b) mod 2**64 >> 32, a odd
+        rng = np.random.default_rng(20240601)
+        self._a = rng.integers(1, 2 ** 63, permutations, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2 ** 63, permutations, dtype=np.uint64)
+        # band -> cluster id, or a set of ids once two clusters share the band
+        self._tables = [dict() for _ in range(bands)]
+        self._clusters: "OrderedDict[str, _Cluster]" = OrderedDict()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def set_enabled(self, enabled: bool) -> None:
+        self.enabled = enabled
+
+    def probe(self, message: str) -> Optional[Probe]:
+        """Signature and links of ``message``; None if it is too short to index."""
+        words = message_template(message).split()
+        if not self.enabled or len(words) < self.min_words:
+            return None
+        shingles = {zlib.crc32(f"{a} {b}".encode()) for a, b in zip(words, words[1:])}
+        hashes = np.fromiter(shingles, dtype=np.uint64, count=len(shingles))
+        signature = ((np.outer(hashes, self._a) + self._b) >> np.uint64(32)).min(axis=0).astype(np.uint32)
+        raw = signature.tobytes()
+        step = self.rows * 4
+        bands = [raw[i:i + step] for i in range(0, len(raw), step)]
+        return Probe(signature, frozenset(_URL_RE.findall(message)), bands)
+
+    def _expire(self, now: float) -> None:
+        while self._clusters:
+            cluster = next(iter(self._clusters.values()))
+            if len(self._clusters) <= self.max_clusters and now - cluster.last_seen < self.ttl:
+                break
+            self._remove(cluster)
+            self.evictions += 1
+
+    def _remove(self, cluster: _Cluster) -> None:
+        del self._clusters[cluster.id]
+        raw = cluster.signature.tobytes()
+        step = self.rows * 4
+        for table, band in zip(self._tables, (raw[i:i + step] for i in range(0, len(raw), step))):
+            ids = table.get(band)
+            if ids == cluster.id:
+                del table[band]
+            elif isinstance(ids, set):
+                ids.discard(cluster.id)
+                if len(ids) == 1:
+                    table[band] = ids.pop()
+
+    def _nearest(self, probe: Probe) -> None:
+        candidates = set()
+        for table, band in zip(self._tables, probe.bands):
+            ids = table.get(band)
+            if isinstance(ids, set):
+                candidates.update(ids)
+            elif ids is not None:
+                candidates.add(ids)
+        best, best_similarity = None, 0.0
+        for cluster_id in candidates:
+            cluster = self._clusters[cluster_id]
+            if cluster.urls != probe.urls or cluster.signals != probe.signals:
+                continue
+            similarity = np.count_nonzero(cluster.signature == probe.signature) / self.permutations
+            if similarity > best_similarity:
+                best, best_similarity = cluster, similarity
+        if best is not None and best_similarity >= self.min_similarity:
+            probe.cluster, probe.similarity = best, best_similarity
+
+    def lookup(self, message: str, signals: Callable[[], Hashable] = tuple) -> Tuple[Optional[Dict], Optional[Probe]]:
+        """The verdict of ``message``'s cluster, if it may be reused, and the
+        probe to hand to add() once the message has been scored. ``signals()``
+        summarises the message's cheap signals; it is only called for texts
+        long enough to index."""
+        with LOOKUP_STAGE.time():
+            return self._lookup(message, signals)
+
+    def _lookup(self, message: str, signals: Callable[[], Hashable]) -> Tuple[Optional[Dict], Optional[Probe]]:
+        probe = self.probe(message)
+        if probe is None:
+            return None, None
+        probe.signals = signals()
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            self._nearest(probe)
+            cluster = probe.cluster
+            if cluster is None or cluster.generation != verdict_cache.generation:
+                self.misses += 1
+                return None, probe
+            cluster.size += 1
+            cluster.reused += 1
+            cluster.last_seen = now
+            self._clusters.move_to_end(cluster.id)
+            self.hits += 1
+            result = dict(cluster.result)
+        result["reasons"] = result["reasons"] + [
+            f"Near-duplicate of message cluster {cluster.id} (similarity {probe.similarity:.2f})"
+        ]
+        return result, probe
+
+    def add(self, probe: Optional[Probe], message: str, result: Dict) -> None:
+        """Records a freshly scored message: refreshes its cluster's verdict
+        or starts a new cluster."""
+        if probe is None or not is_cacheable(result):
+            return
+        now = time.time()
+        generation = verdict_cache.generation
+        with self._lock:
+            cluster = probe.cluster
+            if cluster is not None and cluster.id in self._clusters:
+                cluster.result, cluster.generation = result, generation
+                cluster.size += 1
+                cluster.last_seen = now
+                self._clusters.move_to_end(cluster.id)
+                return
+            cluster = _Cluster(f"c{next(self._ids)}", probe.signature, probe.urls, probe.signals, result,
+                               generation, now, message[:200])
+            self._clusters[cluster.id] = cluster
+            for table, band in zip(self._tables, probe.bands):
+                ids = table.get(band)
+                if ids is None:
+                    table[band] = cluster.id
+                elif isinstance(ids, set):
+                    ids.add(cluster.id)
+                else:
+                    table[band] = {ids, cluster.id}
+            self._expire(now)
+
+    def clusters(self, limit: int = 50, min_size: int = 1) -> List[Dict]:
+        """Largest live clusters first."""
+        with self._lock:
+            live = [cluster for cluster in self._clusters.values() if cluster.size >= min_size]
+            live.sort(key=lambda cluster: -cluster.size)
+            return [
+                {
+                    "cluster_id": cluster.id,
+                    "size": cluster.size,
+                    "reused": cluster.reused,
+                    "verdict": cluster.result["verdict"],
+                    "risk_score": cluster.result["risk_score"],
+                    "urls": sorted(cluster.urls),
+                    "first_seen": datetime.utcfromtimestamp(cluster.first_seen).isoformat(),
+                    "last_seen": datetime.utcfromtimestamp(cluster.last_seen).isoformat(),
+                    "sample": cluster.sample,
+                }
+                for cluster in live[:limit]
+            ]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._clusters.clear()
+            for table in self._tables:
+                table.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "clusters": len(self._clusters),
+                "max_clusters": self.max_clusters,
+                "ttl_seconds": self.ttl,
+                "min_similarity": self.min_similarity,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+
+near_duplicate_index = NearDuplicateIndex()
@@ -0,0 +1,117 @@
+"""Aho-Corasick phrase matching for the message rules.
+
+The message engine and the rule-based detector used to run one ``in`` scan of
+the whole message per phrase, so cost grew linearly with the phrase lists.
+PhraseEngine compiles every phrase of every category into one automaton and
+reports all matches in a single pass over the text, whatever the number of
+phrases.
+
+Categories carry a weight and are registered by the modules that own the
+phrase lists (see message_risk_engine and ml.rule_based). Updating a category
+builds a new automaton off to the side and swaps it in with one assignment,
+so concurrent readers always see either the old or the new lists, never a
+half-built one.
+"""
+import threading
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+
+
+class PhraseMatch(NamedTuple):
+    phrase: str
+    category: str
+    weight: int
+    # Position of the phrase in its category's list, so callers can keep the
+    # list order in their reasons.
+    order: int
+
+
+class PhraseAutomaton:
+    """Immutable compiled automaton. Phrases are matched case-insensitively
+    as substrings, exactly like ``phrase in text.lower()``."""
+
+    def __init__(self, entries: List[PhraseMatch]):
+        self.entries = entries
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[int, ...]] = [()]
+
+        outputs: List[List[int]] = [[]]
+        for index, entry in enumerate(entries):
+            node = 0
+            for ch in entry.phrase:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    outputs.append([])
+                node = nxt
+            outputs[node].append(index)
+
+        # Breadth-first: fail links, and fold each node's fail-chain outputs
+        # into its own so matching never has to walk the chain.
+        queue = list(self._goto[0].values())
+        head = 0
+        while head < len(queue):
+            node = queue[head]
+            head += 1
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                outputs[child].extend(outputs[self._fail[child]])
+
+        self._out = [tuple(o) for o in outputs]
+
+    def find_all(self, text: str) -> List[PhraseMatch]:
+        """Every entry that occurs in ``text``, once each, in entry order."""
+        goto, fail, out = self._goto, self._fail, self._out
+        found = set()
+        node = 0
+        for ch in text.lower():
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                found.update(out[node])
+        return [self.entries[i] for i in sorted(found)]
+
+
+class PhraseEngine:
+    def __init__(self):
+        self._categories: Dict[str, Tuple[int, Tuple[str, ...]]] = {}
+        self._lock = threading.Lock()
+        self._automaton = PhraseAutomaton([])
+
+    def update(self, categories: Dict[str, Tuple[int, Iterable[str]]]) -> None:
+        """Adds or replaces categories: ``{name: (weight, phrases)}``."""
+        with self._lock:
+            merged = dict(self._categories)
+            for name, (weight, phrases) in categories.items():
+                merged[name] = (weight, tuple(p.lower() for p in phrases))
+
+            entries = [
+                PhraseMatch(phrase, name, weight, order)
+                for name, (weight, phrases) in merged.items()
+                for order, phrase in enumerate(phrases)
+                if phrase
+            ]
+            automaton = PhraseAutomaton(entries)
+
+            # single reference swap; readers never see a partial build
+            self._categories = merged
+            self._automaton = automaton
+
+    def find_all(self, text: str) -> List[PhraseMatch]:
+        return self._automaton.find_all(text)
+
+    def phrase_count(self) -> int:
+        return len(self._automaton.entries)
+
+
+# Shared by message_risk_engine and ml.rule_based.
+scam_phrases = PhraseEngine()
@@ -0,0 +1,53 @@
+"""Stable codes for the reasons the risk engines give.
+
+Reasons are free text with the domain, brand or model probability spelled
+into them, one distinct string per check. To count them (utils/metrics.py)
+each maps to the code of the rule that wrote it. Keep REASON_CODES in step
+with the wording in risk_engine, message_risk_engine and near_duplicates;
+a reason no entry matches counts as "other".
+"""
+from typing import Dict
+
+from utils.metrics import VERDICT_REASONS_TOTAL, VERDICTS_TOTAL, is_enabled
+
+# (code, text the reason contains), first match wins
+REASON_CODES = [
+    ("trusted_domain", "is in the trusted list"),
+    ("blacklisted", "is blacklisted"),
+    ("blacklist_unverified", "may be blacklisted"),
+    ("typosquat", "suspected of typo-squatting"),
+    ("no_http_scheme", "does not use http:// or https://"),
+    ("whois_pending", "Domain age check pending"),
+    ("new_domain", "Newly registered domain"),
+    ("young_domain", "Domain registered less than a year ago"),
+    ("whois_private_gov", "WHOIS may be private by policy"),
+    ("unknown_domain_age", "Domain age could not be verified"),
+    ("ml_unavailable", "ML check unavailable"),
+    ("ml_high", "strongly indicates"),
+    ("ml_suspicious", "indicates suspicious"),
+    ("ml_mild", "mild risk"),
+    ("ml_low", "low risk"),
+    ("otp_message", "OTP-style message"),
+    ("high_risk_phrase", "High-risk phrase detected"),
+    ("suspicious_phrase", "Suspicious phrase detected"),
+    ("suspicious_url", "Suspicious URL detected"),
+    ("link_check_timeout", "Link check did not finish in time"),
+    ("near_duplicate", "Near-duplicate of message cluster"),
+    ("no_indicators", "No phishing indicators detected"),
+]
+
+
+def reason_code(reason: str) -> str:
+    for code, text in REASON_CODES:
+        if text in reason:
+            return code
+    return "other"
+
+
+def record_verdict(kind: str, result: Dict) -> None:
+    """Counts one answered check of ``kind`` ("url" or "message")."""
+    if not is_enabled():
+        return
+    VERDICTS_TOTAL.labels(kind, result["verdict"]).inc()
+    for reason in result["reasons"]:
+        VERDICT_REASONS_TOTAL.labels(kind, reason_code(reason)).inc()
@@ -0,0 +1,449 @@
+"""Domain reputation store: trusted domains, blacklist and known brands.
+
+All three lists live in one immutable snapshot. Trusted/blocked lookups walk
+the domain's parents (``a.b.example.com`` -> ``b.example.com`` ->
+``example.com`` -> ``com``) with one set probe per label, so the cost is
+O(labels) no matter how many millions of entries the lists hold. A listed
+domain covers its subdomains.
+
+Sources (REPUTATION_SOURCE):
+- ``file`` (default): REPUTATION_DIR/{trusted_domains,blacklist_domains,brands}.txt,
+  one entry per line. ``#`` comments and hosts-file lines
+  (``0.0.0.0 bad.example``) are accepted, so threat feeds can be dropped in as-is.
+- ``db``: the ``reputation_entries`` table.
+
+Entries from the source are added to the built-in defaults below. A watcher
+thread polls the source every REPUTATION_RELOAD_SECONDS and swaps in a fresh
+snapshot when it changed, so each worker picks up new feeds without a restart.
+
+Large blacklists: set BLACKLIST_BLOOM_PATH to a filter built with
+``python -m detection.bloom_filter build`` and keep the full feed in
+``reputation_entries`` (list_type "blocked"). The feed is then not held in
+memory; domains the filter rules out are answered immediately and only
+probable positives are confirmed with an indexed query. The filter file is
+hot-reloaded like the lists.
+
+The answers of that query, blocked or not, are kept in an LRU of
+REPUTATION_EXACT_CACHE_SIZE entries, cleared on every reload. The async
+engine resolves uncached positives on an executor (confirm_blocked) before
+scoring, so the query never runs on the event loop. If the query fails, the
+domain is reported as unverified rather than clean (check_blocked) and the
+failure counted in stats()["bloom"]["exact_check_errors"]. That outcome is
+remembered for REPUTATION_UNVERIFIED_SECONDS, so the scoring that follows on
+the loop, and other checks meanwhile, don't query a failing store again.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from database import ReputationEntry, SessionLocal
+from detection.bloom_filter import BloomFilter
+from utils.logger import logger
+
+DEFAULT_TRUSTED_DOMAINS = [
+    "paypal.com",
+    "google.com",
+    "microsoft.com",
+    "amazon.com",
+    "apple.com",
+    "fnb.co.za",
+    "standardbank.co.za",
+    "absa.co.za",
+    "capitecbank.co.za",
+    "gov.za",
+    "gcis.gov.za",
+]
+
+DEFAULT_BLACKLIST_DOMAINS = [
+    "phishingsite.com",
+    "secure-login.bank.com",
+]
+
+DEFAULT_BRANDS = [
+    "paypal",
+    "google",
+    "microsoft",
+    "apple",
+    "amazon",
+    "absa",
+    "fnb",
+    "standardbank",
+    "capitec",
+]
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+REPUTATION_SOURCE = os.getenv("REPUTATION_SOURCE", "file")
+REPUTATION_DIR = os.getenv("REPUTATION_DIR", os.path.join(BASE_DIR, "data", "reputation"))
+REPUTATION_RELOAD_SECONDS = float(os.getenv("REPUTATION_RELOAD_SECONDS", "30"))
+BLACKLIST_BLOOM_PATH = os.getenv("BLACKLIST_BLOOM_PATH", "")
+REPUTATION_EXACT_CACHE_SIZE = int(os.getenv("REPUTATION_EXACT_CACHE_SIZE", "10000"))
+REPUTATION_UNVERIFIED_SECONDS = float(os.getenv("REPUTATION_UNVERIFIED_SECONDS", "5"))
+
+LIST_FILES = {
+    "trusted": "trusted_domains.txt",
+    "blocked": "blacklist_domains.txt",
+    "brand": "brands.txt",
+}
+
+
+def normalize_domain(domain: str) -> str:
+    domain = domain.strip().lower().rstrip(".")
+    if domain.startswith("www."):
+        domain = domain[4:]
+    return domain
+
+
+def _parents(domain: str):
+    """``a.b.com`` -> ``a.b.com``, ``b.com``, ``com``."""
+    while True:
+        yield domain
+        dot = domain.find(".")
+        if dot < 0:
+            return
+        domain = domain[dot + 1:]
+
+
+def _parent_match(domain: str, entries: FrozenSet[str]) -> Optional[str]:
+    """The listed entry covering ``domain`` (itself or a parent), if any."""
+    for candidate in _parents(domain):
+        if candidate in entries:
+            return candidate
+    return None
+
+
+class ReputationSnapshot:
+    def __init__(self, trusted: Iterable[str], blocked: Iterable[str], brands: Iterable[str], version: str):
+        self.trusted = frozenset(normalize_domain(d) for d in trusted if d)
+        self.blocked = frozenset(normalize_domain(d) for d in blocked if d)
+        self.brands = tuple(dict.fromkeys(b.strip().lower() for b in brands if b.strip()))
+        self.version = version
+        self.loaded_at = time.time()
+
+    def trusted_entry(self, domain: str) -> Optional[str]:
+        return _parent_match(normalize_domain(domain), self.trusted) if domain else None
+
+    def blocked_entry(self, domain: str) -> Optional[str]:
+        return _parent_match(normalize_domain(domain), self.blocked) if domain else None
+
+
+def _read_list(path: str) -> List[str]:
+    entries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if line:
+                # hosts-file style "0.0.0.0 domain" -> take the last field
+                entries.append(line.split()[-1])
+    return entries
+
+
+class FileSource:
+    def __init__(self, directory: str = REPUTATION_DIR):
+        self.directory = directory
+
+    def _paths(self):
+        return {kind: os.path.join(self.directory, name) for kind, name in LIST_FILES.items()}
+
+    def version(self) -> str:
+        parts = []
+        for kind, path in self._paths().items():
+            try:
+                st = os.stat(path)
+                parts.append(f"{kind}:{st.st_mtime_ns}:{st.st_size}")
+            except FileNotFoundError:
+                parts.append(f"{kind}:-")
+        return "|".join(parts)
+
+    def load(self, include_blocked: bool = True) -> dict:
+        # Local files are operator overrides and always loaded in full; big
+        # feeds behind the bloom filter belong in the DB (see module docstring).
+        lists = {}
+        for kind, path in self._paths().items():
+            lists[kind] = _read_list(path) if os.path.exists(path) else []
+        return lists
+
+
+class DatabaseSource:
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
+
+    def version(self) -> str:
+        db = self.session_factory()
+        try:
+            count, max_id = db.execute(
+                select(func.count(ReputationEntry.id), func.max(ReputationEntry.id))
+            ).one()
+            return f"db:{count}:{max_id}"
+        finally:
+            db.close()
+
+    def load(self, include_blocked: bool = True) -> dict:
+        lists = {kind: [] for kind in LIST_FILES}
+        query = select(ReputationEntry.list_type, ReputationEntry.entry)
+        if not include_blocked:
+            query = query.where(ReputationEntry.list_type != "blocked")
+        db = self.session_factory()
+        try:
+            for list_type, entry in db.execute(query.execution_options(yield_per=10000)):
+                if list_type in lists:
+                    lists[list_type].append(entry)
+        finally:
+            db.close()
+        return lists
+
+    def find_blocked(self, candidates: List[str]) -> Optional[str]:
+        """Exact check used behind the bloom filter."""
+        db = self.session_factory()
+        try:
+            return db.execute(
+                select(ReputationEntry.entry)
+                .where(ReputationEntry.list_type == "blocked", ReputationEntry.entry.in_(candidates))
+                .limit(1)
+            ).scalar()
+        finally:
+            db.close()
+
+
+class DomainReputationStore:
+    def __init__(self, source=None, reload_interval: float = REPUTATION_RELOAD_SECONDS,
+                 bloom_path: str = BLACKLIST_BLOOM_PATH, exact_blocklist=None):
+        self.source = source
+        self.reload_interval = reload_interval
+        self.reloads = 0
+
+        # Bloom prefilter + exact store for blacklists too big to hold in memory
+        self.bloom_path = bloom_path
+        self.exact_blocklist = exact_blocklist or (DatabaseSource() if bloom_path else None)
+        self._bloom: Optional[BloomFilter] = None
+        self._bloom_stamp = None
+        self.bloom_negatives = 0
+        self.bloom_positives = 0
+        self.bloom_false_positives = 0
+        self.exact_check_errors = 0
+        # bloom candidates -> exact store answer (None: false positive)
+        self._exact: "OrderedDict[Tuple[str, ...], Optional[str]]" = OrderedDict()
+        # bloom candidates -> monotonic deadline of a failed exact check
+        self._unverified: Dict[Tuple[str, ...], float] = {}
+        self._exact_lock = threading.Lock()
+        self.exact_cache_size = REPUTATION_EXACT_CACHE_SIZE
+        self.unverified_seconds = REPUTATION_UNVERIFIED_SECONDS
+        self.exact_cache_hits = 0
+        self._listeners: List[Callable[[ReputationSnapshot], None]] = []
+        self._lock = threading.Lock()
+        self._watcher = None
+        self._stop = threading.Event()
+        self._snapshot = ReputationSnapshot(
+            DEFAULT_TRUSTED_DOMAINS, DEFAULT_BLACKLIST_DOMAINS, DEFAULT_BRANDS, "defaults"
+        )
+
+    @property
+    def snapshot(self) -> ReputationSnapshot:
+        return self._snapshot
+
+    @property
+    def version(self) -> str:
+        """Lists version plus the bloom filter's feed version, if one is loaded."""
+        bloom = self._bloom
+        return f"{self._snapshot.version}|bloom:{bloom.feed_version}" if bloom else self._snapshot.version
+
+    def on_reload(self, listener: Callable[[ReputationSnapshot], None]) -> None:
+        """Called with the new snapshot after every successful reload."""
+        self._listeners.append(listener)
+
+    def _reload_bloom(self, force: bool) -> bool:
+        if not self.bloom_path:
+            return False
+        try:
+            st = os.stat(self.bloom_path)
+            stamp = (st.st_mtime_ns, st.st_size)
+            if not force and stamp == self._bloom_stamp:
+                return False
+            bloom = BloomFilter.load(self.bloom_path)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Blacklist bloom filter not loaded from {self.bloom_path}: {e}")
+            return False
+
+        self._bloom = bloom
+        self._bloom_stamp = stamp
+        logger.info(f"Blacklist bloom filter loaded: {bloom.feed_version} ({bloom.num_items} domains)")
+        return True
+
+    def _reload_lists(self, force: bool) -> bool:
+        if self.source is None:
+            return False
+        try:
+            version = self.source.version()
+            if not force and version == self._snapshot.version:
+                return False
+            # Behind a bloom filter the full blacklist stays in the exact store.
+            lists = self.source.load(include_blocked=self._bloom is None)
+        except (OSError, SQLAlchemyError) as e:
+            logger.warning(f"Reputation reload failed, keeping version {self._snapshot.version}: {e}")
+            return False
+
+        snapshot = ReputationSnapshot(
+            DEFAULT_TRUSTED_DOMAINS + lists["trusted"],
+            DEFAULT_BLACKLIST_DOMAINS + lists["blocked"],
+            DEFAULT_BRANDS + lists["brand"],
+            version,
+        )
+        self._snapshot = snapshot
+        logger.info(
+            f"Reputation lists loaded ({version}): {len(snapshot.trusted)} trusted, "
+            f"{len(snapshot.blocked)} blocked, {len(snapshot.brands)} brands"
+        )
+        return True
+
+    def reload(self, force: bool = False) -> bool:
+        """Rebuilds whatever changed at the source. Returns True if anything was swapped."""
+        with self._lock:
+            changed = self._reload_bloom(force)
+            changed = self._reload_lists(force) or changed
+            if not changed:
+                return False
+            with self._exact_lock:
+                self._exact.clear()
+                self._unverified.clear()
+            self.reloads += 1
+            snapshot = self._snapshot
+
+        for listener in self._listeners:
+            listener(snapshot)
+        return True
+
+    def start_watcher(self) -> None:
+        if self._watcher is not None or (self.source is None and not self.bloom_path):
+            return
+
+        def watch():
+            while not self._stop.wait(self.reload_interval):
+                self.reload()
+
+        self._watcher = threading.Thread(target=watch, name="reputation-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self) -> None:
+        self._stop.set()
+
+    # Lookups always go through one snapshot reference.
+    def is_trusted(self, domain: str) -> bool:
+        return self._snapshot.trusted_entry(domain) is not None
+
+    def _bloom_candidates(self, domain: str) -> Tuple[str, ...]:
+        bloom = self._bloom
+        if bloom is None or not domain:
+            return ()
+        return tuple(d for d in _parents(normalize_domain(domain)) if d in bloom)
+
+    def _unverified_until(self, candidates: Tuple[str, ...]) -> Optional[float]:
+        # caller holds _exact_lock
+        until = self._unverified.get(candidates)
+        if until is not None and until <= time.monotonic():
+            del self._unverified[candidates]
+            return None
+        return until
+
+    def check_blocked(self, domain: str) -> Tuple[Optional[str], bool]:
+        """(blocking entry or None, unverified). ``unverified`` is True when the
+        bloom filter matched but the exact store could not be asked, now or
+        in the last ``unverified_seconds``."""
+        entry = self._snapshot.blocked_entry(domain)
+        if entry is not None:
+            return entry, False
+        candidates = self._bloom_candidates(domain)
+        if not candidates:
+            if self._bloom is not None and domain:
+                self.bloom_negatives += 1
+            return None, False
+
+        with self._exact_lock:
+            if candidates in self._exact:
+                self._exact.move_to_end(candidates)
+                self.exact_cache_hits += 1
+                return self._exact[candidates], False
+            if self._unverified_until(candidates) is not None:
+                return None, True
+
+        try:
+            entry = self.exact_blocklist.find_blocked(list(candidates))
+        except SQLAlchemyError as e:
+            # cached briefly, then the store is asked again
+            self.exact_check_errors += 1
+            logger.warning(f"Exact blacklist check failed for {domain}, scoring it as unverified: {e}")
+            with self._exact_lock:
+                self._unverified[candidates] = time.monotonic() + self.unverified_seconds
+                while len(self._unverified) > self.exact_cache_size:
+                    del self._unverified[next(iter(self._unverified))]
+            return None, True
+        if entry is None:
+            self.bloom_false_positives += 1
+        else:
+            self.bloom_positives += 1
+        with self._exact_lock:
+            self._unverified.pop(candidates, None)
+            self._exact[candidates] = entry
+            while len(self._exact) > self.exact_cache_size:
+                self._exact.popitem(last=False)
+        return entry, False
+
+    def blocked_entry(self, domain: str) -> Optional[str]:
+        return self.check_blocked(domain)[0]
+
+    def needs_exact_check(self, domain: str) -> bool:
+        """True if checking ``domain`` would query the exact store."""
+        if self._snapshot.blocked_entry(domain) is not None:
+            return False
+        candidates = self._bloom_candidates(domain)
+        if not candidates:
+            return False
+        with self._exact_lock:
+            return candidates not in self._exact and self._unverified_until(candidates) is None
+
+    def confirm_blocked(self, domains: Iterable[str]) -> None:
+        """Runs the exact checks ``domains`` need, filling the cache; for an
+        executor thread."""
+        for domain in domains:
+            self.check_blocked(domain)
+
+    def is_blocked(self, domain: str) -> bool:
+        return self.blocked_entry(domain) is not None
+
+    def brands(self) -> Tuple[str, ...]:
+        return self._snapshot.brands
+
+    def stats(self) -> dict:
+        snapshot = self._snapshot
+        return {
+            "source": type(self.source).__name__ if self.source else None,
+            "version": snapshot.version,
+            "trusted": len(snapshot.trusted),
+            "blocked": len(snapshot.blocked),
+            "brands": len(snapshot.brands),
+            "loaded_at": snapshot.loaded_at,
+            "reloads": self.reloads,
+            "bloom": dict(
+                self._bloom.stats(),
+                negatives=self.bloom_negatives,
+                positives=self.bloom_positives,
+                false_positives=self.bloom_false_positives,
+                exact_cache_entries=len(self._exact),
+                exact_cache_hits=self.exact_cache_hits,
+                unverified_entries=len(self._unverified),
+                exact_check_errors=self.exact_check_errors,
+            ) if self._bloom is not None else None,
+        }
+
+
+def _default_source():
+    if REPUTATION_SOURCE == "db":
+        return DatabaseSource()
+    return FileSource()
+
+
+reputation_store = DomainReputationStore(_default_source())
+reputation_store.reload()
@@ -1,12 +1,25 @@
-from datetime import datetime, timezone
+from concurrent.futures import wait
+from datetime import datetime
 import socket
-import whois
+import time
 
-from ml.rule_based import has_typosquatting, BLACKLIST_DOMAINS
 from detection.domain_utils import extract_domain, is_trusted_domain
+from detection.whois_cache import WHOIS_DEADLINE_SECONDS, domain_age_cache, whois_executor
+from detection.reputation import reputation_store
+from detection.typosquat import typosquat_detector
+# after typosquat: both rebuild on reputation reloads, the cache generation last
+from detection.verdict_cache import verdict_cache
+from utils.metrics import WHOIS_DEADLINE_EXCEEDED_TOTAL, stage_timer
 
 socket.setdefaulttimeout(5.0)
 
+# scoring_stage_seconds series (utils/metrics.py), bound once
+DOMAIN_STAGE = stage_timer("url", "domain_extraction")
+REPUTATION_STAGE = stage_timer("url", "reputation")
+TYPOSQUAT_STAGE = stage_timer("url", "typosquat")
+WHOIS_STAGE = stage_timer("url", "whois")
+ML_STAGES = {kind: stage_timer(kind, "ml") for kind in ("url", "message")}
+
 GOV_TLDS = [".gov", ".gov.za", ".ac.za", ".mil", ".edu"]
 
 
@@ -19,100 +32,118 @@ def _ml_phishing_probability(pipe, text: str) -> float:
     return float(proba)
 
 
-def calculate_risk_score(url: str, url_pipe):
+def _ml_phishing_probabilities(pipe, texts) -> list:
+    """Vectorized version of _ml_phishing_probability: one predict_proba call."""
+    if not texts:
+        return []
+    return [float(row[1]) for row in pipe.predict_proba(list(texts))]
+
+
+def _extract_domain(url: str) -> str:
+    with DOMAIN_STAGE.time():
+        return extract_domain(url)
+
+
+def _blacklisted_result(domain: str) -> dict:
+    return {
+        "risk_score": 100,
+        "verdict": "phishing",
+        "confidence": 0.98,
+        "reasons": [f"Domain '{domain}' is blacklisted"],
+        "whois_status": "skipped",
+    }
+
+
+def _static_signals(url: str, domain: str):
+    """
+    Checks 1-4: everything that needs neither the network nor the model.
+    Returns (score, reasons, blacklisted).
+    """
     score = 0
     reasons = []
 
-    domain = extract_domain(url)
+    with REPUTATION_STAGE.time():
+        trusted = is_trusted_domain(domain)
+        blocked, unverified = reputation_store.check_blocked(domain)
 
     # 1) TRUSTED DOMAIN → (keep it safe, but not always 0)
     # NOTE: Returning 0 makes everything look "too safe".
     # We'll still mark safe but allow other signals to add minimal risk if needed.
-    if is_trusted_domain(domain):
+    if trusted:
         score -= 30
         reasons.append(f"Domain '{domain}' is in the trusted list (reduce risk)")
 
     # 2) BLACKLISTED → high risk immediately
-    if domain in BLACKLIST_DOMAINS:
-        return {
-            "risk_score": 100,
-            "verdict": "phishing",
-            "confidence": 0.98,
-            "reasons": [f"Domain '{domain}' is blacklisted"]
-        }
+    if blocked:
+        return score, reasons, True
+
+    # The bloom filter matched but the exact blacklist could not be asked:
+    # suspicious, not clean
+    if unverified:
+        score += 40
+        reasons.append(f"Domain '{domain}' may be blacklisted (blacklist check unavailable)")
 
     # 3) Typosquatting
-    if has_typosquatting(domain):
+    with TYPOSQUAT_STAGE.time():
+        typosquat = typosquat_detector.match(domain)
+    if typosquat is not None:
         score += 60
-        reasons.append(f"Domain '{domain}' suspected of typo-squatting")
+        reasons.append(typosquat.reason(domain))
 
     # 4) Scheme
     if not url.lower().startswith(("http://", "https://")):
         score += 50
         reasons.append("URL does not use http:// or https://")
 
-    # 5) WHOIS domain age
-    try:
-        domain_info = whois.whois(domain)
-        creation_date = domain_info.creation_date
+    return score, reasons, False
 
-        if isinstance(creation_date, list):
-            creation_date = creation_date[0]
-        if creation_date is None:
-            raise ValueError("No creation date")
 
-        # Normalize datetime
-        if getattr(creation_date, "tzinfo", None):
-            now = datetime.now(timezone.utc)
-        else:
-            now = datetime.now()
-            creation_date = creation_date.replace(tzinfo=None)
+def _domain_age_signal(domain: str, creation_date, status: str = "ok"):
+    """
+    5) WHOIS domain age. ``status`` is "pending" when the lookup missed its
+    deadline; in that case we add no penalty and say so in the reasons.
+    """
+    if status == "pending":
+        return 0, ["Domain age check pending (WHOIS lookup did not finish in time)"]
 
-        age_in_days = (now - creation_date).days
+    if creation_date is not None:
+        # The cache always hands back naive UTC datetimes
+        age_in_days = (datetime.utcnow() - creation_date).days
 
         if age_in_days < 30:
-            score += 40
-            reasons.append(f"Newly registered domain (age: {age_in_days} days)")
-        elif age_in_days < 365:
-            score += 10
-            reasons.append("Domain registered less than a year ago")
+            return 40, [f"Newly registered domain (age: {age_in_days} days)"]
+        if age_in_days < 365:
+            return 10, ["Domain registered less than a year ago"]
+        return 0, []
 
-    except Exception as e:
-        # don't crash; use a small penalty for unknown age
-        if any(domain.endswith(tld) for tld in GOV_TLDS):
-            reasons.append("Domain is governmental/education – WHOIS may be private by policy")
-        else:
-            score += 20
-            reasons.append("Domain age could not be verified (private/unknown)")
+    # don't crash; use a small penalty for unknown age
+    if any(domain.endswith(tld) for tld in GOV_TLDS):
+        return 0, ["Domain is governmental/education – WHOIS may be private by policy"]
+    return 20, ["Domain age could not be verified (private/unknown)"]
 
-    # 6) ML probability (Pipeline)
-    try:
-        p = _ml_phishing_probability(url_pipe, url)
-        ml_score = int(round(p * 100))
-
-        # Convert ML probability into additive score
-        # (keeps scoring stable + easy to tune)
-        if ml_score >= 85:
-            score += 55
-            reasons.append(f"ML model strongly indicates phishing (p={p:.2f})")
-        elif ml_score >= 60:
-            score += 35
-            reasons.append(f"ML model indicates suspicious patterns (p={p:.2f})")
-        elif ml_score >= 40:
-            score += 15
-            reasons.append(f"ML model sees mild risk (p={p:.2f})")
-        else:
-            reasons.append(f"ML model sees low risk (p={p:.2f})")
 
-    except Exception as e:
+def _ml_signal(p: float = None, error: Exception = None):
+    """6) Convert the ML probability into an additive score."""
+    if error is not None:
         # IMPORTANT: don't silently ignore ML failure
-        score += 10
-        reasons.append(f"ML check unavailable (model/vectorizer issue): {e}")
+        return 10, [f"ML check unavailable (model/vectorizer issue): {error}"]
+
+    ml_score = int(round(p * 100))
+
+    # (keeps scoring stable + easy to tune)
+    if ml_score >= 85:
+        return 55, [f"ML model strongly indicates phishing (p={p:.2f})"]
+    if ml_score >= 60:
+        return 35, [f"ML model indicates suspicious patterns (p={p:.2f})"]
+    if ml_score >= 40:
+        return 15, [f"ML model sees mild risk (p={p:.2f})"]
+    return 0, [f"ML model sees low risk (p={p:.2f})"]
+
 
+def _final_verdict(score: int, reasons: list, whois_status: str) -> dict:
     # Clamp score
     score = max(0, min(score, 100))
 
-    # Final verdict
     if score >= 70:
         verdict = "phishing"
         confidence = min(score / 100, 0.99)
@@ -127,5 +158,117 @@ def calculate_risk_score(url: str, url_pipe):
         "risk_score": score,
         "verdict": verdict,
         "confidence": confidence,
-        "reasons": reasons if reasons else ["No phishing indicators detected"]
-    }
\ No newline at end of file
+        "reasons": reasons if reasons else ["No phishing indicators detected"],
+        "whois_status": whois_status,
+    }
+
+
+def calculate_risk_score(url: str, url_pipe):
+    cached = verdict_cache.get("url", url)
+    if cached is not None:
+        return cached
+
+    result = _score_url(url, url_pipe)
+    verdict_cache.put("url", url, result)
+    return result
+
+
+def _score_url(url: str, url_pipe):
+    domain = _extract_domain(url)
+
+    score, reasons, blacklisted = _static_signals(url, domain)
+    if blacklisted:
+        return _blacklisted_result(domain)
+
+    # 5) WHOIS domain age (cached, see detection/whois_cache.py)
+    with WHOIS_STAGE.time():
+        creation_date = domain_age_cache.get_creation_date(domain)
+    whois_status = "ok" if creation_date is not None else "unknown"
+    age_score, age_reasons = _domain_age_signal(domain, creation_date)
+    score += age_score
+    reasons += age_reasons
+
+    # 6) ML probability (Pipeline)
+    try:
+        with ML_STAGES["url"].time():
+            p = _ml_phishing_probability(url_pipe, url)
+        ml_score, ml_reasons = _ml_signal(p)
+    except Exception as e:
+        ml_score, ml_reasons = _ml_signal(error=e)
+    score += ml_score
+    reasons += ml_reasons
+
+    return _final_verdict(score, reasons, whois_status)
+
+
+def calculate_risk_scores(urls, url_pipe, whois_deadline: float = WHOIS_DEADLINE_SECONDS) -> list:
+    """
+    Sync batch scoring (the async engine has its own). Distinct URLs are scored
+    once, the model runs once over the batch and every distinct uncached domain
+    is looked up in parallel on the WHOIS pool while it does. Lookups still
+    running ``whois_deadline`` seconds after the call started are reported as
+    "pending" and finish in the background. Results come back in input order.
+    """
+    started = time.monotonic()
+    results = {}
+    pending_urls = []
+    for url in dict.fromkeys(urls):
+        cached = verdict_cache.get("url", url)
+        if cached is not None:
+            results[url] = cached
+        else:
+            pending_urls.append(url)
+
+    domains = {url: _extract_domain(url) for url in pending_urls}
+    static = {url: _static_signals(url, domains[url]) for url in pending_urls}
+    to_score = [url for url in pending_urls if not static[url][2]]
+
+    lookups = {}
+    for domain in dict.fromkeys(domains[url] for url in to_score):
+        found, creation_date = domain_age_cache.peek(domain)
+        lookups[domain] = (
+            ("ok" if creation_date is not None else "unknown", creation_date) if found
+            else whois_executor.submit(domain_age_cache.get_creation_date, domain)
+        )
+
+    try:
+        with ML_STAGES["url"].time():
+            probabilities = dict(zip(to_score, _ml_phishing_probabilities(url_pipe, to_score)))
+        ml_error = None
+    except Exception as e:
+        probabilities, ml_error = {}, e
+
+    futures = [f for f in lookups.values() if not isinstance(f, tuple)]
+    if futures:
+        # the batch's wait for its slowest lookup, one observation
+        with WHOIS_STAGE.time():
+            wait(futures, timeout=max(0.0, whois_deadline - (time.monotonic() - started)))
+
+    ages = {}
+    for domain, lookup in lookups.items():
+        if isinstance(lookup, tuple):
+            ages[domain] = lookup
+        elif not lookup.done():
+            ages[domain] = ("pending", None)
+            WHOIS_DEADLINE_EXCEEDED_TOTAL.inc()
+        else:
+            creation_date = lookup.result()
+            ages[domain] = ("ok" if creation_date is not None else "unknown", creation_date)
+
+    for url in pending_urls:
+        domain = domains[url]
+        score, reasons, blacklisted = static[url]
+        if blacklisted:
+            results[url] = _blacklisted_result(domain)
+            continue
+
+        whois_status, creation_date = ages[domain]
+        age_score, age_reasons = _domain_age_signal(domain, creation_date, whois_status)
+        ml_score, ml_reasons = _ml_signal(probabilities.get(url), ml_error)
+
+        results[url] = _final_verdict(
+            score + age_score + ml_score, reasons + age_reasons + ml_reasons, whois_status
+        )
+        verdict_cache.put("url", url, results[url])
+
+    return [results[url] for url in urls]
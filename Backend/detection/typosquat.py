@@ -0,0 +1,240 @@
+"""Typosquatting detection against the known-brand list.
+
+The old check looped over every brand and only caught domains that contained
+a brand verbatim, so ``paypa1.com`` or ``arnazon.com`` went through. This
+module indexes the brands once and answers per domain in sub-millisecond
+time whatever the size of the brand list:
+
+1. Normalize: punycode labels are decoded, accents stripped and homoglyphs
+   (Cyrillic/Greek lookalikes, ``0``->``o``, ``1``->``l``, ``rn``->``m``, ...)
+   folded into a "skeleton", applied identically to domains and brands.
+2. Embedded brands (``paypal-secure.net``) are found with one Aho-Corasick
+   pass over the skeleton (detection.phrase_matcher.PhraseAutomaton).
+3. Misspellings are found per domain token with a SymSpell-style deletion
+   index: every brand is stored under all its variants with up to
+   ``max_distance(brand)`` characters deleted, a token looks up its own
+   deletion variants, and the few candidates that share one are confirmed
+   with an exact edit distance (adjacent transpositions count as one edit).
+
+Short brands get no edit budget (``fnb`` is one typo away from countless
+legitimate names): up to 4 characters -> 0, 5-7 -> 1, 8 or more -> 2. Their
+lookalikes are still caught, since homoglyph and digraph folds happen before
+any edit is counted (``paypa1``, ``arnazon``). One edit from a 5-7 character
+brand still lands on real words (``apple`` -> ``apply``, ``ample``); tokens in
+TYPOSQUAT_ALLOWED_WORDS are never reported as misspellings.
+
+The index is rebuilt off to the side and swapped in whenever the reputation
+store reloads its brand list.
+"""
+import codecs
+import os
+import threading
+import unicodedata
+from itertools import combinations
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from detection.phrase_matcher import PhraseAutomaton, PhraseMatch
+from detection.reputation import normalize_domain, reputation_store
+
+MAX_EDIT_DISTANCE = 2
+# Longer tokens can't be within 2 edits of a brand worth indexing; they are
+# still covered by the embedded-brand scan.
+MAX_TOKEN_LENGTH = 40
+
+# Words within the edit budget of a default brand; extend with a
+# comma-separated TYPOSQUAT_ALLOWED_WORDS.
+DEFAULT_ALLOWED_WORDS = ("apply", "ample", "appel", "amazin", "goggle", "googly")
+TYPOSQUAT_ALLOWED_WORDS = frozenset(
+    DEFAULT_ALLOWED_WORDS
+    + tuple(w.strip().lower() for w in os.getenv("TYPOSQUAT_ALLOWED_WORDS", "").split(",") if w.strip())
+)
+
+# Single characters that render (nearly) like an ASCII letter.
+HOMOGLYPHS = {
+    # digits / symbols
+    "0": "o", "1": "l", "3": "e", "4": "a", "5": "s", "7": "t", "8": "b", "9": "g", "|": "l", "!": "i",
+    # Cyrillic
+    "а": "a", "в": "b", "е": "e", "ё": "e", "к": "k", "м": "m", "н": "h", "о": "o", "р": "p",
+    "с": "c", "т": "t", "у": "y", "х": "x", "ѕ": "s", "і": "i", "ї": "i", "ј": "j", "ԁ": "d",
+    "ӏ": "l", "ԛ": "q", "ԝ": "w", "ь": "b",
+    # Greek
+    "α": "a", "β": "b", "ε": "e", "η": "n", "ι": "i", "κ": "k", "ν": "v", "ο": "o", "ρ": "p",
+    "τ": "t", "υ": "u", "χ": "x", "ω": "w",
+    # Latin lookalikes that NFKD leaves alone
+    "ı": "i", "ɡ": "g", "ł": "l", "ø": "o", "ß": "b", "ɑ": "a",
+}
+
+# Letter pairs that read as one letter in most fonts.
+DIGRAPHS = (("rn", "m"), ("vv", "w"), ("cl", "d"))
+
+
+def max_distance(brand: str) -> int:
+    if len(brand) <= 4:
+        return 0
+    if len(brand) <= 7:
+        return 1
+    return 2
+
+
+def _decode_punycode(domain: str) -> str:
+    labels = []
+    for label in domain.split("."):
+        if label.startswith("xn--"):
+            try:
+                label = codecs.decode(label[4:].encode("ascii"), "punycode")
+            except (UnicodeError, ValueError):
+                pass
+        labels.append(label)
+    return ".".join(labels)
+
+
+def skeleton(text: str) -> str:
+    """Lowercased, accent-free text with homoglyphs folded to ASCII."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(HOMOGLYPHS.get(ch, ch) for ch in text if not unicodedata.combining(ch))
+    for pair, letter in DIGRAPHS:
+        text = text.replace(pair, letter)
+    return text
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance, or ``limit + 1`` once it exceeds ``limit``."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = i
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if previous2 is not None and i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, previous2[j - 2] + 1)
+            current[j] = value
+            row_min = min(row_min, value)
+        if row_min > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def _deletions(word: str, distance: int) -> Set[str]:
+    variants = {word}
+    for k in range(1, min(distance, len(word) - 1) + 1):
+        for positions in combinations(range(len(word)), k):
+            variants.add("".join(ch for i, ch in enumerate(word) if i not in positions))
+    return variants
+
+
+class TyposquatMatch(NamedTuple):
+    brand: str
+    distance: int
+    # "embedded" (brand inside the domain), "homoglyph" (identical once
+    # lookalikes are folded) or "misspelling" (within the edit budget)
+    kind: str
+    token: str
+
+    def reason(self, domain: str) -> str:
+        detail = {
+            "embedded": "brand name used outside its official domain",
+            "homoglyph": "lookalike characters",
+            "misspelling": f"'{self.token}' is a misspelling",
+        }[self.kind]
+        return f"Domain '{domain}' suspected of typo-squatting '{self.brand}' ({detail}, edit distance {self.distance})"
+
+
+class BrandIndex:
+    """Immutable index over one brand list."""
+
+    def __init__(self, brands: Iterable[str], allowed_words: Iterable[str] = TYPOSQUAT_ALLOWED_WORDS):
+        self.brands: Tuple[str, ...] = tuple(dict.fromkeys(b.strip().lower() for b in brands if b.strip()))
+        self.allowed_words = frozenset(skeleton(w) for w in allowed_words)
+
+        by_skeleton: Dict[str, str] = {}
+        for brand in self.brands:
+            by_skeleton.setdefault(skeleton(brand), brand)
+        self._by_skeleton = by_skeleton
+
+        self._embedded = PhraseAutomaton([
+            PhraseMatch(key, brand, 0, order) for order, (key, brand) in enumerate(by_skeleton.items())
+        ])
+
+        deletes: Dict[str, List[str]] = {}
+        for key in by_skeleton:
+            for variant in _deletions(key, max_distance(key)):
+                deletes.setdefault(variant, []).append(key)
+        self._deletes = deletes
+
+    def _candidates(self, token: str) -> FrozenSet[str]:
+        found = set()
+        for variant in _deletions(token, MAX_EDIT_DISTANCE):
+            found.update(self._deletes.get(variant, ()))
+        return frozenset(found)
+
+    def _closest(self, token: str) -> Optional[Tuple[int, str]]:
+        best = None
+        for key in self._candidates(token):
+            limit = max_distance(key)
+            distance = edit_distance(token, key, limit)
+            if distance <= limit and (best is None or (distance, key) < best):
+                best = (distance, key)
+        return best
+
+    def match(self, domain: str) -> Optional[TyposquatMatch]:
+        """Best brand imitated by ``domain`` (already normalized), if any."""
+        if not self.brands or not domain:
+            return None
+
+        def official(brand: str) -> bool:
+            return domain == f"{brand}.com" or domain.endswith(f".{brand}.com")
+
+        folded = skeleton(_decode_punycode(domain))
+
+        for hit in self._embedded.find_all(folded):
+            brand = hit.category
+            if official(brand):
+                continue
+            kind = "embedded" if brand in domain else "homoglyph"
+            return TyposquatMatch(brand, 0, kind, hit.phrase)
+
+        best = None
+        for token in set(folded.replace("-", ".").split(".")):
+            if len(token) < 3 or len(token) > MAX_TOKEN_LENGTH or token in self.allowed_words:
+                continue
+            closest = self._closest(token)
+            if closest is None:
+                continue
+            brand = self._by_skeleton[closest[1]]
+            if official(brand):
+                continue
+            if best is None or closest[0] < best.distance:
+                best = TyposquatMatch(brand, closest[0], "misspelling", token)
+        return best
+
+
+class TyposquatDetector:
+    def __init__(self, brands: Iterable[str] = ()):
+        self._lock = threading.Lock()
+        self._index = BrandIndex(brands)
+
+    def rebuild(self, brands: Iterable[str]) -> None:
+        brands = tuple(brands)
+        with self._lock:
+            if brands == self._index.brands:
+                return
+            # single reference swap; readers keep using the old index until then
+            self._index = BrandIndex(brands)
+
+    def match(self, domain: str) -> Optional[TyposquatMatch]:
+        domain = normalize_domain(domain.rsplit("@", 1)[-1].split(":", 1)[0]) if domain else ""
+        if not domain or reputation_store.is_trusted(domain):
+            return None
+        return self._index.match(domain)
+
+    def brand_count(self) -> int:
+        return len(self._index.brands)
+
+
+typosquat_detector = TyposquatDetector(reputation_store.brands())
+reputation_store.on_reload(lambda snapshot: typosquat_detector.rebuild(snapshot.brands))
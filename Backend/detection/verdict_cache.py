@@ -0,0 +1,237 @@
+"""Verdict cache in front of the URL and message risk engines.
+
+A campaign sends the same link or SMS text to thousands of users, and without
+a cache every check repeats the typosquat, phrase, WHOIS and model work. The
+cache stores finished verdicts keyed on
+
+    <kind>:<generation>:<sha256 of the normalized text>
+
+Normalization only folds differences the scorers ignore: URLs are stripped and
+lowercased (every URL signal already lowercases), messages are only stripped
+(phrase rules are whitespace sensitive).
+
+The generation is a hash of the versions of everything a verdict depends on:
+the reputation lists and the loaded models. It changes when any of them
+reloads, so stale verdicts are never served again, and because it is derived
+from content rather than a local counter, workers sharing a Redis backend
+agree on it. Verdicts whose WHOIS lookup missed its deadline are incomplete
+and never cached.
+
+Backends (VERDICT_CACHE_BACKEND):
+- ``memory`` (default): per-process LRU with TTL.
+- ``redis``: shared by all workers, VERDICT_CACHE_REDIS_URL. Needs the
+  optional ``redis`` package; anything with redis-style ``get``/``set(ex=)``
+  works, e.g. LocalSharedStore for local runs.
+- ``off``: disabled.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from detection.reputation import reputation_store
+from utils.logger import logger
+
+VERDICT_CACHE_BACKEND = os.getenv("VERDICT_CACHE_BACKEND", "memory")
+VERDICT_CACHE_MAX_ENTRIES = int(os.getenv("VERDICT_CACHE_MAX_ENTRIES", "50000"))
+VERDICT_CACHE_TTL_SECONDS = float(os.getenv("VERDICT_CACHE_TTL_SECONDS", "300"))
+VERDICT_CACHE_REDIS_URL = os.getenv("VERDICT_CACHE_REDIS_URL", "redis://localhost:6379/0")
+
+
+def normalize_url(url: str) -> str:
+    return url.strip().lower()
+
+
+def normalize_message(message: str) -> str:
+    return message.strip()
+
+
+def is_cacheable(result: Dict) -> bool:
+    # A "pending" WHOIS verdict is missing the domain-age signal.
+    return result.get("whois_status") != "pending"
+
+
+class MemoryBackend:
+    """In-process LRU; entries expire ``ttl`` seconds after they were written."""
+
+    def __init__(self, max_entries: int = VERDICT_CACHE_MAX_ENTRIES, ttl: float = VERDICT_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.evictions = 0
+        # key -> (encoded verdict, expires_at)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._entries[key] = (value, time.time() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        return {"backend": "memory", "size": len(self._entries), "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl, "evictions": self.evictions}
+
+
+class LocalSharedStore:
+    """Redis stand-in for local runs: the ``get``/``set(key, value, ex=, nx=)`` subset."""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or (entry[1] is not None and entry[1] <= time.time()):
+                self._data.pop(key, None)
+                return None
+            return entry[0]
+
+    def set(self, key, value, ex=None, nx=False):
+        now = time.time()
+        with self._lock:
+            if nx:
+                entry = self._data.get(key)
+                if entry is not None and (entry[1] is None or entry[1] > now):
+                    return None
+            self._data[key] = (value, now + ex if ex else None)
+        return True
+
+
+class SharedBackend:
+    """Cache shared across workers through a Redis-style client."""
+
+    def __init__(self, client, ttl: float = VERDICT_CACHE_TTL_SECONDS):
+        self.client = client
+        self.ttl = ttl
+        self.errors = 0
+
+    def get(self, key: str) -> Optional[str]:
+        try:
+            value = self.client.get(key)
+        except Exception as e:
+            # The cache must never take the check endpoints down with it.
+            self.errors += 1
+            logger.warning(f"Verdict cache read failed: {e}")
+            return None
+        return value.decode("utf-8") if isinstance(value, bytes) else value
+
+    def set(self, key: str, value: str) -> None:
+        try:
+            self.client.set(key, value, ex=max(1, int(self.ttl)))
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Verdict cache write failed: {e}")
+
+    def clear(self) -> None:
+        # Old generations simply expire; the key prefix already moved on.
+        pass
+
+    def stats(self) -> dict:
+        return {"backend": type(self.client).__name__, "ttl_seconds": self.ttl, "errors": self.errors}
+
+
+class VerdictCache:
+    def __init__(self, backend=None):
+        # None disables caching.
+        self.backend = backend
+        self._versions: Dict[str, str] = {}
+        self._generation = ""
+        self._lock = threading.Lock()
+        self.hits = {"url": 0, "message": 0}
+        self.misses = {"url": 0, "message": 0}
+        self.invalidations = 0
+
+    def set_backend(self, backend) -> None:
+        self.backend = backend
+
+    @property
+    def generation(self) -> str:
+        return self._generation
+
+    def set_version(self, component: str, version: str) -> None:
+        """Records what verdicts depend on (a model, the reputation lists)."""
+        with self._lock:
+            if self._versions.get(component) == version:
+                return
+            self._versions[component] = version
+            parts = "|".join(f"{k}={v}" for k, v in sorted(self._versions.items()))
+            self._generation = hashlib.sha256(parts.encode("utf-8")).hexdigest()[:12]
+            self.invalidations += 1
+        if self.backend is not None:
+            self.backend.clear()
+
+    def _key(self, kind: str, text: str) -> str:
+        normalized = normalize_url(text) if kind == "url" else normalize_message(text)
+        digest = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+        return f"verdict:{kind}:{self._generation}:{digest}"
+
+    def get(self, kind: str, text: str) -> Optional[Dict]:
+        if self.backend is None:
+            return None
+        value = self.backend.get(self._key(kind, text))
+        with self._lock:
+            if value is None:
+                self.misses[kind] += 1
+                return None
+            self.hits[kind] += 1
+        # decoded fresh on every hit, so callers may mutate the result
+        return json.loads(value)
+
+    def put(self, kind: str, text: str, result: Dict) -> None:
+        if self.backend is None or not is_cacheable(result):
+            return
+        self.backend.set(self._key(kind, text), json.dumps(result))
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {"generation": self._generation, "invalidations": self.invalidations}
+            for kind in ("url", "message"):
+                lookups = self.hits[kind] + self.misses[kind]
+                stats[kind] = {
+                    "hits": self.hits[kind],
+                    "misses": self.misses[kind],
+                    "hit_rate": round(self.hits[kind] / lookups, 4) if lookups else 0.0,
+                }
+        stats["backend"] = self.backend.stats() if self.backend is not None else None
+        return stats
+
+
+def _default_backend():
+    if VERDICT_CACHE_BACKEND == "off":
+        return None
+    if VERDICT_CACHE_BACKEND == "redis":
+        try:
+            import redis
+        except ImportError:
+            logger.warning("VERDICT_CACHE_BACKEND=redis but the redis package is not installed; using memory")
+            return MemoryBackend()
+        return SharedBackend(redis.Redis.from_url(VERDICT_CACHE_REDIS_URL))
+    return MemoryBackend()
+
+
+verdict_cache = VerdictCache(_default_backend())
+verdict_cache.set_version("reputation", reputation_store.version)
+reputation_store.on_reload(lambda snapshot: verdict_cache.set_version("reputation", reputation_store.version))
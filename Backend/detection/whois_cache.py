@@ -0,0 +1,209 @@
+"""Domain-age cache in front of WHOIS.
+
+calculate_risk_score only needs a domain's creation date, which practically never
+changes, so we keep it in an in-process LRU backed by the ``domain_ages`` table.
+Failed lookups are cached as well (with a much shorter TTL) so a dead registrar
+doesn't cost the full socket timeout on every request for that domain.
+
+The lookup backend is just a callable ``domain -> datetime | None``; swap it with
+``set_lookup`` to point the cache at a local fake resolver.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import whois
+from sqlalchemy.exc import SQLAlchemyError
+
+from database import DomainAge, SessionLocal
+from utils.logger import logger
+from utils.metrics import WHOIS_LOOKUP_SECONDS, WHOIS_LOOKUPS_TOTAL
+
+WHOIS_CACHE_MAX_ENTRIES = int(os.getenv("WHOIS_CACHE_MAX_ENTRIES", "10000"))
+WHOIS_POSITIVE_TTL = int(os.getenv("WHOIS_POSITIVE_TTL_SECONDS", str(7 * 24 * 3600)))
+WHOIS_NEGATIVE_TTL = int(os.getenv("WHOIS_NEGATIVE_TTL_SECONDS", "3600"))
+WHOIS_DEADLINE_SECONDS = float(os.getenv("WHOIS_DEADLINE_SECONDS", "1.5"))
+WHOIS_WORKERS = int(os.getenv("WHOIS_WORKERS", "32"))
+
+# whois_lookups_total series by result
+_RESOLVED = {result: WHOIS_LOOKUPS_TOTAL.labels(result) for result in ("cache", "store", "ok", "unknown", "error")}
+
+
+def whois_lookup(domain: str):
+    """Default backend: ask the registrar through python-whois."""
+    creation_date = whois.whois(domain).creation_date
+    if isinstance(creation_date, list):
+        creation_date = creation_date[0] if creation_date else None
+    return creation_date
+
+
+def _to_naive_utc(value):
+    # python-whois hands back str when it can't parse a date; treat as unknown.
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+class DomainAgeCache:
+    def __init__(
+        self,
+        lookup=whois_lookup,
+        session_factory=None,
+        max_entries: int = WHOIS_CACHE_MAX_ENTRIES,
+        positive_ttl: float = WHOIS_POSITIVE_TTL,
+        negative_ttl: float = WHOIS_NEGATIVE_TTL,
+    ):
+        self._lookup = lookup
+        self._session_factory = session_factory
+        self.max_entries = max_entries
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+
+        # domain -> (creation_date or None, expires_at epoch seconds)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.store_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lookup_errors = 0
+
+    def set_lookup(self, lookup) -> None:
+        self._lookup = lookup
+
+    def set_store(self, session_factory) -> None:
+        # None disables persistence (benchmarks, throwaway runs).
+        self._session_factory = session_factory
+
+    def _ttl(self, creation_date) -> float:
+        return self.positive_ttl if creation_date is not None else self.negative_ttl
+
+    def _remember(self, domain: str, creation_date, looked_up_at: float) -> None:
+        expires_at = looked_up_at + self._ttl(creation_date)
+        with self._lock:
+            self._entries[domain] = (creation_date, expires_at)
+            self._entries.move_to_end(domain)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _from_memory(self, domain: str, now: float):
+        with self._lock:
+            entry = self._entries.get(domain)
+            if entry is None:
+                return False, None
+            creation_date, expires_at = entry
+            if expires_at <= now:
+                del self._entries[domain]
+                return False, None
+            self._entries.move_to_end(domain)
+            self.hits += 1
+        _RESOLVED["cache"].inc()
+        return True, creation_date
+
+    def _from_store(self, domain: str, now: float):
+        if self._session_factory is None:
+            return False, None
+        db = self._session_factory()
+        try:
+            row = db.get(DomainAge, domain)
+        except SQLAlchemyError as e:
+            logger.warning(f"Domain age store read failed for {domain}: {e}")
+            return False, None
+        finally:
+            db.close()
+
+        if row is None:
+            return False, None
+
+        looked_up_at = row.looked_up_at.replace(tzinfo=timezone.utc).timestamp()
+        if looked_up_at + self._ttl(row.creation_date) <= now:
+            return False, None
+
+        self._remember(domain, row.creation_date, looked_up_at)
+        with self._lock:
+            self.store_hits += 1
+        _RESOLVED["store"].inc()
+        return True, row.creation_date
+
+    def _persist(self, domain: str, creation_date, looked_up_at: float) -> None:
+        if self._session_factory is None:
+            return
+        db = self._session_factory()
+        try:
+            db.merge(DomainAge(
+                domain=domain,
+                creation_date=creation_date,
+                looked_up_at=datetime.utcfromtimestamp(looked_up_at),
+            ))
+            db.commit()
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.warning(f"Domain age store write failed for {domain}: {e}")
+        finally:
+            db.close()
+
+    def peek(self, domain: str):
+        """In-memory lookup only: (found, creation_date). Never blocks on I/O."""
+        return self._from_memory(domain, time.time())
+
+    def get_creation_date(self, domain: str):
+        """Returns the domain's creation date (naive UTC) or None if unknown."""
+        now = time.time()
+
+        found, creation_date = self._from_memory(domain, now)
+        if found:
+            return creation_date
+
+        found, creation_date = self._from_store(domain, now)
+        if found:
+            return creation_date
+
+        with self._lock:
+            self.misses += 1
+
+        try:
+            with WHOIS_LOOKUP_SECONDS.time():
+                creation_date = _to_naive_utc(self._lookup(domain))
+            _RESOLVED["ok" if creation_date is not None else "unknown"].inc()
+        except Exception as e:
+            with self._lock:
+                self.lookup_errors += 1
+            _RESOLVED["error"].inc()
+            logger.warning(f"WHOIS lookup failed for {domain}: {e}")
+            creation_date = None
+
+        self._remember(domain, creation_date, now)
+        self._persist(domain, creation_date, now)
+        return creation_date
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.store_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "store_hits": self.store_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "lookup_errors": self.lookup_errors,
+                "hit_rate": round((self.hits + self.store_hits) / lookups, 4) if lookups else 0.0,
+            }
+
+
+domain_age_cache = DomainAgeCache(session_factory=SessionLocal)
+
+# Lookups that run while a request waits (up to WHOIS_DEADLINE_SECONDS) go
+# through this pool, shared by the sync and async engines.
+whois_executor = ThreadPoolExecutor(max_workers=WHOIS_WORKERS, thread_name_prefix="whois")
@@ -1,19 +1,36 @@
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
+from starlette.requests import ClientDisconnect
 from pydantic import BaseModel
+from typing import List, Optional
+import asyncio
 import joblib
+import json
 import os
 import socket
 
-from database import SessionLocal, URLCheck, MessageCheck, ReportContent, init_db
-from detection.risk_engine import calculate_risk_score
-from detection.message_risk_engine import calculate_message_risk_score
-from detection.fraud_monitor import FraudMonitor
+from database import SessionLocal, URLCheck, MessageCheck, ReportContent, init_db, pool_stats
+from detection.async_engine import (
+    calculate_risk_score_async,
+    calculate_message_risk_score_async,
+    calculate_risk_scores_async,
+    calculate_message_risk_scores_async,
+)
+from detection.fraud_monitor import FRAUD_MAX_ALERTS, FraudMonitor, message_batches, parse_stream_line
 from detection.domain_utils import extract_domain
-
-from auth import create_access_token, verify_token, ADMIN_USERNAME, ADMIN_PASSWORD
-
-from collections import Counter
+from detection.whois_cache import domain_age_cache
+from detection.reputation import reputation_store
+from detection.verdict_cache import verdict_cache
+from detection.near_duplicates import near_duplicate_index
+from detection.reasons import record_verdict
+from ml.inference_scheduler import InferenceScheduler
+from ml.compiled_scorer import CompiledLinearScorer
+
+from auth import (
+    STREAM_TICKET_EXPIRE_SECONDS, check_stream_ticket, create_access_token, create_stream_ticket,
+    verify_stream_ticket, verify_token, ADMIN_USERNAME, ADMIN_PASSWORD,
+)
 
 from sqlalchemy import func
 from datetime import datetime, timedelta
@@ -24,6 +41,16 @@ from sqlalchemy.exc import SQLAlchemyError
 #from dashboard.dashboard_routes import router as dashboard_router
 
 from utils.logger import logger
+from utils import metrics
+from utils.write_behind import write_behind
+from dashboard.counters import ensure_counters, read_counters, reconcile_counters, start_reconcile_job, stop_reconcile_job
+from dashboard.rollups import ensure_rollups, get_trend
+from dashboard.heavy_hitters import domain_heavy_hitters
+from dashboard.history import HISTORY_MAX_LIMIT, InvalidCursor, list_history
+from dashboard.export import MEDIA_TYPES, ExportError, export_stream
+from dashboard.partitions import partition_stats, start_partition_job, stop_partition_job
+from dashboard.live_feed import TooManySubscribers, broadcaster, sse_stream
+from dashboard.response_cache import response_cache
 
 app = FastAPI()
 
@@ -38,6 +65,37 @@ def _startup() -> None:
         logger.error(f"Failed to initialize database: {e}")
         # Let the app start; DB errors will surface on first request.
 
+    # Pick up new trusted/blacklist/brand feeds without restarting workers.
+    reputation_store.reload()
+    reputation_store.start_watcher()
+
+    # Check/report logs are written in bulk off the request path.
+    write_behind.start()
+
+    # Dashboard totals (dashboard/counters.py): seed once, then correct drift.
+    try:
+        ensure_counters()
+        ensure_rollups()
+        domain_heavy_hitters.seed_from_db()
+    except SQLAlchemyError as e:
+        logger.error(f"Failed to seed dashboard counters: {e}")
+    start_reconcile_job()
+    domain_heavy_hitters.start_persister()
+    # Old months move out of the live check tables; expired ones are archived.
+    start_partition_job()
+
+
+@app.on_event("shutdown")
+def _shutdown() -> None:
+    reputation_store.stop_watcher()
+    stop_reconcile_job()
+    stop_partition_job()
+    url_scorer.close()
+    msg_scorer.close()
+    # drains whatever is still queued
+    write_behind.stop()
+    domain_heavy_hitters.stop_persister()
+
 # CORS setup
 app.add_middleware(
     CORSMiddleware,
@@ -51,15 +109,52 @@ socket.setdefaulttimeout(5.0)
 
 # Load ML pipeline (vectorizer + model together)
 BASE_DIR = os.path.dirname(__file__)
+
+# Prefer the compiled scorers written by the training scripts; they give the
+# same probabilities as the .pkl pipelines without the sklearn overhead and
+# load in milliseconds.
+USE_COMPILED_MODELS = os.getenv("USE_COMPILED_MODELS", "1") == "1"
+
+
+def _model_version(path: str) -> str:
+    st = os.stat(path)
+    return f"{os.path.basename(path)}:{st.st_mtime_ns}:{st.st_size}"
+
+
+def _load_model(name: str):
+    compiled_path = os.path.join(BASE_DIR, f"{name}_scorer")
+    meta_path = os.path.join(compiled_path, "meta.json")
+    if USE_COMPILED_MODELS and os.path.exists(meta_path):
+        # Memory-mapped: workers on the same host share these pages.
+        logger.info(f"Using compiled {name} scorer: {compiled_path}")
+        # Cached verdicts from another model version must not be served.
+        verdict_cache.set_version(f"{name}_model", _model_version(meta_path))
+        return CompiledLinearScorer.load(compiled_path, mmap=True)
+    pipeline_path = os.path.join(BASE_DIR, f"{name}_pipeline.pkl")
+    verdict_cache.set_version(f"{name}_model", _model_version(pipeline_path))
+    return joblib.load(pipeline_path)
+
+
 try:
-    url_pipe = joblib.load(os.path.join(BASE_DIR, "url_pipeline.pkl"))
-    msg_pipe = joblib.load(os.path.join(BASE_DIR, "message_pipeline.pkl"))
+    url_pipe = _load_model("url")
+    msg_pipe = _load_model("message")
     logger.info("URL + Message ML pipeline loaded successfully.")
 except Exception as e:
     logger.error(f"Failed to load ML pipeline: {e}")
     raise RuntimeError("Model loading failed.")
 
-fraud_monitor = FraudMonitor(msg_pipe)
+# Coalesce concurrent single-item predictions into micro-batches
+# (INFERENCE_MAX_WAIT_MS / INFERENCE_MAX_BATCH, see ml/inference_scheduler.py)
+url_scorer = InferenceScheduler(url_pipe, "url")
+msg_scorer = InferenceScheduler(msg_pipe, "message")
+
+fraud_monitor = FraudMonitor(msg_scorer, url_scorer)
+
+# Upper bound on items per /check_urls/ or /check_messages/ call
+MAX_BATCH_ITEMS = int(os.getenv("MAX_BATCH_ITEMS", "1000"))
+
+# handing rows to the write-behind queue (the commit is timed per flush)
+PERSISTENCE_STAGES = {kind: metrics.stage_timer(kind, "persistence") for kind in ("url", "message")}
 
 # Pydantic schemas
 class URLRequest(BaseModel):
@@ -68,6 +163,12 @@ class URLRequest(BaseModel):
 class MessageRequest(BaseModel):
     message: str
 
+class URLBatchRequest(BaseModel):
+    urls: List[str]
+
+class MessageBatchRequest(BaseModel):
+    messages: List[str]
+
 class ReportRequest(BaseModel):
     content: str
     type: str
@@ -91,91 +192,206 @@ def get_db():
     finally:
         db.close()
 
-# URL Detection API
-@app.post("/check_url/")
-async def check_url(request: URLRequest, db=Depends(get_db)):
-
-    result = calculate_risk_score(
-        request.url,
-        url_pipe
-    )
-
-    flagged = result["verdict"] in ["phishing", "suspicious"]
+def _is_flagged(result) -> bool:
+    return result["verdict"] in ["phishing", "suspicious"]
 
-    reason = ", ".join(result["reasons"])
 
-    db_record = URLCheck(
-        url=request.url,
-        flagged=str(flagged),
-        reason=reason
-    )
+def _url_response(url: str, result):
+    return {
+        "url": url,
+        "flagged": _is_flagged(result),
+        "verdict": result["verdict"],
+        "confidence": result["confidence"],
+        "risk_score": result["risk_score"],
+        "reasons": result["reasons"],
+        "whois_status": result["whois_status"]
+    }
 
-    db.add(db_record)
-    db.commit()
 
+def _message_response(message: str, result):
     return {
-        "url": request.url,
-        "flagged": flagged,
+        "message": message,
+        "flagged": _is_flagged(result),
         "verdict": result["verdict"],
         "confidence": result["confidence"],
         "risk_score": result["risk_score"],
         "reasons": result["reasons"]
     }
 
+
+def _url_row(url: str, result):
+    return {
+        "url": url,
+        "domain": extract_domain(url),
+        "flagged": str(_is_flagged(result)),
+        "reason": ", ".join(result["reasons"]),
+        "verdict": result["verdict"],
+        "checked_at": datetime.utcnow(),
+    }
+
+
+def _message_row(message: str, result):
+    return {
+        "message": message,
+        "flagged": str(_is_flagged(result)),
+        "reason": ", ".join(result["reasons"]),
+        "verdict": result["verdict"],
+        "checked_at": datetime.utcnow(),
+    }
+
+
+def _check_batch_size(items) -> None:
+    if len(items) > MAX_BATCH_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {len(items)} items (max {MAX_BATCH_ITEMS})."
+        )
+
+
+# URL Detection API
+@app.post("/check_url/")
+async def check_url(request: URLRequest):
+
+    # WHOIS + model run off the event loop; see detection/async_engine.py
+    result = await calculate_risk_score_async(
+        request.url,
+        url_scorer
+    )
+
+    # Persisted in bulk by the write-behind queue (utils/write_behind.py)
+    with PERSISTENCE_STAGES["url"].time():
+        await write_behind.enqueue_async(URLCheck, _url_row(request.url, result))
+    record_verdict("url", result)
+
+    return _url_response(request.url, result)
+
+
+@app.post("/check_urls/")
+async def check_urls(request: URLBatchRequest):
+    _check_batch_size(request.urls)
+
+    # Deduped, one predict_proba for the whole batch, concurrent WHOIS
+    results = await calculate_risk_scores_async(request.urls, url_scorer)
+
+    with PERSISTENCE_STAGES["url"].time():
+        await write_behind.enqueue_many_async(URLCheck, [_url_row(url, result) for url, result in zip(request.urls, results)])
+    for result in results:
+        record_verdict("url", result)
+
+    return {"results": [_url_response(url, result) for url, result in zip(request.urls, results)]}
+
 # Message Detection API
 
 @app.post("/check_message/")
-async def check_message(request: MessageRequest, db=Depends(get_db)):
+async def check_message(request: MessageRequest):
 
-    result = calculate_message_risk_score(
+    result = await calculate_message_risk_score_async(
         request.message,
-        msg_pipe, url_pipe
+        msg_scorer, url_scorer
     )
 
-    flagged = result["verdict"] in ["phishing", "suspicious"]
+    with PERSISTENCE_STAGES["message"].time():
+        await write_behind.enqueue_async(MessageCheck, _message_row(request.message, result))
+    record_verdict("message", result)
 
-    reason = ", ".join(result["reasons"])
+    return _message_response(request.message, result)
 
-    db_record = MessageCheck(
-        message=request.message,
-        flagged=str(flagged),
-        reason=reason
-    )
 
-    db.add(db_record)
-    db.commit()
+@app.post("/check_messages/")
+async def check_messages(request: MessageBatchRequest):
+    _check_batch_size(request.messages)
 
-    return {
+    results = await calculate_message_risk_scores_async(request.messages, msg_scorer, url_scorer)
 
-        "message": request.message,
-        "flagged": flagged,
-        "verdict": result["verdict"],
-        "confidence": result["confidence"],
-        "risk_score": result["risk_score"],
-        "reasons": result["reasons"]
+    with PERSISTENCE_STAGES["message"].time():
+        await write_behind.enqueue_many_async(
+            MessageCheck, [_message_row(message, result) for message, result in zip(request.messages, results)]
+        )
+    for result in results:
+        record_verdict("message", result)
 
-    }
+    return {"results": [_message_response(message, result) for message, result in zip(request.messages, results)]}
 
 
 
 # Report Content
 @app.post("/report/")
-async def report(request: ReportRequest, db=Depends(get_db)):
+async def report(request: ReportRequest):
     try:
         logger.info("Received report submission.")
-        db_record = ReportContent(content_type=request.type, content=request.content)
-        db.add(db_record)
-        db.commit()
+        await write_behind.enqueue_async(ReportContent, {
+            "content_type": request.type,
+            "content": request.content,
+            "reported_at": datetime.utcnow(),
+        })
         return {"status": "Report received", "type": request.type, "content": request.content}
     except Exception as e:
         logger.error(f"Error in /report/: {e}")
         raise HTTPException(status_code=500, detail="Error processing report.")
 
+async def _monitor(messages):
+    results = await fraud_monitor.process_messages(messages)
+    for result in results:
+        record_verdict("message", result)
+        for alert in result["campaign_alerts"]:
+            broadcaster.publish("campaign", {"alert": alert})
+    return results
+
+
 @app.post("/monitor/")
 async def monitor_message(request: MessageRequest):
-    result = fraud_monitor.process_message(request.message)
+    results = await _monitor([request.message])
+    return results[0]
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """A StreamingResponse whose body generator may still be reading the
+    request body. The stock one listens for the disconnect on ``receive``
+    meanwhile and swallows the request chunks; here a disconnect surfaces as
+    ClientDisconnect from request.stream() instead."""
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+
+
+@app.post("/monitor/stream")
+async def monitor_stream(request: Request, alerts_only: bool = False):
+    """NDJSON in ({"message": ...} per line, chunked), NDJSON out: one result
+    per message, in order, written as soon as its batch is scored."""
 
-    return result
+    async def results():
+        try:
+            async for batch in message_batches(request.stream()):
+                for result in await _monitor(batch):
+                    if alerts_only and not (result["alert"] or result["campaign_alerts"]):
+                        continue
+                    yield json.dumps(result) + "\n"
+        except ValueError as e:
+            logger.error(f"Error in /monitor/stream: {e}")
+            yield json.dumps({"error": f"Invalid NDJSON line: {e}"}) + "\n"
+        except ClientDisconnect:
+            logger.info("Client left /monitor/stream")
+
+    return DuplexStreamingResponse(results(), media_type="application/x-ndjson")
+
+
+@app.websocket("/monitor/ws")
+async def monitor_socket(websocket: WebSocket):
+    """Each text frame is one or more NDJSON lines; each message gets a JSON reply."""
+    await websocket.accept()
+    try:
+        while True:
+            frame = await websocket.receive_text()
+            try:
+                messages = [m for m in map(parse_stream_line, frame.split("\n")) if m is not None]
+            except ValueError as e:
+                await websocket.send_json({"error": f"Invalid NDJSON line: {e}"})
+                continue
+            if messages:
+                for result in await _monitor(messages):
+                    await websocket.send_json(result)
+    except WebSocketDisconnect:
+        pass
 
 
 # Admin Dashboard
@@ -193,14 +409,20 @@ def admin_login(payload: AdminLoginRequest):
     return {"access_token": token, "token_type": "bearer"}
 
 @app.get("/admin/stats")
-def get_stats(db=Depends(get_db), _=Depends(verify_token)):
+def get_stats(request: Request, db=Depends(get_db), _=Depends(verify_token)):
+    return response_cache.respond(request, lambda: _stats(db))
+
+
+def _stats(db):
     try:
-        total_urls = db.query(URLCheck).count()
-        total_messages = db.query(MessageCheck).count()
-        total_reports = db.query(ReportContent).count()
+        # One read of the maintained counters instead of five COUNT(*) scans
+        counters = read_counters(db)
+        total_urls = counters["url_checks.total"]
+        total_messages = counters["message_checks.total"]
+        total_reports = counters["report_contents.total"]
 
-        flagged_urls = db.query(URLCheck).filter(URLCheck.flagged == "True").count()
-        flagged_messages = db.query(MessageCheck).filter(MessageCheck.flagged == "True").count()
+        flagged_urls = counters["url_checks.flagged"]
+        flagged_messages = counters["message_checks.flagged"]
 
         total_checks = total_urls + total_messages
         phishing_detected = flagged_urls + flagged_messages
@@ -223,18 +445,32 @@ def get_stats(db=Depends(get_db), _=Depends(verify_token)):
         raise HTTPException(status_code=500, detail="Failed to fetch stats.")
 
 
+@app.post("/admin/counters/reconcile")
+def reconcile_stats_counters(_=Depends(verify_token)):
+    try:
+        return {"drift": reconcile_counters()}
+    except SQLAlchemyError as e:
+        logger.error(f"Error in /admin/counters/reconcile: {e}")
+        raise HTTPException(status_code=500, detail="Failed to reconcile counters.")
+
+
 @app.get("/admin/recent-checks")
-def get_recent_checks(db=Depends(get_db), _=Depends(verify_token)):
+def get_recent_checks(request: Request, db=Depends(get_db), _=Depends(verify_token)):
+    return response_cache.respond(request, lambda: _recent_checks(db))
+
+
+def _recent_checks(db):
     try:
-        recent_urls = db.query(URLCheck).order_by(URLCheck.id.desc()).limit(5).all()
-        recent_messages = db.query(MessageCheck).order_by(MessageCheck.id.desc()).limit(5).all()
+        # newest first across the live and rotated tables (dashboard/history.py)
+        recent_urls = list_history(db, "urls", 5)["items"]
+        recent_messages = list_history(db, "messages", 5)["items"]
 
         recent_urls_payload = [
-            {"url": r.url, "flagged": r.flagged, "reason": r.reason, "checked_at": r.checked_at}
+            {"url": r["url"], "flagged": r["flagged"], "reason": r["reason"], "checked_at": r["checked_at"]}
             for r in recent_urls
         ]
         recent_messages_payload = [
-            {"message": r.message, "flagged": r.flagged, "reason": r.reason, "checked_at": r.checked_at}
+            {"message": r["message"], "flagged": r["flagged"], "reason": r["reason"], "checked_at": r["checked_at"]}
             for r in recent_messages
         ]
 
@@ -268,33 +504,24 @@ def get_recent_checks(db=Depends(get_db), _=Depends(verify_token)):
 
 
 @app.get("/admin/analytics")
-def get_analytics(db=Depends(get_db), _=Depends(verify_token)):
+def get_analytics(request: Request, db=Depends(get_db), _=Depends(verify_token)):
+    return response_cache.respond(request, lambda: _analytics(db))
+
+
+def _analytics(db):
     try:
         last_7_days = datetime.utcnow() - timedelta(days=7)
 
-        daily_counts = (
-            db.query(
-                func.date(URLCheck.checked_at),
-                func.count(URLCheck.id)
-            )
-            .filter(URLCheck.checked_at >= last_7_days)
-            .group_by(func.date(URLCheck.checked_at))
-            .all()
-        )
-
-        # Top targeted domains (based on checked URLs, last 30 days)
-        last_30_days = datetime.utcnow() - timedelta(days=30)
-        urls_last_30 = (
-            db.query(URLCheck.url)
-            .filter(URLCheck.checked_at >= last_30_days)
-            .all()
-        )
+        # Daily URL check counts from the rollup table (dashboard/rollups.py)
+        daily_counts = [
+            (bucket["bucket"].date(), bucket["checks"])
+            for bucket in get_trend(db, last_7_days, check_type="url", granularity="day")
+        ]
 
-        domains = [extract_domain(u[0]) for u in urls_last_30 if u and u[0]]
-        domain_counts = Counter([d for d in domains if d])
+        # Top targeted domains (last 30 days) from the heavy-hitter sketches
         top_domains = [
-            {"domain": domain, "count": count}
-            for domain, count in domain_counts.most_common(10)
+            {"domain": d["domain"], "count": d["count"]}
+            for d in domain_heavy_hitters.top(10, days=30, db=db)
         ]
 
         trend = [
@@ -311,3 +538,219 @@ def get_analytics(db=Depends(get_db), _=Depends(verify_token)):
     except Exception as e:
         logger.error(f"Error in /admin/analytics: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch analytics." )
+
+
+
+def _history_page(db, kind: str, limit: int, **filters):
+    if limit < 1 or limit > HISTORY_MAX_LIMIT:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {HISTORY_MAX_LIMIT}.")
+    try:
+        return list_history(db, kind, limit, **filters)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+    except SQLAlchemyError as e:
+        logger.error(f"Error in /admin/history/{kind}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to fetch history.")
+
+
+@app.get("/admin/history/urls")
+def get_url_history(
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    verdict: Optional[str] = None,
+    flagged: Optional[bool] = None,
+    domain: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    db=Depends(get_db),
+    _=Depends(verify_token),
+):
+    return _history_page(db, "urls", limit, cursor=cursor, verdict=verdict, flagged=flagged,
+                         domain=domain, start=since, end=until)
+
+
+@app.get("/admin/history/messages")
+def get_message_history(
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    verdict: Optional[str] = None,
+    flagged: Optional[bool] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    db=Depends(get_db),
+    _=Depends(verify_token),
+):
+    return _history_page(db, "messages", limit, cursor=cursor, verdict=verdict, flagged=flagged,
+                         start=since, end=until)
+
+
+@app.get("/admin/history/reports")
+def get_report_history(
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    content_type: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    db=Depends(get_db),
+    _=Depends(verify_token),
+):
+    return _history_page(db, "reports", limit, cursor=cursor, content_type=content_type, start=since, end=until)
+
+
+@app.get("/admin/export/{kind}")
+def export_history(
+    kind: str,
+    format: str = "csv",
+    verdict: Optional[str] = None,
+    flagged: Optional[bool] = None,
+    domain: Optional[str] = None,
+    content_type: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    _=Depends(verify_token),
+):
+    # No get_db: the stream opens its own session, which has to outlive
+    # this function.
+    try:
+        stream = export_stream(kind, format, verdict=verdict, flagged=flagged, domain=domain,
+                               content_type=content_type, start=since, end=until)
+    except ExportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    extension = {"training": "csv"}.get(format, format)
+    return StreamingResponse(
+        stream,
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{kind}-{format}.{extension}"'},
+    )
+
+
+@app.get("/admin/monitor/campaigns")
+def get_campaigns(limit: int = 50, _=Depends(verify_token)):
+    if limit < 1 or limit > FRAUD_MAX_ALERTS:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {FRAUD_MAX_ALERTS}.")
+    return {
+        "active": fraud_monitor.detector.active_campaigns(limit),
+        "recent_alerts": fraud_monitor.detector.recent_alerts(limit),
+        "stats": fraud_monitor.stats(),
+    }
+
+
+@app.get("/admin/clusters")
+def get_message_clusters(limit: int = 50, min_size: int = 2, _=Depends(verify_token)):
+    """Near-duplicate message clusters (detection/near_duplicates.py), largest first."""
+    if limit < 1 or limit > HISTORY_MAX_LIMIT:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {HISTORY_MAX_LIMIT}.")
+    return {
+        "clusters": near_duplicate_index.clusters(limit, min_size),
+        "stats": near_duplicate_index.stats(),
+    }
+
+
+@app.post("/admin/live/ticket")
+def live_feed_ticket(_=Depends(verify_token)):
+    """One-connection ticket for /admin/live and /admin/live/ws. EventSource
+    and browser WebSockets can't set headers, so the credential has to go in
+    the query string; this keeps the admin token out of it."""
+    return {"ticket": create_stream_ticket(), "expires_in": STREAM_TICKET_EXPIRE_SECONDS}
+
+
+@app.get("/admin/live")
+async def live_feed(_=Depends(verify_stream_ticket)):
+    """Server-sent events for the dashboard (dashboard/live_feed.py), opened
+    with a ticket from POST /admin/live/ticket."""
+    try:
+        subscriber = broadcaster.subscribe()
+    except TooManySubscribers as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return StreamingResponse(
+        sse_stream(subscriber),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.websocket("/admin/live/ws")
+async def live_feed_socket(websocket: WebSocket, ticket: str = ""):
+    try:
+        check_stream_ticket(ticket)
+    except HTTPException:
+        await websocket.close(code=1008)
+        return
+    try:
+        subscriber = broadcaster.subscribe()
+    except TooManySubscribers:
+        await websocket.close(code=1013)
+        return
+    await websocket.accept()
+
+    async def forward():
+        async for events in broadcaster.listen(subscriber):
+            for event in events:
+                await websocket.send_text(event.data)
+            if not events:
+                await websocket.send_text('{"type": "keepalive"}')
+
+    sender = asyncio.create_task(forward())
+    try:
+        # nothing to read; receiving is how a closed socket is noticed
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        broadcaster.unsubscribe(subscriber)
+
+
+@app.get("/admin/trend")
+def get_check_trend(
+    days: int = 7,
+    type: str = None,
+    granularity: str = None,
+    db=Depends(get_db),
+    _=Depends(verify_token),
+):
+    if days < 1 or days > 3660:
+        raise HTTPException(status_code=400, detail="days must be between 1 and 3660.")
+    if type not in (None, "url", "message"):
+        raise HTTPException(status_code=400, detail="type must be 'url' or 'message'.")
+    if granularity not in (None, "hour", "day"):
+        raise HTTPException(status_code=400, detail="granularity must be 'hour' or 'day'.")
+    try:
+        trend = get_trend(db, datetime.utcnow() - timedelta(days=days), check_type=type, granularity=granularity)
+        return {
+            "days": days,
+            "trend": [dict(bucket, bucket=bucket["bucket"].isoformat()) for bucket in trend],
+        }
+    except SQLAlchemyError as e:
+        logger.error(f"Error in /admin/trend: {e}")
+        raise HTTPException(status_code=500, detail="Failed to fetch trend.")
+
+
+@app.get("/admin/engine-stats")
+def get_engine_stats(_=Depends(verify_token)):
+    return {
+        "whois_cache": domain_age_cache.stats(),
+        "reputation": reputation_store.stats(),
+        "verdict_cache": verdict_cache.stats(),
+        "near_duplicates": near_duplicate_index.stats(),
+        "write_behind": write_behind.stats(),
+        "database": pool_stats(),
+        "domain_sketches": domain_heavy_hitters.stats(),
+        "partitions": partition_stats(),
+        "fraud_monitor": fraud_monitor.stats(),
+        "live_feed": broadcaster.stats(),
+        "response_cache": response_cache.stats(),
+        "inference": {
+            "url": url_scorer.stats(),
+            "message": msg_scorer.stats(),
+        },
+    }
+
+
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus text exposition of utils/metrics.py."""
+    if not metrics.is_enabled():
+        raise HTTPException(status_code=503, detail="Metrics are disabled (METRICS_ENABLED=0).")
+    return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
@@ -0,0 +1,348 @@
+"""Inference-only replacement for the TF-IDF + LogisticRegression pipelines.
+
+Both served models are a TfidfVectorizer (or a FeatureUnion of them) feeding a
+binary LogisticRegression, so a prediction boils down to
+
+    z = intercept + sum_v ( sum_t tf(t) * idf(t) * coef(t) ) / ||tf * idf||_v
+    p = sigmoid(z)
+
+compile_pipeline() pulls exactly those numbers out of a fitted pipeline into
+flat NumPy arrays. The vocabulary is stored as a sorted fixed-width unicode
+array, with idf and idf*coef arrays in the same order, so term lookup for a
+whole batch is one searchsorted. Scoring re-implements sklearn's analyzers (char, char_wb, word)
+in plain Python and does the arithmetic in NumPy, skipping the
+Pipeline/FeatureUnion/scipy.sparse machinery entirely. Probabilities match
+sklearn to well under 1e-9; the training scripts check that before writing
+the artifact.
+
+Artifacts are a directory of .npy files plus meta.json. load() opens the
+arrays with mmap_mode="r", so every uvicorn/gunicorn worker on a host shares
+the same page-cache copy instead of unpickling its own vocabulary.
+
+Re-exporting while workers have the arrays mapped must never touch a file
+they use: a truncated mapping is a SIGBUS. save() therefore writes the
+arrays under new names (tagged with a hash of their content), then swaps
+meta.json, which names them, into place with os.replace(). A loader sees
+either the old export or the new one, never a mix. Files the new meta.json
+no longer names are unlinked; mapped pages stay valid until unmapped.
+"""
+import hashlib
+import json
+import os
+import re
+from contextlib import contextmanager
+
+import numpy as np
+
+FORMAT_VERSION = 2
+
+# CompiledVectorizer arrays, in constructor order
+ARRAY_KINDS = ("terms", "idf", "weights")
+
+_WHITE_SPACES = re.compile(r"\s\s+")
+_ARRAY_FILE = re.compile(r"v\d+_(\w+_)?(terms|idf|weights)\.npy$")
+
+
+@contextmanager
+def _replacing(path: str, mode: str = "wb"):
+    """A temporary sibling of ``path``, renamed over it once written and
+    synced; on error ``path`` is left untouched."""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, mode, encoding=None if "b" in mode else "utf-8") as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _char_ngrams(text: str, min_n: int, max_n: int):
+    text = _WHITE_SPACES.sub(" ", text)
+    text_len = len(text)
+    ngrams = []
+    for n in range(min_n, min(max_n + 1, text_len + 1)):
+        for i in range(text_len - n + 1):
+            ngrams.append(text[i: i + n])
+    return ngrams
+
+
+def _char_wb_ngrams(text: str, min_n: int, max_n: int):
+    # Mirrors TfidfVectorizer._char_wb_ngrams, including its short-word quirk.
+    text = _WHITE_SPACES.sub(" ", text)
+    ngrams = []
+    for w in text.split():
+        w = " " + w + " "
+        w_len = len(w)
+        for n in range(min_n, max_n + 1):
+            offset = 0
+            ngrams.append(w[offset: offset + n])
+            while offset + n < w_len:
+                offset += 1
+                ngrams.append(w[offset: offset + n])
+            if offset == 0:  # count a short word (w_len < n) only once
+                break
+    return ngrams
+
+
+def _word_ngrams(tokens, min_n: int, max_n: int):
+    if max_n == 1:
+        return tokens
+    original_tokens = tokens
+    if min_n == 1:
+        tokens = list(original_tokens)
+        min_n += 1
+    else:
+        tokens = []
+    n_original_tokens = len(original_tokens)
+    for n in range(min_n, min(max_n + 1, n_original_tokens + 1)):
+        for i in range(n_original_tokens - n + 1):
+            tokens.append(" ".join(original_tokens[i: i + n]))
+    return tokens
+
+
+class CompiledVectorizer:
+    """One TfidfVectorizer: analyzer settings + per-term idf and idf*coef,
+    in sorted-term order."""
+
+    def __init__(self, config: dict, terms, idf, weights):
+        self.config = config
+        # May be read-only memory maps; never written to.
+        self.terms = terms
+        self.idf = idf
+        self.weights = weights
+
+        min_n, max_n = config["ngram_range"]
+        analyzer = config["analyzer"]
+        lowercase = config["lowercase"]
+        if analyzer == "word":
+            tokenize = re.compile(config["token_pattern"]).findall
+            self._ngrams = lambda doc: _word_ngrams(tokenize(doc), min_n, max_n)
+        elif analyzer == "char_wb":
+            self._ngrams = lambda doc: _char_wb_ngrams(doc, min_n, max_n)
+        else:
+            self._ngrams = lambda doc: _char_ngrams(doc, min_n, max_n)
+        self._lowercase = lowercase
+
+    def analyze(self, text: str):
+        return self._ngrams(text.lower() if self._lowercase else text)
+
+    def _term_counts(self, texts):
+        """Sparse (row, column, count) triplets for the in-vocabulary n-grams."""
+        rows, grams = [], []
+        for i, text in enumerate(texts):
+            text_grams = self.analyze(text)
+            rows.extend([i] * len(text_grams))
+            grams.extend(text_grams)
+
+        n_terms = len(self.terms)
+        if not n_terms or not grams:
+            empty = np.zeros(0, dtype=np.intp)
+            return empty, empty, np.zeros(0, dtype=np.float64)
+
+        rows = np.asarray(rows, dtype=np.int64)
+        grams = np.asarray(grams)
+        if grams.dtype.itemsize > self.terms.dtype.itemsize:
+            # Longer than any vocabulary term: can't match, and must not be
+            # truncated into a false match by the cast below.
+            fits = np.char.str_len(grams) <= self.terms.dtype.itemsize // 4
+            rows, grams = rows[fits], grams[fits]
+        grams = grams.astype(self.terms.dtype)
+
+        positions = np.minimum(np.searchsorted(self.terms, grams), n_terms - 1)
+        found = self.terms[positions] == grams
+
+        cells = rows[found] * n_terms + positions[found]
+        cells, counts = np.unique(cells, return_counts=True)
+        return (
+            (cells // n_terms).astype(np.intp),
+            (cells % n_terms).astype(np.intp),
+            counts.astype(np.float64),
+        )
+
+    def decision_contribution(self, texts) -> np.ndarray:
+        n = len(texts)
+        rows, cols, tf = self._term_counts(texts)
+
+        if self.config["binary"]:
+            tf = np.ones_like(tf)
+        if self.config["sublinear_tf"]:
+            tf = np.log(tf) + 1
+
+        dot = np.bincount(rows, weights=tf * self.weights[cols], minlength=n)
+
+        norm = self.config["norm"]
+        if norm is None:
+            return dot
+
+        x = tf * self.idf[cols]
+        if norm == "l2":
+            norms = np.sqrt(np.bincount(rows, weights=x * x, minlength=n))
+        else:
+            norms = np.bincount(rows, weights=np.abs(x), minlength=n)
+        norms[norms == 0.0] = 1.0
+        return dot / norms
+
+
+class CompiledLinearScorer:
+    def __init__(self, vectorizers, intercept: float, multinomial: bool = False):
+        self.vectorizers = vectorizers
+        self.intercept = float(intercept)
+        # A binary LogisticRegression fitted with multi_class="multinomial"
+        # is a softmax over (-z, z), i.e. sigmoid(2z).
+        self.multinomial = multinomial
+
+    def decision_function(self, texts) -> np.ndarray:
+        texts = list(texts)
+        z = np.full(len(texts), self.intercept, dtype=np.float64)
+        for vectorizer in self.vectorizers:
+            z += vectorizer.decision_contribution(texts)
+        return z
+
+    def predict_proba(self, texts) -> np.ndarray:
+        z = self.decision_function(texts)
+        if self.multinomial:
+            z = 2 * z
+        p = 1.0 / (1.0 + np.exp(-z))
+        return np.column_stack([1.0 - p, p])
+
+    def save(self, path: str) -> None:
+        """Writes ``path/`` with meta.json and one .npy per array, without
+        disturbing workers that have the previous export mapped."""
+        os.makedirs(path, exist_ok=True)
+        arrays = [
+            {kind: np.ascontiguousarray(getattr(vectorizer, kind)) for kind in ARRAY_KINDS}
+            for vectorizer in self.vectorizers
+        ]
+        digest = hashlib.blake2b(digest_size=6)
+        for vectorizer_arrays in arrays:
+            for array in vectorizer_arrays.values():
+                digest.update(array.tobytes())
+        tag = digest.hexdigest()
+
+        meta = {
+            "format_version": FORMAT_VERSION,
+            "intercept": self.intercept,
+            "multinomial": self.multinomial,
+            "vectorizers": [vectorizer.config for vectorizer in self.vectorizers],
+            "files": [],
+        }
+        for i, vectorizer_arrays in enumerate(arrays):
+            files = {kind: f"v{i}_{tag}_{kind}.npy" for kind in ARRAY_KINDS}
+            for kind, array in vectorizer_arrays.items():
+                with _replacing(os.path.join(path, files[kind])) as f:
+                    np.save(f, array)
+            meta["files"].append(files)
+
+        # meta.json last, in one rename: until then loaders get the old export
+        with _replacing(os.path.join(path, "meta.json"), "w") as f:
+            json.dump(meta, f, indent=2)
+
+        current = {name for files in meta["files"] for name in files.values()}
+        for name in os.listdir(path):
+            if _ARRAY_FILE.match(name) and name not in current:
+                try:
+                    os.remove(os.path.join(path, name))
+                except OSError:
+                    pass
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True):
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta["format_version"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported compiled scorer format: {meta['format_version']}")
+
+        mmap_mode = "r" if mmap else None
+        # exports before versioned file names used fixed ones
+        files = meta.get("files") or [
+            {kind: f"v{i}_{kind}.npy" for kind in ARRAY_KINDS} for i in range(len(meta["vectorizers"]))
+        ]
+        vectorizers = [
+            CompiledVectorizer(
+                config,
+                *(np.load(os.path.join(path, names[kind]), mmap_mode=mmap_mode) for kind in ARRAY_KINDS),
+            )
+            for config, names in zip(meta["vectorizers"], files)
+        ]
+        return cls(vectorizers, meta["intercept"], meta["multinomial"])
+
+
+def _vectorizer_config(vectorizer) -> dict:
+    if callable(vectorizer.analyzer) or vectorizer.analyzer not in ("word", "char", "char_wb"):
+        raise ValueError(f"Unsupported analyzer: {vectorizer.analyzer!r}")
+    for attr in ("preprocessor", "tokenizer", "stop_words", "strip_accents"):
+        if getattr(vectorizer, attr, None) is not None:
+            raise ValueError(f"Cannot compile a vectorizer with custom {attr}")
+    if vectorizer.norm not in ("l1", "l2", None):
+        raise ValueError(f"Unsupported norm: {vectorizer.norm!r}")
+
+    return {
+        "analyzer": vectorizer.analyzer,
+        "ngram_range": list(vectorizer.ngram_range),
+        "lowercase": bool(vectorizer.lowercase),
+        "token_pattern": vectorizer.token_pattern,
+        "binary": bool(vectorizer.binary),
+        "sublinear_tf": bool(vectorizer.sublinear_tf),
+        "norm": vectorizer.norm,
+    }
+
+
+def _feature_vectorizers(features):
+    """Flattens a vectorizer or FeatureUnion into [(vectorizer, weight)]."""
+    if hasattr(features, "transformer_list"):
+        weights = features.transformer_weights or {}
+        out = []
+        for name, transformer in features.transformer_list:
+            if transformer == "drop":
+                continue
+            out.append((transformer, weights.get(name, 1.0)))
+        return out
+    return [(features, 1.0)]
+
+
+def compile_pipeline(pipe) -> CompiledLinearScorer:
+    """Builds a CompiledLinearScorer from a fitted Pipeline([features, clf])."""
+    if len(pipe.steps) != 2:
+        raise ValueError("Expected a two-step pipeline: (vectorizer | FeatureUnion, classifier)")
+    features, clf = pipe.steps[0][1], pipe.steps[1][1]
+    if len(clf.classes_) != 2 or clf.coef_.shape[0] != 1:
+        raise ValueError("Only binary linear classifiers can be compiled")
+
+    coef = clf.coef_[0]
+    vectorizers = []
+    offset = 0
+    for vectorizer, union_weight in _feature_vectorizers(features):
+        vocabulary = vectorizer.vocabulary_
+        size = len(vocabulary)
+        terms = [None] * size
+        for term, column in vocabulary.items():
+            terms[column] = term
+
+        idf = vectorizer.idf_ if vectorizer.use_idf else np.ones(size)
+        weights = idf * coef[offset: offset + size] * union_weight
+
+        terms = np.asarray(terms, dtype=str)
+        order = np.argsort(terms, kind="stable")
+
+        vectorizers.append(CompiledVectorizer(
+            _vectorizer_config(vectorizer), terms[order], np.asarray(idf, dtype=np.float64)[order], weights[order]
+        ))
+        offset += size
+
+    if offset != coef.shape[0]:
+        raise ValueError(f"Feature count mismatch: vectorizers give {offset}, classifier has {coef.shape[0]}")
+
+    multinomial = getattr(clf, "multi_class", "auto") == "multinomial"
+    return CompiledLinearScorer(vectorizers, clf.intercept_[0], multinomial)
+
+
+def max_abs_difference(pipe, scorer: CompiledLinearScorer, texts) -> float:
+    """Largest |p_sklearn - p_compiled| over ``texts`` (positive class)."""
+    texts = list(texts)
+    expected = pipe.predict_proba(texts)[:, 1]
+    actual = scorer.predict_proba(texts)[:, 1]
+    return float(np.max(np.abs(expected - actual))) if texts else 0.0
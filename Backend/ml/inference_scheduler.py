@@ -0,0 +1,130 @@
+"""Micro-batching wrapper around a fitted sklearn pipeline.
+
+Concurrent single-item ``predict_proba([text])`` calls are queued and a
+background thread runs them as one vectorized call as soon as either
+``max_batch_size`` requests are waiting or the oldest one has waited
+``max_wait_ms``. The scheduler exposes ``predict_proba`` itself, so it can be
+passed anywhere a pipeline is expected (calculate_risk_score,
+calculate_message_risk_score, FraudMonitor); async callers can ``submit`` and
+await the returned future instead of tying up a thread.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from utils.histogram import Histogram
+from utils.logger import logger
+
+INFERENCE_MAX_BATCH = int(os.getenv("INFERENCE_MAX_BATCH", "64"))
+INFERENCE_MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", "2"))
+
+# Histogram upper bounds; the last bucket is open-ended.
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256]
+WAIT_MS_BUCKETS = [0.5, 1, 2, 5, 10, 25, 50, 100]
+
+
+class _Request:
+    __slots__ = ("text", "future", "enqueued_at")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class InferenceScheduler:
+    def __init__(
+        self,
+        pipe,
+        name: str = "model",
+        max_batch_size: int = INFERENCE_MAX_BATCH,
+        max_wait_ms: float = INFERENCE_MAX_WAIT_MS,
+    ):
+        self.pipe = pipe
+        self.name = name
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self._wait_ms = Histogram(WAIT_MS_BUCKETS)
+        self._direct_batches = 0
+
+        self._thread = threading.Thread(target=self._run, name=f"inference-{name}", daemon=True)
+        self._thread.start()
+
+    # sklearn-compatible entry point
+    def predict_proba(self, texts):
+        texts = list(texts)
+        if len(texts) != 1:
+            # Already a batch (e.g. /check_urls/): vectorized as-is.
+            with self._stats_lock:
+                self._direct_batches += 1
+            return self.pipe.predict_proba(texts)
+        return [self.submit(texts[0]).result()]
+
+    def submit(self, text: str) -> Future:
+        """Queue one text; the future resolves to its predict_proba row."""
+        request = _Request(text)
+        self._queue.put(request)
+        return request.future
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+    def _collect(self, first: _Request):
+        batch = [first]
+        deadline = first.enqueued_at + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # put the sentinel back so the run loop stops after this batch
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = self._collect(first)
+
+            started = time.perf_counter()
+            # Identical texts inside one window are only scored once.
+            texts = list(dict.fromkeys(r.text for r in batch))
+            try:
+                rows = dict(zip(texts, self.pipe.predict_proba(texts)))
+            except Exception as e:
+                logger.error(f"Batched inference failed for {self.name}: {e}")
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+
+            for request in batch:
+                request.future.set_result(rows[request.text])
+
+            with self._stats_lock:
+                self._batch_sizes.observe(len(batch))
+                for request in batch:
+                    self._wait_ms.observe((started - request.enqueued_at) * 1000)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+                "queue_depth": self._queue.qsize(),
+                "batch_size": self._batch_sizes.as_dict(),
+                "queue_wait_ms": self._wait_ms.as_dict(),
+                "direct_batches": self._direct_batches,
+            }
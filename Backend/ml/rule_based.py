@@ -2,79 +2,29 @@ from urllib.parse import urlparse
 import whois
 import re
 
-BLACKLIST_DOMAINS = ['phishingsite.com', 'secure-login.bank.com']
+from detection.phrase_matcher import scam_phrases
+from detection.reputation import reputation_store
+from detection.typosquat import typosquat_detector
+
 PHISHING_KEYWORDS = [
     'urgent', 'verify', 'account locked', 'click here',
     'update your account', 'password expired', 'security alert'
 ]
 
+scam_phrases.update({"phishing_keyword": (1, PHISHING_KEYWORDS)})
+
 def is_blacklisted(url):
     domain = urlparse(url).netloc
-    return domain in BLACKLIST_DOMAINS
-
-
-from urllib.parse import urlparse
-
-KNOWN_BRANDS = [
-    "paypal",
-    "google",
-    "microsoft",
-    "apple",
-    "amazon",
-    "absa",
-    "fnb",
-    "standardbank",
-    "capitec"
-]
-
-TRUSTED_DOMAINS = [
-    "paypal.com",
-    "google.com",
-    "microsoft.com",
-    "apple.com",
-    "amazon.com",
-    "absa.co.za",
-    "fnb.co.za",
-    "standardbank.co.za",
-    "capitecbank.co.za"
-]
-
-
-def normalize_domain(domain: str):
-    domain = domain.lower().strip()
-    if domain.startswith("www."):
-        domain = domain[4:]
-    return domain
+    return reputation_store.is_blocked(domain)
 
 
 def is_exact_trusted(domain: str):
-    domain = normalize_domain(domain)
-
-    if domain in TRUSTED_DOMAINS:
-        return True
-
-    for trusted in TRUSTED_DOMAINS:
-        if domain.endswith("." + trusted):
-            return True
-
-    return False
+    return reputation_store.is_trusted(domain)
 
 
 def has_typosquatting(domain: str):
-
-    domain = normalize_domain(domain)
-
-    if is_exact_trusted(domain):
-        return False
-
-    for brand in KNOWN_BRANDS:
-
-        if brand in domain:
-
-            if domain != f"{brand}.com" and not domain.endswith(f".{brand}.com"):
-                return True
-
-    return False
+    # Indexed brand lookup with homoglyph folding, see detection/typosquat.py
+    return typosquat_detector.match(domain) is not None
 
 
 def get_domain_age(domain):
@@ -108,9 +58,9 @@ def extract_url(message):
     return re.findall(url_regex, message)
 
 def detect_scam_message_rule_based(message):
-    for keyword in PHISHING_KEYWORDS:
-        if keyword in message.lower():
-            return True, f'Message contains phishing keyword: {keyword}'
+    for match in scam_phrases.find_all(message):
+        if match.category == 'phishing_keyword':
+            return True, f'Message contains phishing keyword: {match.phrase}'
 
     urls_found = extract_url(message)
     for url in urls_found:
@@ -0,0 +1,7 @@
+"""Tests run against a throwaway SQLite file, never the local ../test.db."""
+import os
+import tempfile
+
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='scam-tests-'), 'test.db')}"
+)
@@ -0,0 +1,83 @@
+import time
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from detection.bloom_filter import BloomFilter, build_from_feed, measure_false_positive_rate
+from detection.reputation import DomainReputationStore
+
+
+def _feed(tmp_path, n: int):
+    domains = [f"phish-{i}.example.net" for i in range(n)]
+    path = tmp_path / "blacklist.txt"
+    path.write_text("# feed\n" + "\n".join(domains) + "\n")
+    return str(path), domains
+
+
+@pytest.mark.parametrize("fp_rate", [0.01, 0.001])
+def test_false_positive_rate_within_target(tmp_path, fp_rate):
+    feed, domains = _feed(tmp_path, 20_000)
+    out = str(tmp_path / "blacklist.bloom")
+    build_from_feed(feed, out, fp_rate, feed_version="test")
+
+    bloom = BloomFilter.load(out)
+    assert bloom.feed_version == "test"
+    assert bloom.num_items == len(domains)
+    assert all(domain in bloom for domain in domains)
+    # same bound as ``python -m detection.bloom_filter verify``
+    assert measure_false_positive_rate(bloom, domains, samples=100_000) <= 2 * fp_rate
+
+
+class _ExactStore:
+    def __init__(self, blocked, fail=False):
+        self.blocked = set(blocked)
+        self.fail = fail
+        self.calls = 0
+
+    def find_blocked(self, candidates):
+        self.calls += 1
+        if self.fail:
+            raise OperationalError("SELECT", {}, Exception("database is down"))
+        return next((c for c in candidates if c in self.blocked), None)
+
+
+def _store(tmp_path, exact):
+    feed, _ = _feed(tmp_path, 1000)
+    out = str(tmp_path / "blacklist.bloom")
+    build_from_feed(feed, out, 0.001, feed_version="test")
+    store = DomainReputationStore(bloom_path=out, exact_blocklist=exact)
+    store.reload(force=True)
+    return store
+
+
+def test_store_confirms_bloom_positives(tmp_path):
+    exact = _ExactStore({"phish-7.example.net"})
+    store = _store(tmp_path, exact)
+
+    assert store.check_blocked("login.phish-7.example.net") == ("phish-7.example.net", False)
+    # in the filter but not in the exact store: a false positive
+    assert store.check_blocked("phish-8.example.net") == (None, False)
+    assert store.check_blocked("benign.example.org") == (None, False)
+    calls = exact.calls
+    # answers are cached
+    store.check_blocked("login.phish-7.example.net")
+    assert exact.calls == calls
+    assert store.stats()["bloom"]["false_positives"] == 1
+
+
+def test_failed_exact_check_is_unverified_and_not_retried_at_once(tmp_path):
+    exact = _ExactStore({"phish-7.example.net"}, fail=True)
+    store = _store(tmp_path, exact)
+    store.unverified_seconds = 0.2
+
+    assert store.needs_exact_check("phish-7.example.net")
+    store.confirm_blocked(["phish-7.example.net"])
+    assert exact.calls == 1
+    assert not store.needs_exact_check("phish-7.example.net")
+    assert store.check_blocked("phish-7.example.net") == (None, True)
+    assert exact.calls == 1
+
+    exact.fail = False
+    time.sleep(0.25)
+    assert store.needs_exact_check("phish-7.example.net")
+    assert store.check_blocked("phish-7.example.net") == ("phish-7.example.net", False)
@@ -0,0 +1,73 @@
+import random
+
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import FeatureUnion, Pipeline
+
+from ml.compiled_scorer import CompiledLinearScorer, compile_pipeline, max_abs_difference
+
+# training/train_*_model.py refuse to save a scorer that diverges more
+TOLERANCE = 1e-9
+
+WORDS = ["verify", "account", "parcel", "held", "pay", "now", "hello", "meeting", "lunch", "OTP",
+         "bank", "suspended", "click", "link", "thanks", "tomorrow", "R250", "fee", "prize", "won"]
+
+
+def _corpus(n: int, seed: int = 5):
+    rng = random.Random(seed)
+    texts, labels = [], []
+    for i in range(n):
+        label = i % 2
+        words = [rng.choice(WORDS[:10] if label else WORDS[8:]) for _ in range(rng.randint(3, 12))]
+        if label and rng.random() < 0.5:
+            words.append(f"https://{rng.choice(['secure', 'verify', 'login'])}-{i}.example.xyz/a?id={i}")
+        texts.append(" ".join(words))
+        labels.append(label)
+    return texts, labels
+
+
+def _url_pipeline():
+    return Pipeline([
+        ("tfidf", TfidfVectorizer(analyzer="char_wb", ngram_range=(3, 5))),
+        ("clf", LogisticRegression(max_iter=2000)),
+    ])
+
+
+def _message_pipeline():
+    return Pipeline([
+        ("features", FeatureUnion([
+            ("word", TfidfVectorizer(ngram_range=(1, 2), min_df=2)),
+            ("char", TfidfVectorizer(analyzer="char_wb", ngram_range=(3, 5), min_df=2)),
+        ])),
+        ("clf", LogisticRegression(max_iter=4000, class_weight="balanced")),
+    ])
+
+
+@pytest.mark.parametrize("make_pipeline", [_url_pipeline, _message_pipeline])
+def test_compiled_matches_sklearn(make_pipeline):
+    texts, labels = _corpus(400)
+    pipe = make_pipeline().fit(texts, labels)
+    scorer = compile_pipeline(pipe)
+
+    unseen, _ = _corpus(200, seed=6)
+    # unseen text, no known n-grams at all, and the empty string
+    probe = unseen + ["zzzz qqqq", ""]
+    assert max_abs_difference(pipe, scorer, texts) <= TOLERANCE
+    assert max_abs_difference(pipe, scorer, probe) <= TOLERANCE
+
+
+def test_saved_scorer_matches_sklearn(tmp_path):
+    texts, labels = _corpus(400)
+    pipe = _message_pipeline().fit(texts, labels)
+    compile_pipeline(pipe).save(str(tmp_path / "scorer"))
+
+    loaded = CompiledLinearScorer.load(str(tmp_path / "scorer"))
+    assert max_abs_difference(pipe, loaded, _corpus(200, seed=7)[0]) <= TOLERANCE
+
+
+def test_rejects_non_binary_classifier():
+    texts, _ = _corpus(90)
+    pipe = _url_pipeline().fit(texts, [i % 3 for i in range(90)])
+    with pytest.raises(ValueError):
+        compile_pipeline(pipe)
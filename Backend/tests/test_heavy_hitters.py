@@ -0,0 +1,83 @@
+import random
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from dashboard.heavy_hitters import DomainHeavyHitters, SpaceSaving, exact_top_domains, merge_top
+from database import Base, URLCheck, create_db_engine
+
+
+def _zipf_stream(n: int, distinct: int, seed: int = 3):
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(distinct)]
+    return rng.choices([f"d{rank}.example.com" for rank in range(distinct)], weights, k=n)
+
+
+def test_space_saving_bounds():
+    stream = _zipf_stream(50_000, 5_000)
+    exact = Counter(stream)
+    sketch = SpaceSaving(capacity=200)
+    for item in stream:
+        sketch.add(item)
+
+    assert sketch.total == len(stream)
+    assert len(sketch) <= 200
+    tracked = {item: (count, error) for item, count, error in sketch.items()}
+    # every count overestimates by at most its error
+    for item, (count, error) in tracked.items():
+        assert count - error <= exact[item] <= count
+    # anything above total / capacity is guaranteed to be tracked
+    for item, true_count in exact.items():
+        if true_count > len(stream) / 200:
+            assert item in tracked
+    assert [item for item, _, _ in sketch.top(10)] == [item for item, _ in exact.most_common(10)]
+
+
+def test_merge_top_sums_sketches():
+    a, b = SpaceSaving(10), SpaceSaving(10)
+    a.add("x.com", 5)
+    a.add("y.com", 2)
+    b.add("y.com", 4)
+    assert merge_top([a.items(), b.items()], 2) == [
+        {"domain": "y.com", "count": 6, "max_error": 0},
+        {"domain": "x.com", "count": 5, "max_error": 0},
+    ]
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'sketch.db'}")
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def test_sketch_top_matches_exact(session_factory):
+    now = datetime.utcnow()
+    stream = _zipf_stream(20_000, 2_000)
+    rng = random.Random(4)
+    with session_factory() as db:
+        db.bulk_insert_mappings(URLCheck, [
+            {"url": f"https://{domain}/x", "domain": domain, "flagged": "False", "reason": "t",
+             "checked_at": now - timedelta(days=rng.randrange(7), minutes=1)}
+            for domain in stream
+        ])
+        db.commit()
+
+    hitters = DomainHeavyHitters(session_factory, capacity=300, window_days=30)
+    hitters.seed_from_db()
+    # a second worker starting up must not count the history again
+    DomainHeavyHitters(session_factory, capacity=300, window_days=30).seed_from_db()
+
+    with session_factory() as db:
+        exact = exact_top_domains(db, now - timedelta(days=30), 10)
+    top = hitters.top(10)
+    assert [row["domain"] for row in top] == [row["domain"] for row in exact]
+    for row, truth in zip(top, exact):
+        assert row["count"] - row["max_error"] <= truth["count"] <= row["count"]
+
+    # live inserts are counted on top of the seeded history
+    hitters.record_inserts({URLCheck: [{"domain": exact[0]["domain"], "checked_at": datetime.utcnow()}] * 3})
+    assert hitters.top(1)[0]["count"] == top[0]["count"] + 3
@@ -0,0 +1,76 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from auth import check_stream_ticket, check_token, create_access_token, create_stream_ticket
+from dashboard.live_feed import RESYNC, Broadcaster, TooManySubscribers
+
+
+def test_fanout_to_hundreds_of_subscribers():
+    async def run():
+        broadcaster = Broadcaster(queue_size=16, max_subscribers=500, keepalive=60)
+        subscribers = [broadcaster.subscribe() for _ in range(500)]
+
+        async def first_batch(subscriber):
+            async for events in broadcaster.listen(subscriber):
+                if events:
+                    return events
+
+        readers = [asyncio.create_task(first_batch(s)) for s in subscribers]
+        # published from another thread, like the write-behind commit listener
+        publisher = threading.Thread(target=broadcaster.publish, args=("checks", {"checks": [1]}))
+        publisher.start()
+        batches = await asyncio.wait_for(asyncio.gather(*readers), timeout=5)
+        publisher.join()
+
+        assert all([event.name for event in events] == ["checks"] for events in batches)
+        # encoded once, shared by every subscriber
+        assert len({id(events[0]) for events in batches}) == 1
+        assert broadcaster.stats()["published"] == 1
+
+    asyncio.run(run())
+
+
+def test_slow_subscriber_is_told_to_resync():
+    async def run():
+        broadcaster = Broadcaster(queue_size=4, keepalive=60)
+        slow = broadcaster.subscribe()
+        for i in range(10):
+            broadcaster.publish("checks", {"n": i})
+
+        events = await anext(broadcaster.listen(slow))
+        assert events[0] is RESYNC
+        # the newest events are kept, the queue stays bounded
+        assert len(events) <= 4
+        assert events[-1].data == '{"type": "checks", "n": 9}'
+        assert slow.dropped >= 1 and broadcaster.resyncs == slow.dropped
+
+    asyncio.run(run())
+
+
+def test_subscriber_limit_and_unsubscribe():
+    async def run():
+        broadcaster = Broadcaster(max_subscribers=2, keepalive=60)
+        first = broadcaster.subscribe()
+        broadcaster.subscribe()
+        with pytest.raises(TooManySubscribers):
+            broadcaster.subscribe()
+        broadcaster.unsubscribe(first)
+        broadcaster.subscribe()
+        assert broadcaster.subscribers == 2
+
+    asyncio.run(run())
+
+
+def test_stream_ticket_is_single_use_and_not_an_admin_token():
+    ticket = create_stream_ticket()
+    with pytest.raises(HTTPException):
+        check_token(ticket)
+    with pytest.raises(HTTPException):
+        check_stream_ticket(create_access_token({"sub": "admin"}))
+
+    check_stream_ticket(ticket)
+    with pytest.raises(HTTPException):
+        check_stream_ticket(ticket)
@@ -1,4 +1,5 @@
 import os
+import sys
 import joblib
 import pandas as pd
 
@@ -11,6 +12,13 @@ from sklearn.metrics import accuracy_score, classification_report, confusion_mat
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 DATA_PATH = os.path.join(PROJECT_ROOT, "training", "url_dataset.csv")
 OUT_PATH = os.path.join(PROJECT_ROOT, "url_pipeline.pkl")
+COMPILED_OUT_PATH = os.path.join(PROJECT_ROOT, "url_scorer")
+
+# Compiled scorer must reproduce sklearn's probabilities to this tolerance
+EQUIVALENCE_TOLERANCE = 1e-9
+
+sys.path.insert(0, PROJECT_ROOT)
+from ml.compiled_scorer import compile_pipeline, max_abs_difference  # noqa: E402
 
 df = pd.read_csv(DATA_PATH)
 df["label"] = df["label"].map({"safe": 0, "phishing": 1})
@@ -46,4 +54,17 @@ print("Confusion matrix:\n", confusion_matrix(y_test, pred))
 print("\nReport:\n", classification_report(y_test, pred, digits=4))
 
 joblib.dump(pipe, OUT_PATH)
-print(f"\n✅ Saved URL pipeline to: {OUT_PATH}")
\ No newline at end of file
+print(f"\n✅ Saved URL pipeline to: {OUT_PATH}")
+
+# Inference fast path (see ml/compiled_scorer.py)
+scorer = compile_pipeline(pipe)
+diff = max(
+    max_abs_difference(pipe, scorer, X_train),
+    max_abs_difference(pipe, scorer, X_test),
+)
+print(f"Compiled scorer max |p - p_sklearn|: {diff:.3e}")
+if diff > EQUIVALENCE_TOLERANCE:
+    raise SystemExit(f"Compiled scorer diverges from sklearn ({diff:.3e} > {EQUIVALENCE_TOLERANCE}); not saved.")
+
+scorer.save(COMPILED_OUT_PATH)
+print(f"✅ Saved compiled URL scorer to: {COMPILED_OUT_PATH}")
@@ -0,0 +1,294 @@
+"""Prometheus-style metrics, served at GET /metrics in the text exposition
+format (version 0.0.4).
+
+The stats endpoints answer "how is this cache doing"; these answer "where
+did the time go" across the whole process, in a form a Prometheus server can
+scrape and aggregate over workers:
+
+- ``scoring_stage_seconds{kind, stage}``: time spent in each scoring stage
+  (url: domain_extraction, reputation, typosquat, whois, ml; message:
+  near_duplicates, phrases, embedded_urls, ml; both: persistence);
+- ``verdicts_total{kind, verdict}`` and ``verdict_reasons_total{kind, reason}``
+  for every check answered (reasons as the bounded codes of
+  detection/reasons.py);
+- ``whois_lookups_total{result}``, ``whois_lookup_seconds`` and
+  ``whois_deadline_exceeded_total``;
+- ``write_behind_flush_seconds`` and ``write_behind_queue_depth``.
+
+Labels are fixed codes, never check content, so the series count stays
+bounded and the page carries no user data.
+
+Timers cost two perf_counter() calls and a locked bucket update. With
+METRICS_ENABLED=0 (or set_enabled(False)) every timer is a shared no-op and
+/metrics answers 503. Numbers are per process; Prometheus sums the workers.
+"""
+import os
+import threading
+from bisect import bisect_left
+from time import perf_counter
+from typing import Callable, Dict, List, Sequence, Tuple
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# seconds; from a dict probe to a WHOIS lookup at its socket timeout
+LATENCY_BUCKETS = [0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0]
+
+_enabled = METRICS_ENABLED
+
+
+def set_enabled(enabled: bool) -> None:
+    global _enabled
+    _enabled = enabled
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _NoopTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP_TIMER = _NoopTimer()
+
+
+class _Timer:
+    __slots__ = ("_child", "_start")
+
+    def __init__(self, child: "_HistogramChild"):
+        self._child = child
+
+    def __enter__(self):
+        self._start = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._child.observe(perf_counter() - self._start)
+        return False
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        if not _enabled:
+            return
+        with self._lock:
+            self.value += amount
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "count", "_lock")
+
+    def __init__(self, bounds: List[float]):
+        self.bounds = bounds
+        # counts[i]: observations <= bounds[i] and > bounds[i - 1]; the last is +Inf
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        if not _enabled:
+            return
+        i = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self):
+        """Context manager observing the seconds spent inside it."""
+        return _Timer(self) if _enabled else _NOOP_TIMER
+
+
+class _Family:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """The series for these label values; bind it once for hot paths."""
+        if len(values) != len(self.label_names):
+            raise ValueError(f"{self.name} takes labels {self.label_names}, got {values}")
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            children = sorted(self._children.items())
+        for values, child in children:
+            lines += self._render_child(values, child)
+        return lines
+
+    def _render_child(self, values, child) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Family):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        if not self.label_names:
+            # an unlabelled series is exported (as 0) before its first inc()
+            self.labels()
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1) -> None:
+        self.labels().inc(amount)
+
+    def _render_child(self, values, child) -> List[str]:
+        return [f"{self.name}{_format_labels(self.label_names, values)} {_format_value(child.value)}"]
+
+
+class Histogram(_Family):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: List[float] = LATENCY_BUCKETS):
+        self.buckets = sorted(buckets)
+        super().__init__(name, help, labels)
+        if not self.label_names:
+            self.labels()
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def _render_child(self, values, child) -> List[str]:
+        with child._lock:
+            counts, total, count = list(child.counts), child.sum, child.count
+        lines, cumulative = [], 0
+        for bound, bucket_count in zip(self.buckets + [float("inf")], counts):
+            cumulative += bucket_count
+            le = f'le="{_format_value(float(bound))}"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.label_names, values, le)} {cumulative}")
+        labels = _format_labels(self.label_names, values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Gauge(_Family):
+    """Read at scrape time from ``fn()``; nothing to update on the hot path."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, fn: Callable[[], float]):
+        super().__init__(name, help)
+        self.fn = fn
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge",
+                f"{self.name} {_format_value(self.fn())}"]
+
+
+class Registry:
+    def __init__(self):
+        self._families: Dict[str, _Family] = {}
+        self._lock = threading.Lock()
+
+    def register(self, family: _Family) -> _Family:
+        with self._lock:
+            if family.name in self._families:
+                raise ValueError(f"Metric {family.name} is already registered")
+            self._families[family.name] = family
+        return family
+
+    def render(self) -> str:
+        with self._lock:
+            families = list(self._families.values())
+        lines = []
+        for family in families:
+            lines += family.render()
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+def counter(name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+    return registry.register(Counter(name, help, labels))
+
+
+def histogram(name: str, help: str, labels: Sequence[str] = (), buckets: List[float] = LATENCY_BUCKETS) -> Histogram:
+    return registry.register(Histogram(name, help, labels, buckets))
+
+
+def gauge(name: str, help: str, fn: Callable[[], float]) -> Gauge:
+    return registry.register(Gauge(name, help, fn))
+
+
+SCORING_STAGE_SECONDS = histogram(
+    "scoring_stage_seconds", "Time spent in each risk scoring stage.", ["kind", "stage"]
+)
+VERDICTS_TOTAL = counter("verdicts_total", "Checks answered, by verdict.", ["kind", "verdict"])
+VERDICT_REASONS_TOTAL = counter(
+    "verdict_reasons_total", "Reasons given in answered checks, by reason code.", ["kind", "reason"]
+)
+WHOIS_LOOKUPS_TOTAL = counter(
+    "whois_lookups_total",
+    "Domain age resolutions: cache, store, or a registrar lookup that found a date (ok), none (unknown) or failed (error).",
+    ["result"],
+)
+WHOIS_LOOKUP_SECONDS = histogram("whois_lookup_seconds", "Duration of registrar WHOIS lookups.")
+WHOIS_DEADLINE_EXCEEDED_TOTAL = counter(
+    "whois_deadline_exceeded_total", "Domain age lookups still running at the scoring deadline (whois_status pending)."
+)
+WRITE_BEHIND_FLUSH_SECONDS = histogram(
+    "write_behind_flush_seconds", "Duration of write-behind flushes (insert, hooks and commit)."
+)
+
+
+def stage_timer(kind: str, stage: str) -> _HistogramChild:
+    """The scoring_stage_seconds series for one stage; ``.time()`` it."""
+    return SCORING_STAGE_SECONDS.labels(kind, stage)
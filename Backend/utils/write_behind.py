@@ -0,0 +1,300 @@
+"""Write-behind persistence for the check/report logs.
+
+The check endpoints used to ``db.add`` + ``db.commit`` inside the request, so
+every check paid a full transaction (and an fsync on SQLite). Rows now go
+into a bounded in-memory queue and a background thread writes them in bulk,
+one executemany INSERT per table per flush, whenever WRITE_BEHIND_BATCH_ROWS
+rows are waiting or the oldest has waited WRITE_BEHIND_FLUSH_MS.
+
+Callers stamp their own timestamps (checked_at/reported_at) so rows keep the
+time of the request, not of the flush. The admin views can lag by up to one
+flush interval.
+
+Flush hooks (``add_flush_hook``) run inside the flush transaction with the
+rows just written, grouped by model, so derived tables (counters, rollups)
+commit atomically with the raw rows; they must only write through the
+session, since a failed flush is rolled back and retried. Commit listeners
+(``add_commit_listener``) get the same rows after the commit, for side
+effects that must only see committed data (the admin live feed, in-memory
+sketches).
+
+A flush that fails (any exception, from the insert or a hook) is retried
+once after WRITE_BEHIND_RETRY_MS; only then are its rows counted in
+``failed``. The writer thread survives either way.
+
+When the queue is full (WRITE_BEHIND_MAX_QUEUE) the policy decides:
+- ``sync`` (default): the caller writes its rows itself, i.e. the old
+  per-request commit. Nothing is lost; latency degrades under overload.
+  Async callers use ``enqueue_async``/``enqueue_many_async``, which do that
+  write on the default executor instead of the event loop.
+- ``drop``: the rows are discarded and counted in ``dropped``.
+
+``stop()`` (FastAPI shutdown) drains the queue before returning.
+WRITE_BEHIND_ENABLED=0 writes every row inline, as before.
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import insert
+
+from database import SessionLocal
+from utils.histogram import Histogram
+from utils.logger import logger
+from utils.metrics import WRITE_BEHIND_FLUSH_SECONDS, gauge
+
+WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "1") == "1"
+WRITE_BEHIND_BATCH_ROWS = int(os.getenv("WRITE_BEHIND_BATCH_ROWS", "500"))
+WRITE_BEHIND_FLUSH_MS = float(os.getenv("WRITE_BEHIND_FLUSH_MS", "200"))
+WRITE_BEHIND_MAX_QUEUE = int(os.getenv("WRITE_BEHIND_MAX_QUEUE", "20000"))
+WRITE_BEHIND_POLICY = os.getenv("WRITE_BEHIND_POLICY", "sync")
+WRITE_BEHIND_RETRY_MS = float(os.getenv("WRITE_BEHIND_RETRY_MS", "100"))
+
+FLUSH_MS_BUCKETS = [1, 5, 10, 25, 50, 100, 250, 1000]
+FLUSH_ROWS_BUCKETS = [1, 10, 50, 100, 500, 1000, 5000]
+
+
+def _group(batch) -> Dict[type, List[dict]]:
+    grouped: Dict[type, List[dict]] = {}
+    for model, row, _ in batch:
+        grouped.setdefault(model, []).append(row)
+    return grouped
+
+
+class WriteBehindQueue:
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        batch_rows: int = WRITE_BEHIND_BATCH_ROWS,
+        flush_ms: float = WRITE_BEHIND_FLUSH_MS,
+        max_queue: int = WRITE_BEHIND_MAX_QUEUE,
+        policy: str = WRITE_BEHIND_POLICY,
+        enabled: bool = WRITE_BEHIND_ENABLED,
+        retry_ms: float = WRITE_BEHIND_RETRY_MS,
+    ):
+        if policy not in ("sync", "drop"):
+            raise ValueError(f"Unknown write-behind policy: {policy!r}")
+        self.session_factory = session_factory
+        self.batch_rows = batch_rows
+        self.flush_interval = flush_ms / 1000.0
+        self.max_queue = max_queue
+        self.policy = policy
+        self.enabled = enabled
+        self.retry_delay = retry_ms / 1000.0
+
+        # (model, row, enqueued_at)
+        self._rows = deque()
+        self._cond = threading.Condition()
+        # one writer at a time, so rows land in the order they were queued
+        self._write_lock = threading.Lock()
+        self._hooks: List[Callable] = []
+        self._listeners: List[Callable] = []
+        self._thread = None
+        self._stopping = False
+
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.sync_writes = 0
+        self.retried = 0
+        self.failed = 0
+        self.flushes = 0
+        self._flush_ms = Histogram(FLUSH_MS_BUCKETS)
+        self._flush_rows = Histogram(FLUSH_ROWS_BUCKETS)
+        self._max_depth = 0
+
+    def add_flush_hook(self, hook: Callable) -> None:
+        """``hook(session, rows_by_model)``; runs in the flush transaction."""
+        self._hooks.append(hook)
+
+    def add_commit_listener(self, listener: Callable) -> None:
+        """``listener(rows_by_model)``; runs after the flush committed."""
+        self._listeners.append(listener)
+
+    def exclusive(self):
+        """Context manager that holds off flushes in this process, for jobs
+        that rebuild derived tables from the raw rows."""
+        return self._write_lock
+
+    def start(self) -> None:
+        if not self.enabled or self._thread is not None:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Flushes everything still queued, then stops the writer thread."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        self.flush()
+
+    def enqueue(self, model, row: dict) -> None:
+        self.enqueue_many(model, [row])
+
+    def enqueue_many(self, model, rows: List[dict]) -> None:
+        batch = self._offer(model, rows)
+        if batch:
+            self._write(batch)
+
+    async def enqueue_async(self, model, row: dict) -> None:
+        await self.enqueue_many_async(model, [row])
+
+    async def enqueue_many_async(self, model, rows: List[dict]) -> None:
+        """enqueue_many() for the event loop: a write the caller has to do
+        itself (queue full under ``sync``, queue not running) runs on the
+        default executor, never on the loop."""
+        batch = self._offer(model, rows)
+        if batch:
+            await asyncio.get_running_loop().run_in_executor(None, self._write, batch)
+
+    def _offer(self, model, rows: List[dict]) -> Optional[list]:
+        """Queues ``rows``; returns the batch the caller must write itself, if any."""
+        if not rows:
+            return None
+        if not self.enabled or self._thread is None:
+            return [(model, row, 0.0) for row in rows]
+
+        now = time.monotonic()
+        with self._cond:
+            if len(self._rows) + len(rows) > self.max_queue:
+                overflow = True
+            else:
+                overflow = False
+                self._rows.extend((model, row, now) for row in rows)
+                self.enqueued += len(rows)
+                self._max_depth = max(self._max_depth, len(self._rows))
+                if len(self._rows) >= self.batch_rows or len(self._rows) == len(rows):
+                    # a full batch, or the first rows of a new window
+                    self._cond.notify()
+
+        if not overflow:
+            return None
+        if self.policy == "drop":
+            with self._cond:
+                self.dropped += len(rows)
+            logger.warning(f"Write-behind queue full ({self.max_queue}); dropped {len(rows)} {model.__tablename__} rows")
+            return None
+        with self._cond:
+            self.sync_writes += len(rows)
+        return [(model, row, now) for row in rows]
+
+    def flush(self) -> None:
+        """Writes everything queued right now, in the calling thread."""
+        with self._cond:
+            batch = list(self._rows)
+            self._rows.clear()
+        if batch:
+            self._write(batch)
+
+    def _take_batch(self):
+        with self._cond:
+            while not self._rows and not self._stopping:
+                self._cond.wait()
+            if not self._rows:
+                return None
+            deadline = self._rows[0][2] + self.flush_interval
+            while len(self._rows) < self.batch_rows and not self._stopping:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return [self._rows.popleft() for _ in range(min(len(self._rows), self.batch_rows))]
+
+    def _run(self) -> None:
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+            try:
+                self._write(batch)
+            except Exception as e:
+                # e.g. no session could be opened; keep the thread alive
+                with self._cond:
+                    self.failed += len(batch)
+                logger.error(f"Write-behind writer error, {len(batch)} rows lost: {e!r}")
+
+    def _commit(self, grouped, rows: int) -> bool:
+        with self._write_lock:
+            db = self.session_factory()
+            try:
+                for model, model_rows in grouped.items():
+                    db.execute(insert(model), model_rows)
+                for hook in self._hooks:
+                    hook(db, grouped)
+                db.commit()
+                return True
+            except Exception as e:
+                # not only SQLAlchemyError: whatever a hook raises must not
+                # kill the writer thread
+                db.rollback()
+                logger.error(f"Write-behind flush of {rows} rows failed: {e!r}")
+                return False
+            finally:
+                db.close()
+
+    def _write(self, batch) -> None:
+        grouped = _group(batch)
+        started = time.perf_counter()
+        ok = self._commit(grouped, len(batch))
+        if not ok:
+            # once: a lost race or a dropped connection usually clears
+            time.sleep(self.retry_delay)
+            with self._cond:
+                self.retried += len(batch)
+            ok = self._commit(grouped, len(batch))
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._cond:
+            if ok:
+                self.written += len(batch)
+                self.flushes += 1
+                self._flush_ms.observe(elapsed_ms)
+                self._flush_rows.observe(len(batch))
+            else:
+                self.failed += len(batch)
+
+        if ok:
+            WRITE_BEHIND_FLUSH_SECONDS.observe(elapsed_ms / 1000)
+            for listener in self._listeners:
+                try:
+                    listener(grouped)
+                except Exception as e:
+                    # the rows are committed; a listener can't undo that
+                    logger.error(f"Write-behind commit listener failed: {e}")
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._rows)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "enabled": self.enabled,
+                "running": self._thread is not None,
+                "policy": self.policy,
+                "queue_depth": len(self._rows),
+                "max_queue_depth_seen": self._max_depth,
+                "max_queue": self.max_queue,
+                "enqueued": self.enqueued,
+                "written": self.written,
+                "dropped": self.dropped,
+                "sync_writes": self.sync_writes,
+                "retried": self.retried,
+                "failed": self.failed,
+                "flushes": self.flushes,
+                "flush_ms": self._flush_ms.as_dict(),
+                "flush_rows": self._flush_rows.as_dict(),
+            }
+
+
+write_behind = WriteBehindQueue()
+
+gauge("write_behind_queue_depth", "Rows waiting for the next write-behind flush.", lambda: write_behind.queue_depth)
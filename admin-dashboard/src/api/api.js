@@ -1,7 +1,9 @@
 import axios from "axios";
 
+const API_BASE_URL = "http://localhost:8000";
+
 const API = axios.create({
-  baseURL: "http://localhost:8000"
+  baseURL: API_BASE_URL
 });
 
 // Attach JWT token automatically
@@ -36,3 +38,50 @@ export const getRecentChecks = () =>
 
 export const getAnalytics = () =>
   API.get("/admin/analytics");
+
+// Server-sent events from /admin/live: counters, checks, flagged, campaign,
+// resync. EventSource cannot set headers, so it connects with a short-lived,
+// single-use ticket in the query instead of the admin token. A ticket can't
+// be replayed, so on error the source is closed and reopened with a fresh
+// one. Handlers get the parsed event payload; onStatus(true/false) follows
+// the connection. Returns a function that closes the feed.
+const LIVE_RETRY_MS = 3000;
+
+export const openLiveFeed = (handlers, onStatus = () => {}) => {
+  let source = null;
+  let retry = null;
+  let closed = false;
+
+  const connect = async () => {
+    let ticket;
+    try {
+      ticket = (await API.post("/admin/live/ticket")).data.ticket;
+    } catch (err) {
+      onStatus(false);
+      if (!closed) retry = setTimeout(connect, LIVE_RETRY_MS);
+      return;
+    }
+    if (closed) return;
+
+    source = new EventSource(
+      `${API_BASE_URL}/admin/live?ticket=${encodeURIComponent(ticket)}`
+    );
+    Object.entries(handlers).forEach(([name, handler]) => {
+      source.addEventListener(name, (e) => handler(JSON.parse(e.data)));
+    });
+    source.onopen = () => onStatus(true);
+    source.onerror = () => {
+      onStatus(false);
+      source.close();
+      if (!closed) retry = setTimeout(connect, LIVE_RETRY_MS);
+    };
+  };
+
+  connect();
+
+  return () => {
+    closed = true;
+    clearTimeout(retry);
+    if (source) source.close();
+  };
+};
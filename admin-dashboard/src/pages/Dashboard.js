@@ -1,5 +1,5 @@
 import React, { useEffect, useMemo, useState } from "react";
-import { getStats, getRecentChecks, getAnalytics } from "../api/api";
+import { getStats, getRecentChecks, getAnalytics, openLiveFeed } from "../api/api";
 import StatCard from "../components/StatCard";
 import AppShell from "../components/AppShell";
 
@@ -52,11 +52,47 @@ const verdictChip = (verdict) => {
   return { label: v || "safe", color: "success" };
 };
 
+const MAX_RECENT = 50;
+let nextRowId = 0;
+
+// /admin/recent-checks and live "checks" events share one item shape.
+const toRecentRow = (check) => ({
+  id: nextRowId++,
+  type: check.type,
+  value: check.content,
+  verdict: check.verdict || (check.flagged === "True" ? "phishing" : "safe"),
+  reason: check.reason,
+  created_at: check.checked_at,
+});
+
+// Live "counters" deltas use the counter names behind /admin/stats.
+const applyDeltas = (stats, deltas) => {
+  if (!stats) return stats;
+  const total_urls = stats.total_urls + (deltas["url_checks.total"] || 0);
+  const total_messages = stats.total_messages + (deltas["message_checks.total"] || 0);
+  const flagged_urls = stats.flagged_urls + (deltas["url_checks.flagged"] || 0);
+  const flagged_messages = stats.flagged_messages + (deltas["message_checks.flagged"] || 0);
+  const total_checks = total_urls + total_messages;
+  const phishing_detected = flagged_urls + flagged_messages;
+  return {
+    ...stats,
+    total_urls,
+    total_messages,
+    total_reports: stats.total_reports + (deltas["report_contents.total"] || 0),
+    flagged_urls,
+    flagged_messages,
+    total_checks,
+    phishing_detected,
+    safe: Math.max(total_checks - phishing_detected, 0),
+  };
+};
+
 export default function Dashboard() {
   const [stats, setStats] = useState(null);
   const [recent, setRecent] = useState([]);
   const [analytics, setAnalytics] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [live, setLive] = useState(false);
 
   const loadData = async () => {
     setLoading(true);
@@ -68,7 +104,7 @@ export default function Dashboard() {
       ]);
 
       setStats(statsRes.data);
-      setRecent(Array.isArray(recentRes.data) ? recentRes.data : []);
+      setRecent((recentRes.data?.recent_checks || []).map(toRecentRow));
       setAnalytics(analyticsRes.data);
     } catch (err) {
       console.error(err);
@@ -79,6 +115,19 @@ export default function Dashboard() {
 
   useEffect(() => {
     loadData();
+
+    const close = openLiveFeed(
+      {
+        counters: (e) => setStats((prev) => applyDeltas(prev, e.deltas)),
+        checks: (e) =>
+          setRecent((prev) => [...e.checks.map(toRecentRow), ...prev].slice(0, MAX_RECENT)),
+        // fell behind and lost events: start over from REST
+        resync: () => loadData(),
+      },
+      setLive
+    );
+
+    return close;
   }, []);
 
   const logout = () => {
@@ -117,6 +166,13 @@ export default function Dashboard() {
         <Typography sx={{ opacity: 0.7, mt: 0.5 }}>
           Live stats from CounterScam checks.
         </Typography>
+        <Chip
+          label={live ? "live" : "reconnecting"}
+          color={live ? "success" : "default"}
+          size="small"
+          variant="outlined"
+          sx={{ mt: 1 }}
+        />
       </Box>
 
       <Grid container spacing={2.5}>